@@ -0,0 +1,75 @@
+"""
+Benchmark for the shared behaviour statistics.
+Times the vectorised per-user statistics of Utils/behavior_stats_utils on a
+large synthetic log set against the row-by-row reference implementations
+(including the iterrows response-time loop AIAnalyzer used) that
+tests/test_behavior_stats.py checks them against.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_behavior_stats.py [--logs 1000000] [--users 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_feature_extraction import synthetic_data
+from tests.test_behavior_stats import legacy_avg_response_hours, rowwise_stats
+from Utils.behavior_stats_utils import delay_stats, hour_distribution, template_rates, weekday_distribution
+
+
+def behavior_logs(n_logs: int, n_users: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic logs with responses added to the feature extraction data."""
+    _, logs, _ = synthetic_data(n_logs, n_users, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    responded = rng.random(n_logs) < 0.1
+    logs["responded"] = responded
+    responded_at = logs["sent_at"] + pd.to_timedelta(rng.integers(0, 60 * 72, size=n_logs), unit="m")
+    logs["responded_at"] = responded_at.where(responded & (rng.random(n_logs) > 0.05))
+    return logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--sample-logs", type=int, default=50000, help="logs timed on the row-by-row path")
+    args = parser.parse_args()
+
+    logs = behavior_logs(args.logs, args.users)
+    timings = {}
+    for name, fn in (
+        ("time-to-click stats", lambda: delay_stats(logs, "clicked", by="user_id")),
+        ("time-to-respond stats", lambda: delay_stats(logs, "responded", by="user_id")),
+        ("hour distribution", lambda: hour_distribution(logs, by="user_id")),
+        ("weekday distribution", lambda: weekday_distribution(logs, by="user_id")),
+        ("template rates", lambda: template_rates(logs, by="user_id"))
+    ):
+        started = time.perf_counter()
+        fn()
+        timings[name] = time.perf_counter() - started
+    print(f"\nVectorised, {args.logs:,} logs / {args.users:,} users:")
+    for name, seconds in timings.items():
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+    print(f"  {'total':<24} {sum(timings.values()) * 1000:8.1f} ms")
+
+    sample = logs.iloc[:args.sample_logs]
+    started = time.perf_counter()
+    rowwise_stats(sample)
+    rowwise = (time.perf_counter() - started) / len(sample) * len(logs)
+    started = time.perf_counter()
+    for _, user_logs in sample[sample["user_id"] <= 200].groupby("user_id"):
+        legacy_avg_response_hours(user_logs)
+    iterrows = (time.perf_counter() - started) / int((sample["user_id"] <= 200).sum()) * len(logs)
+    print(f"\nRow-by-row (extrapolated from {len(sample):,} logs): ~{rowwise:.1f}s")
+    print(f"iterrows response time alone (extrapolated): ~{iterrows:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
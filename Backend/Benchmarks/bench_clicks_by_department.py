@@ -0,0 +1,134 @@
+"""
+Benchmark for the department click aggregation.
+Seeds a throwaway SQLite database with increasing numbers of email logs and
+times /analytics/clicks_by_department's rollup read against the single
+GROUP BY over the raw logs and the original per-department/per-user loop.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_clicks_by_department.py [--sizes 10000 100000 300000] [--legacy]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from models import Base
+from Utils.analytics_utils import department_click_stats, department_click_stats_from_logs, rebuild_department_rollups
+
+DEPARTMENTS = ["IT", "HR", "Finance", "Sales", "Marketing", "Operations", "Legal", "Executive"]
+TEMPLATES = ["urgent_action", "security_alert", "password_expiry", "system_update"]
+
+
+def seed(engine, n_logs: int, n_users: int = 500):
+    """Populate departments, users and n_logs random email logs."""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(models.Department.__table__.insert(), [
+            {"id": i + 1, "name": name} for i, name in enumerate(DEPARTMENTS)
+        ])
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i + 1, "name": f"User {i}", "email": f"user{i}@smx.test",
+             "department_id": i % len(DEPARTMENTS) + 1}
+            for i in range(n_users)
+        ])
+        batch = []
+        for i in range(n_logs):
+            sent_at = start + timedelta(minutes=rng.randrange(60 * 24 * 365))
+            clicked = rng.random() < 0.3
+            batch.append({
+                "user_id": rng.randrange(n_users) + 1,
+                "subject": "Benchmark",
+                "body": "Benchmark body",
+                "sent_at": sent_at,
+                "clicked": clicked,
+                "clicked_at": sent_at + timedelta(minutes=rng.randrange(600)) if clicked else None,
+                "responded": False,
+                "template_type": rng.choice(TEMPLATES)
+            })
+            if len(batch) == 20000:
+                conn.execute(models.EmailLog.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(models.EmailLog.__table__.insert(), batch)
+
+
+def legacy_clicks_by_department(db):
+    """The original N+1 implementation, kept here for comparison."""
+    analytics = []
+    for dept in db.query(models.Department).all():
+        users = db.query(models.User).filter(models.User.department_id == dept.id).all()
+        total_emails = 0
+        total_clicks = 0
+        for user in users:
+            user_emails = db.query(models.EmailLog).filter(models.EmailLog.user_id == user.id).all()
+            total_emails += len(user_emails)
+            total_clicks += sum(1 for email in user_emails if email.clicked)
+        click_rate = (total_clicks / total_emails * 100) if total_emails > 0 else 0
+        analytics.append({
+            "department": dept.name,
+            "total_emails": total_emails,
+            "total_clicks": total_clicks,
+            "click_rate": round(click_rate, 2)
+        })
+    return analytics
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    """Return the best wall-clock time of fn over several runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--legacy", action="store_true", help="also time the original implementation")
+    args = parser.parse_args()
+
+    print(f"{'logs':>10} {'rollup ms':>10} {'filtered ms':>12} {'raw scan ms':>12} {'legacy ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(bind=engine)
+            seed(engine, size)
+            db = sessionmaker(bind=engine)()
+            try:
+                rebuild_department_rollups(db)
+                filters = {
+                    "start_date": datetime(2024, 3, 1).date(),
+                    "end_date": datetime(2024, 3, 31).date(),
+                    "template_type": "urgent_action"
+                }
+                assert department_click_stats(db) == department_click_stats_from_logs(db)
+                assert department_click_stats(db, **filters) == department_click_stats_from_logs(db, **filters)
+
+                rollup_ms = best_of(lambda: department_click_stats(db))
+                filtered_ms = best_of(lambda: department_click_stats(db, **filters))
+                raw_ms = best_of(lambda: department_click_stats_from_logs(db))
+                legacy_ms = "-"
+                if args.legacy:
+                    assert legacy_clicks_by_department(db) == department_click_stats(db)
+                    legacy_ms = f"{best_of(lambda: legacy_clicks_by_department(db), repeat=1):.1f}"
+                print(f"{size:>10} {rollup_ms:>10.1f} {filtered_ms:>12.1f} {raw_ms:>12.1f} {legacy_ms:>10}")
+            finally:
+                db.close()
+                engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
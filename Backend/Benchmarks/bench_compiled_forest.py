@@ -0,0 +1,75 @@
+"""
+Benchmark for the compiled RandomForest evaluator.
+Trains MLRiskPredictor's forest on synthetic users, checks that
+CompiledForest.predict_proba matches sklearn's predict_proba, then reports
+p50/p99 latency of both for a single row and a 10k-row batch, along with
+MLRiskPredictor's own dispatch between them.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_compiled_forest.py [--users 20000] [--repeats 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_feature_extraction import synthetic_data
+from Utils.ai_utils import MLRiskPredictor
+from Utils.forest_utils import CompiledForest
+
+
+def latency(fn, X: np.ndarray, repeats: int):
+    """Return (p50, p99) wall time of fn(X) in milliseconds."""
+    fn(X)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(X)
+        samples.append((time.perf_counter() - started) * 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=200, help="timed calls per single-row case")
+    args = parser.parse_args()
+
+    predictor = MLRiskPredictor(load=False)
+    users, logs, now = synthetic_data(args.users * 30, args.users)
+    features = predictor.extract_features_batch(users, logs, now=now)
+    labels = (features[:, 3] > predictor.HIGH_RISK_CLICK_RATE).astype(int)
+    predictor.fit(features, labels, save=False)
+    scaled = predictor.scaler.transform(features)
+
+    started = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(predictor.model)
+    compile_ms = (time.perf_counter() - started) * 1000
+    print(f"Compiled {len(compiled.roots)} trees / {len(compiled.feature):,} nodes "
+          f"into {compiled.nbytes / 1e6:.1f} MB in {compile_ms:.0f} ms")
+
+    # Parity on every training row plus perturbed rows that land near thresholds
+    rng = np.random.default_rng(0)
+    check = np.vstack([scaled, scaled + rng.normal(scale=0.01, size=scaled.shape)])
+    np.testing.assert_allclose(compiled.predict_proba(check), predictor.model.predict_proba(check), rtol=0, atol=1e-12)
+    print(f"✅ Parity: {len(check):,} rows match sklearn predict_proba")
+
+    cases = [("1 row", scaled[:1], args.repeats), ("10k rows", scaled[:10000], max(args.repeats // 10, 10))]
+    for name, X, repeats in cases:
+        print(f"\n{name}:")
+        for label, fn in (
+            ("sklearn predict_proba", predictor.model.predict_proba),
+            ("compiled forest", compiled.predict_proba),
+            ("MLRiskPredictor", predictor._predict_proba)
+        ):
+            p50, p99 = latency(fn, X, repeats)
+            print(f"  {label:<22} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark for concurrent department email generation.
+Runs the generation pipeline against a local stub model with a fixed
+per-call latency and reports throughput for sequential generation and for
+several worker counts, without calling the external model API. With
+--cache-pool the generator uses a GenerationCache of that pool size, which
+is cleared before each run.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_department_generation.py [--users 200] [--latency 0.05] [--rate 0] [--cache-pool 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.ai_utils import AIEmailGenerator
+from Utils.generation_cache_utils import GenerationCache
+from Utils.generation_utils import generate_emails_concurrently
+from Utils.llm_backend_utils import LLMBackend
+
+
+class StubBackend(LLMBackend):
+    """In-process backend that sleeps instead of calling the API."""
+
+    name = "sleep"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, prompt, max_output_tokens=None, timeout=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return "Subject: Stub security notice\nDear user,\nPlease verify your account.\nSMX IT Security Team"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency in seconds")
+    parser.add_argument("--rate", type=float, default=0, help="requests per second limit (0 = unlimited)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--cache-pool", type=int, default=0, help="generation cache pool size (0 = no cache)")
+    args = parser.parse_args()
+
+    cache = GenerationCache(pool_size=args.cache_pool, path=None) if args.cache_pool else None
+    generator = AIEmailGenerator(cache=cache, backend=StubBackend(args.latency))
+    users = [
+        {"id": i, "name": f"User {i}", "email": f"user{i}@smx.test", "department": "IT"}
+        for i in range(args.users)
+    ]
+
+    print(f"{'workers':>8} {'seconds':>9} {'emails/s':>9} {'errors':>7} {'model calls':>12}")
+    for workers in args.workers:
+        if cache:
+            cache.clear()
+        generator.backend.calls = 0
+        started = time.perf_counter()
+        results, errors = generate_emails_concurrently(
+            generator, users, template_type="urgent_action",
+            max_workers=workers, requests_per_second=args.rate
+        )
+        elapsed = time.perf_counter() - started
+        assert len(results) + len(errors) == len(users)
+        print(f"{workers:>8} {elapsed:>9.2f} {len(results) / elapsed:>9.1f} {len(errors):>7} {generator.backend.calls:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for hedged model requests.
+Sends the same prompts to the local stub model server, whose latency has a
+slow tail, with and without HedgedBackend and reports per-request latency
+percentiles, how many hedges were sent and how many of them won.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_hedging.py [--requests 400] [--workers 8] [--latency-ms 100]
+        [--tail-rate 0.05] [--tail-ms 2000] [--percentile 95] [--budget 0.1]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_stub_server import StubLLMServer
+from Utils.hedging_utils import HedgedBackend
+from Utils.llm_backend_utils import HTTPStubBackend
+
+
+def run(backend, prompts: list, workers: int) -> list:
+    """Send every prompt, returning per-request latencies in milliseconds."""
+    def timed(prompt: str) -> float:
+        started = time.perf_counter()
+        backend.generate(prompt)
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(timed, prompts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--sigma", type=float, default=0.3)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=2000.0)
+    parser.add_argument("--percentile", type=float, default=95.0)
+    parser.add_argument("--budget", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=0, latency_ms=args.latency_ms, latency_dist="lognormal", sigma=args.sigma,
+                           tail_rate=args.tail_rate, tail_ms=args.tail_ms, seed=42).start()
+    prompts = [f"Write a complete urgent action email for User {i} from IT department at SMX." for i in range(args.requests)]
+
+    try:
+        print(f"Stub latency: lognormal median {args.latency_ms:g} ms, {args.tail_rate:.0%} at {args.tail_ms:g} ms\n")
+        print(f"{'backend':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'stub calls':>11} {'hedges':>7} {'wins':>5}")
+        for name in ("plain", "hedged"):
+            backend = HTTPStubBackend(server.url)
+            if name == "hedged":
+                backend = HedgedBackend(backend, enabled=True, percentile=args.percentile, budget=args.budget,
+                                        initial_delay_ms=args.latency_ms * 3)
+            calls_before = server.stats()["requests"]
+            latencies = run(backend, prompts, args.workers)
+            calls = server.stats()["requests"] - calls_before
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            if name == "hedged":
+                stats = backend.snapshot()
+                hedges, wins = stats["hedges"], stats["hedge_wins"]
+                backend.stop()
+            else:
+                hedges = wins = 0
+            print(f"{name:<10} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {max(latencies):>8.0f} {calls:>11} {hedges:>7} {wins:>5}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark for AI email generation against the local stub model server.
+Starts Benchmarks/llm_stub_server.py in-process with the given latency and
+error distribution and drives AIEmailGenerator through HTTPStubBackend:
+department generation throughput and per-email latency percentiles for
+several worker counts, async generation with asyncio.gather, and streaming
+time to first chunk. No external model API is called.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_llm_backend.py [--users 200] [--latency-ms 200] [--latency-dist lognormal]
+        [--tail-rate 0.02] [--tail-ms 2000] [--error-rate 0.02]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_stub_server import LATENCY_DISTRIBUTIONS, StubLLMServer
+from Utils.ai_utils import AIEmailGenerator
+from Utils.generation_utils import generate_emails_concurrently
+from Utils.llm_backend_utils import HTTPStubBackend
+
+
+def percentiles(latencies_ms) -> str:
+    """p50/p95/p99 of a list of latencies."""
+    if not latencies_ms:
+        return "-"
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return f"{p50:7.0f} {p95:7.0f} {p99:7.0f}"
+
+
+class TimedBackend(HTTPStubBackend):
+    """HTTPStubBackend recording the latency of every successful request."""
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.latencies_ms = []
+
+    def generate(self, prompt, max_output_tokens=None, timeout=None):
+        started = time.perf_counter()
+        text = super().generate(prompt, max_output_tokens, timeout)
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--tail-rate", type=float, default=0.02)
+    parser.add_argument("--tail-ms", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server = StubLLMServer(
+        port=0, latency_ms=args.latency_ms, latency_dist=args.latency_dist, sigma=args.sigma,
+        tail_rate=args.tail_rate, tail_ms=args.tail_ms, error_rate=args.error_rate,
+        token_ms=args.token_ms, seed=args.seed
+    ).start()
+    users = [
+        {"id": i, "name": f"User {i}", "email": f"user{i}@smx.test", "department": "IT"}
+        for i in range(args.users)
+    ]
+
+    try:
+        # Failed model calls fall back to the basic template, so count them
+        # from the stub's point of view
+        print(f"Stub model at {server.url}: {args.latency_dist} latency, median {args.latency_ms:g} ms, "
+              f"{args.tail_rate:.0%} at {args.tail_ms:g} ms, {args.error_rate:.0%} errors\n")
+        print(f"{'workers':>8} {'seconds':>8} {'emails/s':>9} {'fallbacks':>10} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+        for workers in args.workers:
+            backend = TimedBackend(server.url)
+            generator = AIEmailGenerator(backend=backend)
+            errors_before = server.stats()["error"]
+            started = time.perf_counter()
+            results, errors = generate_emails_concurrently(
+                generator, users, template_type="urgent_action", max_workers=workers, requests_per_second=0
+            )
+            elapsed = time.perf_counter() - started
+            assert len(results) + len(errors) == len(users)
+            fallbacks = server.stats()["error"] - errors_before
+            print(f"{workers:>8} {elapsed:>8.2f} {len(results) / elapsed:>9.1f} {fallbacks:>10} {percentiles(backend.latencies_ms)}")
+
+        # Async generation: every prompt in flight at once on the event loop
+        backend = HTTPStubBackend(server.url)
+        prompts = [AIEmailGenerator(backend=backend)._build_prompt(user, "urgent_action") for user in users]
+
+        async def generate_all():
+            return await asyncio.gather(*(backend.agenerate(prompt) for prompt in prompts), return_exceptions=True)
+
+        started = time.perf_counter()
+        responses = asyncio.run(generate_all())
+        elapsed = time.perf_counter() - started
+        failed = sum(isinstance(response, Exception) for response in responses)
+        print(f"\nasync gather: {len(prompts)} prompts in {elapsed:.2f}s ({(len(prompts) - failed) / elapsed:.1f}/s, {failed} failed)")
+
+        started = time.perf_counter()
+        responses = backend.generate_batch(prompts, max_workers=32)
+        elapsed = time.perf_counter() - started
+        failed = sum(isinstance(response, Exception) for response in responses)
+        print(f"generate_batch (32 workers): {len(prompts)} prompts in {elapsed:.2f}s ({failed} failed)")
+
+        # Streaming: time to first chunk versus time to the whole response
+        first_chunk, complete = [], []
+        for prompt in prompts[:min(20, len(prompts))]:
+            started = time.perf_counter()
+            try:
+                for index, _ in enumerate(backend.stream(prompt)):
+                    if index == 0:
+                        first_chunk.append((time.perf_counter() - started) * 1000)
+            except Exception:
+                continue
+            complete.append((time.perf_counter() - started) * 1000)
+        print(f"\n{'stream':<16} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+        print(f"{'first chunk':<16} {percentiles(first_chunk)}")
+        print(f"{'full response':<16} {percentiles(complete)}")
+        print(f"\nStub counts: {server.stats()}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark for model call deadlines, retries and the circuit breaker.
+Generates a department campaign against the local stub model server in a
+healthy, a flaky and two outage scenarios (every request failing, every
+request hanging), once with the bare stub backend and once wrapped in
+ResilientBackend, and reports campaign time, per-email latency and how many
+emails fell back to the offline templates.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_model_resilience.py [--users 40] [--workers 8] [--latency-ms 100]
+        [--client-timeout 3] [--timeout 1] [--deadline 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_stub_server import StubLLMServer
+from Utils.ai_utils import AIEmailGenerator
+from Utils.generation_utils import generate_emails_concurrently
+from Utils.llm_backend_utils import HTTPStubBackend
+from Utils.resilience_utils import CircuitBreaker, ResilientBackend
+from Utils.template_engine_utils import EmailTemplateEngine
+
+# Stub failure settings per scenario
+SCENARIOS = {
+    "healthy": {"error_rate": 0.0, "hang_rate": 0.0},
+    "flaky (20% errors)": {"error_rate": 0.2, "hang_rate": 0.0},
+    "outage (all errors)": {"error_rate": 1.0, "hang_rate": 0.0},
+    "outage (all hang)": {"error_rate": 0.0, "hang_rate": 1.0}
+}
+
+
+class TimeoutStubBackend(HTTPStubBackend):
+    """Bare stub backend that applies a fixed client timeout to every request."""
+
+    def __init__(self, url: str, client_timeout: float):
+        super().__init__(url)
+        self.client_timeout = client_timeout
+
+    def generate(self, prompt, max_output_tokens=None, timeout=None):
+        return super().generate(prompt, max_output_tokens, timeout or self.client_timeout)
+
+
+def run(generator: AIEmailGenerator, users: list, workers: int) -> tuple:
+    """Generate one email per user, returning (seconds, per-email latencies in ms, fallbacks)."""
+    latencies = []
+    fallbacks = 0
+
+    class Timed:
+        templates = generator.templates
+
+        @staticmethod
+        def generate_phishing_email(user_info, template_type=None, on_model_call=None):
+            nonlocal fallbacks
+            started = time.perf_counter()
+            email = generator.generate_phishing_email(user_info, template_type, on_model_call)
+            latencies.append((time.perf_counter() - started) * 1000)
+            # Fallbacks are rendered from the offline templates, whose types differ
+            fallbacks += email["template_type"] not in generator.templates
+            return email
+
+    started = time.perf_counter()
+    results, errors = generate_emails_concurrently(Timed, users, "urgent_action", max_workers=workers, requests_per_second=0)
+    assert len(results) == len(users) and not errors
+    return time.perf_counter() - started, latencies, fallbacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--client-timeout", type=float, default=3.0, help="bare backend client timeout (seconds)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="resilient per-attempt timeout (seconds)")
+    parser.add_argument("--deadline", type=float, default=3.0, help="resilient per-call deadline (seconds)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--threshold", type=int, default=5, help="circuit breaker failure threshold")
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=0, latency_ms=args.latency_ms, latency_dist="lognormal", sigma=0.3,
+                           hang_seconds=args.client_timeout * 2, seed=42).start()
+    engine = EmailTemplateEngine()
+    users = [
+        {"id": i, "name": f"User {i}", "email": f"user{i}@smx.test", "department": "IT"}
+        for i in range(args.users)
+    ]
+
+    print(f"\n{'scenario':<22} {'backend':<10} {'seconds':>8} {'fallbacks':>10} {'p50 ms':>8} {'p99 ms':>8} {'circuit':>10}")
+    try:
+        for scenario, settings in SCENARIOS.items():
+            for name in ("bare", "resilient"):
+                server.error_rate = settings["error_rate"]
+                server.hang_rate = settings["hang_rate"]
+                backend = TimeoutStubBackend(server.url, args.client_timeout)
+                if name == "resilient":
+                    backend = ResilientBackend(
+                        backend, CircuitBreaker(args.threshold, reset_seconds=60),
+                        timeout=args.timeout, deadline=args.deadline, retries=args.retries,
+                        base_delay=0.05, max_delay=0.5
+                    )
+                generator = AIEmailGenerator(backend=backend, fallback=engine)
+                seconds, latencies, fallbacks = run(generator, users, args.workers)
+                p50, p99 = np.percentile(latencies, [50, 99])
+                circuit = backend.breaker.state if name == "resilient" else "-"
+                print(f"{scenario:<22} {name:<10} {seconds:>8.2f} {fallbacks:>10} {p50:>8.0f} {p99:>8.0f} {circuit:>10}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for streamed email generation.
+Generates emails against the local stub model server, once waiting for the
+whole response (generate_phishing_email) and once streaming it
+(stream_phishing_email), and reports the time until the first subject
+text, the first body text and the complete email. The stub answers whole
+responses after its latency alone, so for the blocking run the latency is
+raised to the median time a stream takes to finish, as a model writing
+the same email would. Checks that the streamed subject and body deltas
+add up to the parsed email.
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_streaming_generation.py [--emails 20] [--latency-ms 400] [--token-ms 15]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_stub_server import StubLLMServer
+from Utils.ai_utils import AIEmailGenerator
+from Utils.llm_backend_utils import HTTPStubBackend
+
+
+def run_blocking(generator: AIEmailGenerator, user: dict) -> dict:
+    """Generate one email, returning its timings in milliseconds."""
+    started = time.perf_counter()
+    generator.generate_phishing_email(user, "urgent_action")
+    elapsed = (time.perf_counter() - started) * 1000
+    return {"subject": elapsed, "body": elapsed, "email": elapsed}
+
+
+def run_streaming(generator: AIEmailGenerator, user: dict) -> dict:
+    """Stream one email, returning when each part first arrived in milliseconds."""
+    started = time.perf_counter()
+    timings = {}
+    streamed = {"subject": "", "body": ""}
+    for event, data in generator.stream_phishing_email(user, "urgent_action"):
+        timings.setdefault(event, (time.perf_counter() - started) * 1000)
+        if event == "email":
+            email = data
+        else:
+            streamed[event] += data
+    assert streamed["subject"].strip() == email["subject"], (streamed["subject"], email["subject"])
+    assert streamed["body"].split() == email["body"].split(), "streamed body differs from the parsed body"
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="stub time to the first token")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="stub delay between streamed words")
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=0, latency_ms=args.latency_ms, latency_dist="fixed", token_ms=args.token_ms, seed=42).start()
+    generator = AIEmailGenerator(backend=HTTPStubBackend(server.url))
+    users = [{"id": i, "name": f"User {i}", "email": f"user{i}@smx.test", "department": "IT"} for i in range(args.emails)]
+
+    print(f"Stub: {args.latency_ms:g} ms to the first token, {args.token_ms:g} ms per word\n")
+    print(f"{'mode':<10} {'subject p50 ms':>15} {'body p50 ms':>12} {'email p50 ms':>13}")
+    try:
+        results = {}
+        for name, run in (("streaming", run_streaming), ("blocking", run_blocking)):
+            timings = [run(generator, user) for user in users]
+            results[name] = {part: np.percentile([t[part] for t in timings], 50) for part in ("subject", "body", "email")}
+            server.latency_ms = results[name]["email"]
+        for name in ("blocking", "streaming"):
+            p50 = results[name]
+            print(f"{name:<10} {p50['subject']:>15.0f} {p50['body']:>12.0f} {p50['email']:>13.0f}")
+        print("\n✅ Streamed subject and body deltas match the parsed emails")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
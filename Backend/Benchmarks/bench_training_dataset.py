@@ -0,0 +1,125 @@
+"""
+Benchmark for building the risk model's training dataset.
+Seeds a throwaway SQLite database, checks that the streamed, chunk-merged
+aggregates match a single pass over the whole email_logs table, round-trips
+the dataset through a Parquet snapshot (when pyarrow is installed), then
+reports wall time and peak traced memory of:
+  - the original path: every log as an ORM object, converted to dicts with
+    ISO-string timestamps
+  - reading the whole table into one DataFrame and aggregating it
+  - build_training_dataset streaming chunks into typed columns
+  - reading the Parquet snapshot back
+
+Usage (from the Backend directory):
+    python Benchmarks/bench_training_dataset.py [--logs 300000] [--users 5000] [--chunk-size 50000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_clicks_by_department import seed
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import models
+from models import Base
+from Utils import dataset_utils
+from Utils.dataset_utils import aggregate_email_logs, aggregate_log_columns, build_training_dataset
+
+
+def legacy_training_inputs(db):
+    """
+    The original train_risk_model data loading, kept here for comparison.
+    Logs are grouped with a dict rather than rescanned per user, so only the
+    cost of materializing ORM objects and dicts is measured.
+    """
+    users = db.query(models.User).all()
+    email_logs = db.query(models.EmailLog).all()
+    logs_by_user = {}
+    for email in email_logs:
+        logs_by_user.setdefault(email.user_id, []).append({
+            "user_id": email.user_id,
+            "clicked": email.clicked,
+            "sent_at": email.sent_at.isoformat() if email.sent_at else None,
+            "clicked_at": email.clicked_at.isoformat() if email.clicked_at else None,
+            "template_type": email.template_type
+        })
+    return [
+        {"user": {"id": user.id, "name": user.name, "department": user.department}, "emails": logs_by_user[user.id]}
+        for user in users if user.id in logs_by_user
+    ]
+
+
+def whole_table_aggregates(db):
+    """Aggregate email logs after reading the whole table at once."""
+    log = models.EmailLog
+    query = select(log.user_id, log.clicked, log.responded, log.sent_at, log.clicked_at, log.template_type)
+    return aggregate_log_columns(pd.read_sql(query, db.connection()))
+
+
+def measure(fn):
+    """Return (result, seconds, peak traced MB) of one call of fn."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=dataset_utils.DEFAULT_LOG_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.logs, n_users=args.users)
+        db = sessionmaker(bind=engine)()
+        try:
+            # Parity: chunk-merged aggregates against one pass over every log
+            streamed = aggregate_email_logs(db, chunk_size=args.chunk_size).set_index("user_id").sort_index()
+            whole = whole_table_aggregates(db).set_index("user_id").sort_index()
+            pd.testing.assert_frame_equal(streamed, whole[streamed.columns], check_dtype=False, rtol=1e-9)
+            print(f"✅ Parity: streamed aggregates match a single pass for {len(whole):,} users")
+
+            snapshot_path = os.path.join(tmp, "training_snapshot.parquet")
+            if dataset_utils.pq is not None:
+                dataset = build_training_dataset(db, chunk_size=args.chunk_size)
+                dataset_utils.write_snapshot(dataset, snapshot_path)
+                pd.testing.assert_frame_equal(dataset_utils.read_snapshot(snapshot_path), dataset)
+                print(f"✅ Snapshot round trip: {os.path.getsize(snapshot_path) / 1e6:.2f} MB on disk")
+
+            cases = [
+                ("ORM objects -> dicts", lambda: legacy_training_inputs(db)),
+                ("whole-table DataFrame", lambda: whole_table_aggregates(db)),
+                (f"streamed ({args.chunk_size:,}/chunk)", lambda: build_training_dataset(db, chunk_size=args.chunk_size))
+            ]
+            if dataset_utils.pq is not None:
+                cases.append(("Parquet snapshot", lambda: dataset_utils.read_snapshot(snapshot_path)))
+
+            print(f"\n{args.logs:,} logs / {args.users:,} users")
+            print(f"{'path':<28} {'seconds':>9} {'peak MB':>9}")
+            for name, fn in cases:
+                db.expunge_all()
+                _, seconds, peak_mb = measure(fn)
+                print(f"{name:<28} {seconds:>9.2f} {peak_mb:>9.1f}")
+        finally:
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
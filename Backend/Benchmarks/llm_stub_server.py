@@ -0,0 +1,299 @@
+"""
+Local HTTP stub of the text generation model.
+Answers the generation prompts with a plausible phishing email after a
+latency drawn from a configurable distribution, and fails a configurable
+share of requests (HTTP 500, HTTP 429 throttling, or hanging past the
+client's deadline), so generation throughput and tail latency can be
+measured without the external model API. Prompts asking for several email
+versions get that many delimited emails, taking proportionally longer, with
+a configurable share of them malformed. HTTPStubBackend in
+Utils/llm_backend_utils.py is its client.
+
+Endpoints:
+    POST /generate  {"prompt": ...}  ->  {"text": ...}
+    POST /stream    {"prompt": ...}  ->  one {"text": chunk} JSON object per line
+    GET  /stats                      ->  request and outcome counts
+
+Usage (from the Backend directory):
+    python Benchmarks/llm_stub_server.py [--port 8765] [--latency-ms 800] [--latency-dist lognormal]
+        [--sigma 0.5] [--tail-rate 0.02] [--tail-ms 8000] [--error-rate 0.01] [--throttle-rate 0]
+        [--hang-rate 0] [--token-ms 15] [--batch-cost 0.4] [--malformed-rate 0]
+
+Point the API at it with LLM_BACKEND=stub and LLM_STUB_URL=http://127.0.0.1:8765.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Filler sentences the stub email body is built from
+BODY_SENTENCES = [
+    "Our monitoring systems flagged an unusual sign-in to your SMX account from IP address 185.220.101.47.",
+    "To protect your data, access will be restricted until your identity has been confirmed.",
+    "Please complete the verification through the secure portal before 17:00 today.",
+    "If the verification is not completed in time, your mailbox and shared drives will be locked.",
+    "This is an automated notice, so please do not reply to this message."
+]
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server that ignores clients disconnecting mid-response (e.g. after their timeout)."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubLLMServer:
+    """
+    Threaded stub model server with random latency and failures.
+    Every request first draws its outcome: error, throttle or hang with
+    the configured probabilities, otherwise success after the sampled
+    latency. Streams spread that latency as time to the first chunk and
+    then token_ms per word.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        latency_ms: float = 800.0,
+        latency_dist: str = "lognormal",
+        sigma: float = 0.5,
+        tail_rate: float = 0.0,
+        tail_ms: float = 8000.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_seconds: float = 120.0,
+        token_ms: float = 15.0,
+        batch_cost: float = 0.4,
+        malformed_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Configure the server; nothing listens until start() or serve_forever().
+
+        Args:
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+            latency_ms: Median response latency (the value itself for "fixed")
+            latency_dist: "fixed", "uniform" (0 to 2x), "exponential" or "lognormal"
+            sigma: Log-space standard deviation for "lognormal"
+            tail_rate: Share of successful requests delayed by tail_ms instead
+            tail_ms: Latency of tail requests
+            error_rate: Share of requests answered with HTTP 500
+            throttle_rate: Share of requests answered with HTTP 429
+            hang_rate: Share of requests that hang for hang_seconds
+            hang_seconds: How long hanging requests hang before failing
+            token_ms: Delay between streamed words
+            batch_cost: Extra latency of each additional email in a batched
+                response, as a share of the sampled latency
+            malformed_rate: Share of batched emails written without a Subject: line
+            seed: Random seed for reproducible runs
+        """
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency_dist}', expected one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.sigma = sigma
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.token_ms = token_ms
+        self.batch_cost = batch_cost
+        self.malformed_rate = malformed_rate
+        self.counts = {"requests": 0, "ok": 0, "error": 0, "throttled": 0, "hung": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.httpd = QuietHTTPServer((host, port), self._handler())
+
+    @property
+    def url(self) -> str:
+        """Base URL the server listens on."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def sample_latency(self) -> float:
+        """Draw one successful response latency in seconds."""
+        with self._lock:
+            if self._random.random() < self.tail_rate:
+                return self.tail_ms / 1000
+            if self.latency_dist == "fixed":
+                latency = self.latency_ms
+            elif self.latency_dist == "uniform":
+                latency = self._random.uniform(0, 2 * self.latency_ms)
+            elif self.latency_dist == "exponential":
+                # Median of an exponential is mean * ln 2
+                latency = self._random.expovariate(0.6931471805599453 / self.latency_ms) if self.latency_ms > 0 else 0.0
+            else:
+                latency = self.latency_ms * self._random.lognormvariate(0, self.sigma)
+        return latency / 1000
+
+    def outcome(self) -> str:
+        """Draw a request outcome and count it."""
+        with self._lock:
+            draw = self._random.random()
+            if draw < self.error_rate:
+                outcome = "error"
+            elif draw < self.error_rate + self.throttle_rate:
+                outcome = "throttled"
+            elif draw < self.error_rate + self.throttle_rate + self.hang_rate:
+                outcome = "hung"
+            else:
+                outcome = "ok"
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+        return outcome
+
+    @staticmethod
+    def email_count(prompt: str) -> int:
+        """Number of email versions a prompt asks for."""
+        match = re.search(r"Write (\d+) distinct versions", prompt)
+        return int(match.group(1)) if match else 1
+
+    def email_text(self, prompt: str) -> str:
+        """Phishing email(s) answering a generation prompt, addressed to the recipient it names."""
+        match = re.search(r"for (.+?) from (.+?) department", prompt)
+        name = match.group(1) if match else "there"
+        count = self.email_count(prompt)
+        emails = []
+        for n in range(1, count + 1):
+            with self._lock:
+                malformed = count > 1 and self._random.random() < self.malformed_rate
+                reference = self._random.randrange(100000, 1000000)
+            subject = "" if malformed else f"Subject: Action Required: Verify Your SMX Account (Case {reference})\n"
+            body = "\n\n".join(BODY_SENTENCES) + f"\n\nCase reference: SMX-{reference}"
+            email = subject + f"Dear {name},\n\n" + body + "\n\nSMX IT Security Team"
+            emails.append(f"=== EMAIL {n} ===\n{email}" if count > 1 else email)
+        return "\n\n".join(emails)
+
+    def stats(self) -> Dict[str, Any]:
+        """Request and outcome counts."""
+        with self._lock:
+            return dict(self.counts)
+
+    def _handler(self):
+        """Request handler class bound to this server."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    self._send_json(200, server.stats())
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path not in ("/generate", "/stream"):
+                    self._send_json(404, {"error": "not found"})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                prompt = json.loads(self.rfile.read(length) or b"{}").get("prompt", "")
+                outcome = server.outcome()
+                if outcome == "error":
+                    self._send_json(500, {"error": "internal model error"})
+                    return
+                if outcome == "throttled":
+                    self._send_json(429, {"error": "rate limit exceeded"})
+                    return
+                if outcome == "hung":
+                    server._stopped.wait(server.hang_seconds)
+                    self._send_json(504, {"error": "model timed out"})
+                    return
+
+                text = server.email_text(prompt)
+                latency = server.sample_latency() * (1 + server.batch_cost * (server.email_count(prompt) - 1))
+                if self.path == "/generate":
+                    time.sleep(latency)
+                    self._send_json(200, {"text": text})
+                    return
+
+                # Stream word by word: the latency is the time to the first chunk
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                time.sleep(latency)
+                words = re.findall(r"\S+\s*", text)
+                for index, word in enumerate(words):
+                    if index:
+                        time.sleep(server.token_ms / 1000)
+                    self.wfile.write((json.dumps({"text": word}) + "\n").encode())
+                    self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "StubLLMServer":
+        """Serve on a background thread; returns self."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release hanging requests."""
+        self._stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median response latency")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal log-space standard deviation")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of requests taking --tail-ms")
+    parser.add_argument("--tail-ms", type=float, default=8000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of HTTP 429 responses")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests hanging for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--token-ms", type=float, default=15.0, help="delay between streamed words")
+    parser.add_argument("--batch-cost", type=float, default=0.4, help="extra latency per additional batched email")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of batched emails missing a subject")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StubLLMServer(
+        args.host, args.port, args.latency_ms, args.latency_dist, args.sigma, args.tail_rate, args.tail_ms,
+        args.error_rate, args.throttle_rate, args.hang_rate, args.hang_seconds, args.token_ms,
+        args.batch_cost, args.malformed_rate, args.seed
+    )
+    print(f"✅ Stub model listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,214 @@
 """
 AI Utilities for Phishing Simulation Platform
 This module provides AI-powered functionality for generating phishing emails and analyzing user behavior.
-It uses Google's Gemma-3n-e4b-it model for email generation and scikit-learn for behavior analysis.
+It uses Google's Gemma-3n-e4b-it model (through a pluggable LLM backend) for email generation and
+scikit-learn for behavior analysis.
 """
 
 import os
-from typing import List, Dict, Any
-import google.generativeai as genai
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from datetime import datetime
 import joblib
+from Utils.behavior_stats_utils import delay_stats, hour_distribution, weekday_distribution
+from Utils.forest_utils import CompiledForest
+from Utils.generation_cache_utils import GenerationCache
+from Utils.llm_backend_utils import DEFAULT_MAX_OUTPUT_TOKENS, LLMBackend, create_backend
+from Utils.resilience_utils import ModelCallMetrics, error_outcome
+from Utils.streaming_utils import EmailStreamParser
 
 # Load environment variables for API keys and configuration
 load_dotenv()
 
-# Initialize Google Generative AI with API key from environment variables
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Locations of the persisted risk prediction model and its feature scaler
+RISK_MODEL_PATH = "Models/risk_predictor.joblib"
+RISK_SCALER_PATH = "Models/risk_scaler.joblib"
+
+# Locations of the incrementally trained risk model and its streaming scaler
+ONLINE_RISK_MODEL_PATH = "Models/online_risk_predictor.joblib"
+ONLINE_RISK_SCALER_PATH = "Models/online_risk_scaler.joblib"
+
+# Version of the generation prompts; bump it when a prompt changes so cached
+# emails written for the old prompt are no longer served
+PROMPT_VERSION = "1"
+
+# Line starting each email in a batched response ("=== EMAIL 2 ==="); the
+# pattern also accepts the variations models drift into ("## Email 2", "**EMAIL 2**")
+BATCH_DELIMITER = "=== EMAIL {n} ==="
+BATCH_DELIMITER_PATTERN = re.compile(r"^[ \t]*[=#*\-]*[ \t]*EMAIL[ \t]*#?[ \t]*(\d+)[ \t]*[=#*\-:]*[ \t]*$", re.IGNORECASE | re.MULTILINE)
+
+# Prompts sent for one batch before giving up on its malformed items
+BATCH_MAX_ATTEMPTS = 3
+
+# Shortest body accepted from a batched response
+MIN_BATCH_BODY_CHARS = 40
 
 class AIEmailGenerator:
     """
     AI-powered email generator for creating sophisticated phishing emails.
     Uses Google's Gemma-3n-e4b-it model to generate personalized and context-aware emails.
+    With a GenerationCache, emails are generated once per template type and
+    department for a placeholder recipient and personalized per user.
+    Every model call is timed per template type, and failed generations
+    fall back to the offline templates when a template engine is given.
     """
     
-    def __init__(self):
+    # Recipient name used in cached prompts and replaced with the real name;
+    # a single unusual word so the model reproduces it verbatim
+    NAME_PLACEHOLDER = "Zephyrine"
+    
+    # Offline template type closest to each AI template type, used for fallbacks
+    FALLBACK_TEMPLATE_TYPES = {
+        "urgent_action": "account_security",
+        "security_alert": "account_security",
+        "password_expiry": "password_reset"
+    }
+    
+    def __init__(
+        self,
+        cache: Optional[GenerationCache] = None,
+        backend: Optional[LLMBackend] = None,
+        fallback=None
+    ):
         """
         Initialize the email generator with predefined template types.
         Each template type represents a different phishing scenario.
+        
+        Args:
+            cache: Optional cache of generated emails shared across users
+            backend: Text generation backend; defaults to the one selected
+                by LLM_BACKEND (Gemma through Google's API)
+            fallback: Optional EmailTemplateEngine rendering the emails sent
+                when generation fails; without it a basic email is sent
         """
+        self.cache = cache
         self.templates = {
             "urgent_action": "Your account requires immediate attention",
             "security_alert": "Security verification needed",
             "password_expiry": "Password expiration notice",
             "system_update": "System maintenance required"
         }
-        # Initialize the Gemma model
-        self.model = genai.GenerativeModel('gemma-3n-e4b-it')
+        # The model client is created on the backend's first request
+        self.backend = backend or create_backend()
+        self.fallback = fallback
+        self.call_metrics = ModelCallMetrics()
 
-    def generate_phishing_email(self, user_info: Dict[str, Any], template_type: str = None) -> Dict[str, str]:
+    def generate_phishing_email(
+        self,
+        user_info: Dict[str, Any],
+        template_type: str = None,
+        on_model_call: Optional[Callable[[], None]] = None
+    ) -> Dict[str, str]:
         """
         Generate a sophisticated phishing email using Google's Gemma AI.
         
         Args:
             user_info: Dictionary containing user details (name, email, department)
             template_type: Optional specific template type to use
+            on_model_call: Optional callable run right before each model
+                request (e.g. a rate limiter); cache hits and requests the
+                backend refuses (circuit open) skip it
             
         Returns:
-            Dictionary containing generated email data (subject, body, template_type, generated_at)
+            Dictionary containing generated email data (subject, body,
+            template_type, generated_at and cached)
             
         Note:
-            If AI generation fails, falls back to a basic template
+            If AI generation fails, falls back to an offline template or a
+            basic email
         """
         if not template_type:
             template_type = np.random.choice(list(self.templates.keys()))
+        
+        def generate(recipient: Dict[str, Any]) -> Dict[str, str]:
+            if on_model_call and self.backend.available():
+                on_model_call()
+            subject, body = self._generate_content(self._build_prompt(recipient, template_type), template_type)
+            return {"subject": subject, "body": body}
+        
+        try:
+            if self.cache is not None and self.cache.enabled:
+                department = user_info.get('department')
+                email, cached = self.cache.get_or_generate(
+                    (template_type, department, PROMPT_VERSION),
+                    lambda: self.generate_template_email(template_type, department, on_model_call)
+                )
+                email = self.personalize(email, user_info)
+            else:
+                email, cached = generate(user_info), False
+        except Exception as e:
+            print(f"Error generating email with the {self.backend.name} backend: {str(e)}")
+            return self._fallback_email(user_info, template_type)
+        
+        return {
+            "subject": email["subject"],
+            "body": email["body"],
+            "template_type": template_type,
+            "generated_at": datetime.utcnow(),
+            "cached": cached
+        }
 
+    def generate_template_email(
+        self,
+        template_type: str,
+        department: str,
+        on_model_call: Optional[Callable[[], None]] = None
+    ) -> Dict[str, str]:
+        """
+        Generate an email for the placeholder recipient, to be personalized later.
+        
+        Args:
+            template_type: Template type to write
+            department: Recipient department
+            on_model_call: Optional callable run right before the model request
+            
+        Returns:
+            Dictionary with subject and body containing NAME_PLACEHOLDER
+            
+        Raises:
+            Exception: If the model call fails
+        """
+        if on_model_call and self.backend.available():
+            on_model_call()
+        prompt = self._build_prompt({"name": self.NAME_PLACEHOLDER, "department": department}, template_type)
+        subject, body = self._generate_content(prompt, template_type)
+        return {"subject": subject, "body": body}
+
+    def personalize(self, email: Dict[str, str], user_info: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Fill the recipient's name into an email generated for the placeholder recipient.
+        
+        Args:
+            email: Dictionary with subject and body from generate_template_email
+            user_info: Dictionary containing the recipient's name
+            
+        Returns:
+            Dictionary with the personalized subject and body
+        """
+        name = user_info.get('name') or ""
+        return {field: email[field].replace(self.NAME_PLACEHOLDER, name) for field in ("subject", "body")}
+
+    def _build_prompt(self, user_info: Dict[str, Any], template_type: str) -> str:
+        """
+        Build the generation prompt for a recipient and template type.
+        
+        Args:
+            user_info: Dictionary with the recipient's name and department
+            template_type: Template type to write
+            
+        Returns:
+            Prompt text
+        """
         # Construct a more direct prompt for the Gemma model
         if template_type == "urgent_action":
             prompt = f"""Write a complete urgent action email for {user_info['name']} from {user_info['department']} department at SMX.
@@ -105,31 +255,175 @@ Format as:
 Subject: [specific subject]
 [complete email body with all details filled in - no placeholders, signed by SMX Team]"""
 
+        return prompt
+
+    def _generate_content(self, prompt: str, template_type: str = "unknown") -> tuple:
+        """
+        Call the generation backend and parse the email it writes.
+        
+        Args:
+            prompt: Generation prompt
+            template_type: Template type the call's latency and outcome are recorded under
+            
+        Returns:
+            Tuple of (subject, body)
+        """
+        return self._parse_email_content(self._call_model(prompt, template_type))
+
+    def _call_model(self, prompt: str, template_type: str, max_output_tokens: Optional[int] = None) -> str:
+        """Call the generation backend, recording the call's latency and outcome under the template type."""
+        started = time.perf_counter()
         try:
-            # Call Google's Gemma API to generate email content
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=300,
-                    top_p=0.8,
-                    top_k=40
+            text = self.backend.generate(prompt, max_output_tokens)
+        except Exception as e:
+            self.call_metrics.observe(template_type, (time.perf_counter() - started) * 1000, error_outcome(e))
+            raise
+        self.call_metrics.observe(template_type, (time.perf_counter() - started) * 1000, "ok")
+        return text
+
+    def stream_phishing_email(
+        self,
+        user_info: Dict[str, Any],
+        template_type: str = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Generate a phishing email while passing the model's text on as it arrives.
+        
+        Args:
+            user_info: Dictionary containing user details (name, email, department)
+            template_type: Optional specific template type to use
+        
+        Yields:
+            ("subject", text) and ("body", text) deltas as the model writes
+            them, then one ("email", email) with the parsed email dictionary
+            as generate_phishing_email returns it
+        
+        Note:
+            If the stream fails, the final email is an offline template or
+            basic email that replaces any text already passed on
+        """
+        if not template_type:
+            template_type = np.random.choice(list(self.templates.keys()))
+        
+        parser = EmailStreamParser()
+        started = time.perf_counter()
+        try:
+            for chunk in self.backend.stream(self._build_prompt(user_info, template_type)):
+                yield from parser.feed(chunk)
+        except Exception as e:
+            self.call_metrics.observe(template_type, (time.perf_counter() - started) * 1000, error_outcome(e))
+            print(f"Error streaming email with the {self.backend.name} backend: {str(e)}")
+            yield "email", self._fallback_email(user_info, template_type)
+            return
+        self.call_metrics.observe(template_type, (time.perf_counter() - started) * 1000, "ok")
+        
+        subject, body = self._parse_email_content(parser.text)
+        yield "email", {
+            "subject": subject,
+            "body": body,
+            "template_type": template_type,
+            "generated_at": datetime.utcnow(),
+            "cached": False
+        }
+
+    def generate_email_batch(
+        self,
+        template_type: str,
+        department: str,
+        count: int,
+        on_model_call: Optional[Callable[[], None]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Generate several distinct emails for the placeholder recipient in one model call.
+        The model is asked for `count` emails separated by BATCH_DELIMITER
+        lines; malformed or duplicate items are dropped and only the missing
+        number is asked for again, up to BATCH_MAX_ATTEMPTS prompts.
+        
+        Args:
+            template_type: Template type to write
+            department: Recipient department
+            count: Number of emails wanted
+            on_model_call: Optional callable run right before each model request
+            
+        Returns:
+            Up to `count` dictionaries with subject and body containing
+            NAME_PLACEHOLDER, to be personalized; fewer if the model kept
+            returning malformed items
+            
+        Raises:
+            Exception: If the first model call fails
+        """
+        emails = []
+        seen = set()
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            missing = count - len(emails)
+            if missing <= 0:
+                break
+            if on_model_call and self.backend.available():
+                on_model_call()
+            try:
+                text = self._call_model(
+                    self._build_batch_prompt(template_type, department, missing),
+                    template_type,
+                    max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS * missing
                 )
-            )
+            except Exception:
+                if not emails:
+                    raise
+                break
+            for email in self._parse_email_batch(text):
+                key = (email["subject"], email["body"])
+                if key not in seen and len(emails) < count:
+                    seen.add(key)
+                    emails.append(email)
+        return emails
+
+    def _build_batch_prompt(self, template_type: str, department: str, count: int) -> str:
+        """
+        Build a prompt asking for several distinct emails in the batch delimiter format.
+        
+        Args:
+            template_type: Template type to write
+            department: Recipient department
+            count: Number of emails wanted
             
-            # Parse the generated content
-            email_content = response.text
-            subject, body = self._parse_email_content(email_content)
+        Returns:
+            Prompt text
+        """
+        prompt = self._build_prompt({"name": self.NAME_PLACEHOLDER, "department": department}, template_type)
+        if count == 1:
+            return prompt
+        return f"""{prompt}
+
+Write {count} distinct versions of this email, each with a different subject and different specific details, all addressed to {self.NAME_PLACEHOLDER}.
+Start each version with a line containing only "{BATCH_DELIMITER.format(n=1)}", numbering them from 1 to {count}, followed by its Subject: line and body. Write nothing before the first version."""
+
+    def _parse_email_batch(self, content: str) -> List[Dict[str, str]]:
+        """
+        Split a batched response into emails and keep the well-formed ones.
+        Items are split on delimiter lines and parsed with
+        _parse_email_content; items without a Subject: line or with a body
+        shorter than MIN_BATCH_BODY_CHARS are dropped. A response without
+        any delimiter is treated as a single item.
+        
+        Args:
+            content: Raw batched response from the model
             
-            return {
-                "subject": subject,
-                "body": body,
-                "template_type": template_type,
-                "generated_at": datetime.utcnow()
-            }
-        except Exception as e:
-            print(f"Error generating email with Gemma: {str(e)}")
-            return self._fallback_email(user_info, template_type)
+        Returns:
+            List of dictionaries with subject and body
+        """
+        parts = BATCH_DELIMITER_PATTERN.split(content)
+        items = parts[2::2] if len(parts) > 1 else parts
+        emails = []
+        for item in items:
+            subject_line = re.search(r"^[ \t]*subject:", item, re.IGNORECASE | re.MULTILINE)
+            if not subject_line:
+                continue
+            # Start at the Subject: line so stray text before it is not taken as the subject
+            subject, body = self._parse_email_content(item[subject_line.start():])
+            if len(body) >= MIN_BATCH_BODY_CHARS:
+                emails.append({"subject": subject, "body": body})
+        return emails
 
     def _parse_email_content(self, content: str) -> tuple:
         """
@@ -181,67 +475,168 @@ Subject: [specific subject]
             template_type: Template type to use
             
         Returns:
-            Dictionary containing fallback email data
+            Dictionary containing fallback email data; with a fallback
+            template engine its template_type is the offline template's
         """
+        if self.fallback is not None:
+            offline_type = self.FALLBACK_TEMPLATE_TYPES.get(template_type)
+            try:
+                return self.fallback.render(user_info, offline_type if offline_type in self.fallback.templates else None)
+            except Exception as e:
+                print(f"⚠️ Rendering fallback template failed: {str(e)}")
         subject = f"Action Required: {self.templates.get(template_type, 'Important Notice')}"
         body = f"Dear {user_info['name']},\n\nThis is an automated message from SMX regarding your account security. Please verify your credentials immediately.\n\nBest regards,\nSMX IT Security Team"
         return {
             "subject": subject,
             "body": body,
             "template_type": template_type,
-            "generated_at": datetime.utcnow()
+            "generated_at": datetime.utcnow(),
+            "cached": False
         }
 
 class AIAnalyzer:
     """
     AI-powered analyzer for user behavior and risk assessment.
     Uses machine learning to detect anomalies and assess risk levels.
+    The anomaly model is fitted once across every user's behaviour metrics
+    and cached until the underlying data changes; analyses of any subset of
+    users score them against that population model in one call.
     """
     
+    # Per-user metrics the anomaly model is fitted on
+    ANOMALY_FEATURES = ["click_rate", "response_rate", "avg_response_time"]
+    
+    # Fewer users than this give the Isolation Forest nothing to compare
+    MIN_ANOMALY_USERS = 10
+    
     def __init__(self):
         """
-        Initialize the analyzer with an Isolation Forest model for anomaly detection.
+        Initialize the analyzer; the Isolation Forest is fitted on first use.
         """
-        self.model = IsolationForest(contamination=0.1, random_state=42)
+        self.model = None
+        self.model_version = None
+        self._fit_lock = threading.Lock()
 
-    def analyze_user_behavior(self, email_logs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    @staticmethod
+    def user_metrics(email_logs: pd.DataFrame) -> pd.DataFrame:
         """
-        Analyze user behavior patterns and identify potential risks.
+        Compute per-user behaviour metrics from columnar email logs in one grouped pass.
         
         Args:
-            email_logs: List of email log entries to analyze
+            email_logs: DataFrame with user_id, clicked, responded and
+                optionally sent_at and responded_at
+            
+        Response times count responded emails with both timestamps.
+            
+        Returns:
+            DataFrame with user_id, emails, click_rate, response_rate,
+            avg_response_time (hours) and timed_responses
+        """
+        grouped = pd.DataFrame({
+            "user_id": email_logs['user_id'],
+            "clicked": email_logs['clicked'].fillna(False).astype(float),
+            "responded": email_logs['responded'].fillna(False).astype(float)
+        }).groupby("user_id")
+        response_times = delay_stats(email_logs, "responded", by="user_id", unit="hours", percentiles=())
+        metrics = pd.DataFrame({
+            "emails": grouped.size(),
+            "click_rate": grouped["clicked"].mean(),
+            "response_rate": grouped["responded"].mean(),
+            "avg_response_time": response_times["mean"],
+            "timed_responses": response_times["count"]
+        })
+        return metrics.reset_index()
+
+    def fit(self, metrics: pd.DataFrame, version: Any = None) -> bool:
+        """
+        Fit the anomaly model across a population of users.
+        
+        Args:
+            metrics: Per-user metrics from user_metrics or user_behavior_metrics
+            version: Data version the model was fitted on
+            
+        Returns:
+            True if a model was fitted, False if there are too few users
+        """
+        model = None
+        if len(metrics) >= self.MIN_ANOMALY_USERS:
+            model = IsolationForest(contamination=0.1, random_state=42)
+            model.fit(metrics[self.ANOMALY_FEATURES].to_numpy(dtype=float))
+        # Swap both together so concurrent analyses see a consistent model
+        self.model, self.model_version = model, version
+        return model is not None
+
+    def ensure_fitted(self, version: Any, load_metrics: Callable[[], pd.DataFrame]) -> bool:
+        """
+        Refit the anomaly model if the data has changed since it was fitted.
+        
+        Args:
+            version: Current data version
+            load_metrics: Callable returning the whole population's metrics
+            
+        Returns:
+            True if a model is available
+        """
+        if self.model_version != version:
+            with self._fit_lock:
+                if self.model_version != version:
+                    self.fit(load_metrics(), version)
+        return self.model is not None
+
+    def score_users(self, metrics: pd.DataFrame) -> pd.DataFrame:
+        """
+        Score users against the fitted anomaly model in one call.
+        
+        Args:
+            metrics: Per-user metrics
+            
+        Returns:
+            Copy of metrics with anomaly_score (lower is more anomalous) and
+            is_anomaly columns; without a fitted model nobody is flagged
+        """
+        scored = metrics.copy()
+        model = self.model
+        if model is None or scored.empty:
+            scored["anomaly_score"] = 0.0
+            scored["is_anomaly"] = False
+            return scored
+        features = scored[self.ANOMALY_FEATURES].to_numpy(dtype=float)
+        scored["anomaly_score"] = model.decision_function(features)
+        scored["is_anomaly"] = scored["anomaly_score"] < 0
+        return scored
+
+    def analyze_population(self, metrics: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Analyze a group of users' behaviour and identify potential risks.
+        
+        Args:
+            metrics: Per-user metrics of the users to analyze
             
         Returns:
             Dictionary containing analysis results:
             - risk_level: Overall risk assessment
-            - metrics: Various behavioral metrics
+            - metrics: Email-weighted behavioural metrics of the group
+            - users_analyzed / anomalous_users: Users flagged by the
+              population anomaly model, most anomalous first
             - recommendations: List of security recommendations
         """
-        if not email_logs:
+        if metrics.empty:
             return {"risk_level": "unknown", "recommendations": ["Insufficient data for analysis"]}
-
-        # Convert logs to DataFrame for analysis
-        df = pd.DataFrame(email_logs)
         
-        # Calculate key metrics
-        click_rate = df['clicked'].mean()
-        response_rate = df['responded'].mean()
-        avg_response_time = self._calculate_avg_response_time(df)
+        scored = self.score_users(metrics)
+        emails = scored["emails"].sum()
+        click_rate = float((scored["click_rate"] * scored["emails"]).sum() / emails)
+        response_rate = float((scored["response_rate"] * scored["emails"]).sum() / emails)
+        timed = scored["timed_responses"].sum()
+        avg_response_time = float((scored["avg_response_time"] * scored["timed_responses"]).sum() / timed) if timed else 0.0
         
-        # Prepare features for anomaly detection
-        features = np.array([
-            click_rate,
-            response_rate,
-            avg_response_time
-        ]).reshape(1, -1)
-        
-        # Detect anomalies
-        anomaly_score = self.model.fit_predict(features)[0]
-        
-        # Generate risk assessment
+        # The group counts as anomalous when most of its users are
+        anomaly_score = -1 if scored["is_anomaly"].mean() > 0.5 else 1
         risk_level = self._calculate_risk_level(click_rate, response_rate, anomaly_score)
         recommendations = self._generate_recommendations(risk_level, click_rate, response_rate)
         
+        anomalous = scored[scored["is_anomaly"]].sort_values("anomaly_score")
+        columns = [column for column in ["user_id", "name", *self.ANOMALY_FEATURES, "anomaly_score"] if column in anomalous.columns]
         return {
             "risk_level": risk_level,
             "metrics": {
@@ -249,29 +644,28 @@ class AIAnalyzer:
                 "response_rate": response_rate,
                 "avg_response_time": avg_response_time
             },
+            "users_analyzed": len(scored),
+            "anomaly_model_fitted": self.model is not None,
+            "anomalous_users": anomalous[columns].to_dict(orient="records"),
             "recommendations": recommendations
         }
 
-    def _calculate_avg_response_time(self, df: pd.DataFrame) -> float:
+    def analyze_user_behavior(self, email_logs: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Calculate average response time in hours.
+        Analyze the behaviour of the users in a list of email logs.
+        
+        Users are scored against the cached population model (see
+        ensure_fitted); no model is fitted here.
         
         Args:
-            df: DataFrame containing email logs
+            email_logs: List of email log entries to analyze
             
         Returns:
-            Average response time in hours
+            Analysis results as returned by analyze_population
         """
-        if 'responded_at' not in df.columns or 'sent_at' not in df.columns:
-            return 0.0
-        
-        response_times = []
-        for _, row in df.iterrows():
-            if pd.notna(row['responded_at']) and pd.notna(row['sent_at']):
-                delta = row['responded_at'] - row['sent_at']
-                response_times.append(delta.total_seconds() / 3600)  # Convert to hours
-        
-        return np.mean(response_times) if response_times else 0.0
+        if not email_logs:
+            return {"risk_level": "unknown", "recommendations": ["Insufficient data for analysis"]}
+        return self.analyze_population(self.user_metrics(pd.DataFrame(email_logs)))
 
     def _calculate_risk_level(self, click_rate: float, response_rate: float, anomaly_score: int) -> str:
         """
@@ -337,18 +731,56 @@ class MLRiskPredictor:
     Uses Random Forest to predict likelihood of clicking phishing emails.
     """
     
-    def __init__(self):
+    # Historical click rates per template, used to score template vulnerability
+    TEMPLATE_CLICK_RATES = {
+        'urgent_action': 0.45,
+        'security_alert': 0.32,
+        'password_expiry': 0.20,
+        'system_update': 0.15
+    }
+    DEFAULT_TEMPLATE_CLICK_RATE = 0.25
+    
+    # Department risk factors
+    DEPARTMENT_RISK = {
+        'IT': 0.3,  # Lower risk - tech savvy
+        'HR': 0.6,  # Medium risk
+        'Finance': 0.7,  # Higher risk - sensitive data
+        'Sales': 0.5,  # Medium risk
+        'Marketing': 0.4,  # Medium-low risk
+        'Operations': 0.5,  # Medium risk
+        'Legal': 0.8,  # High risk - compliance focused
+        'Executive': 0.9,  # Highest risk - busy executives
+    }
+    DEFAULT_DEPARTMENT_RISK = 0.5
+    
+    # Number of features produced by extract_features
+    N_FEATURES = 11
+    
+    # Users whose click rate exceeds this are labelled high risk for training
+    HIGH_RISK_CLICK_RATE = 0.3
+    
+    # Largest batch scored with the compiled forest; above this sklearn's
+    # compiled tree traversal is faster than the NumPy evaluator
+    COMPILED_MAX_ROWS = 128
+    
+    def __init__(self, load: bool = True):
         """
         Initialize the ML risk predictor with a Random Forest model.
+        
+        Args:
+            load: Whether to load the persisted model if one exists
         """
         self.model = RandomForestClassifier(n_estimators=100, random_state=42)
         self.scaler = StandardScaler()
         self.is_trained = False
-        self.model_path = "Models/risk_predictor.joblib"
-        self.scaler_path = "Models/risk_scaler.joblib"
+        self.model_version = None
+        self.compiled_model = None
+        self.model_path = RISK_MODEL_PATH
+        self.scaler_path = RISK_SCALER_PATH
         
         # Try to load existing model
-        self._load_model()
+        if load:
+            self._load_model()
     
     def _load_model(self):
         """
@@ -356,24 +788,58 @@ class MLRiskPredictor:
         """
         try:
             if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+                # save_model replaces the model file before the scaler, so a
+                # model newer than its scaler means a save is in progress
+                if os.path.getmtime(self.model_path) > os.path.getmtime(self.scaler_path):
+                    print("⚠️ Risk model save in progress; not loading")
+                    return
                 self.model = joblib.load(self.model_path)
                 self.scaler = joblib.load(self.scaler_path)
                 self.is_trained = True
+                self.model_version = self._file_version()
+                self._compile_model()
                 print("✅ Loaded pre-trained risk prediction model")
         except Exception as e:
             print(f"⚠️ Could not load pre-trained model: {e}")
     
-    def _save_model(self):
+    def save_model(self) -> bool:
         """
         Save the trained model for future use.
+        
+        Both files are written to temporary files first and moved into place
+        with os.replace, so a reader never sees a half-written file.
+        
+        Returns:
+            True if the model was saved
         """
+        staged = []
         try:
             os.makedirs("Models", exist_ok=True)
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
+            for obj, path in ((self.model, self.model_path), (self.scaler, self.scaler_path)):
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                os.close(fd)
+                joblib.dump(obj, tmp_path)
+                staged.append((tmp_path, path))
+            for tmp_path, path in staged:
+                os.replace(tmp_path, path)
+            self.model_version = self._file_version()
             print("✅ Saved risk prediction model")
+            return True
         except Exception as e:
+            for tmp_path, _ in staged:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             print(f"❌ Could not save model: {e}")
+            return False
+    
+    def _compile_model(self):
+        """Flatten a trained forest into node arrays for fast small-batch scoring."""
+        if isinstance(self.model, RandomForestClassifier):
+            self.compiled_model = CompiledForest.from_sklearn(self.model)
+    
+    def _file_version(self) -> str:
+        """Identify the persisted model by its file's modification time."""
+        return datetime.utcfromtimestamp(os.path.getmtime(self.model_path)).isoformat()
     
     def extract_features(self, user_data: Dict[str, Any], email_logs: List[Dict[str, Any]]) -> List[float]:
         """
@@ -417,105 +883,176 @@ class MLRiskPredictor:
         
         return features
     
+    def extract_features_batch(self, users: Any, logs: Any, now: datetime = None) -> np.ndarray:
+        """
+        Extract the extract_features vector for many users at once.
+        
+        Works on columnar inputs and computes every feature with grouped NumPy
+        operations over all logs, instead of filtering and parsing each user's
+        emails in Python. Produces the same values as calling extract_features
+        per user (with the department passed by name).
+        
+        Args:
+            users: DataFrame or dict of arrays with columns id, department and
+                optionally age (defaults to 35)
+            logs: DataFrame or dict of arrays with columns user_id, clicked,
+                sent_at, clicked_at and template_type; timestamps may be
+                datetimes, datetime64 or ISO strings
+            now: Reference time for recent activity (defaults to datetime.now())
+            
+        Returns:
+            Array of shape (len(users), N_FEATURES), one row per user in input order
+        """
+        users = users if isinstance(users, pd.DataFrame) else pd.DataFrame(users)
+        logs = logs if isinstance(logs, pd.DataFrame) else pd.DataFrame(logs)
+        n_users = len(users)
+        features = np.zeros((n_users, self.N_FEATURES))
+        if n_users == 0:
+            return features
+        
+        # Basic user features
+        features[:, 0] = users['age'].fillna(35).to_numpy(dtype=float) if 'age' in users else 35
+        features[:, 9] = [
+            self.DEPARTMENT_RISK.get(dept, self.DEFAULT_DEPARTMENT_RISK) if isinstance(dept, str) else self.DEFAULT_DEPARTMENT_RISK
+            for dept in users['department']
+        ]
+        if len(logs) == 0:
+            return features
+        
+        # Position of each log's user in the output; logs of other users are dropped
+        user_pos = pd.Index(users['id']).get_indexer(logs['user_id'])
+        known = user_pos >= 0
+        user_pos = user_pos[known]
+        clicked = logs['clicked'].fillna(False).to_numpy(dtype=bool)[known]
+        sent_at = pd.to_datetime(logs['sent_at']).to_numpy()[known]
+        clicked_at = pd.to_datetime(logs['clicked_at']).to_numpy()[known]
+        template_type = logs['template_type'].to_numpy()[known]
+        
+        def per_user(weights=None, mask=None):
+            positions = user_pos if mask is None else user_pos[mask]
+            if weights is not None and mask is not None:
+                weights = weights[mask]
+            return np.bincount(positions, weights=weights, minlength=n_users).astype(float)
+        
+        # Email and click counts
+        total_emails = per_user()
+        total_clicks = per_user(mask=clicked)
+        features[:, 1] = total_emails
+        features[:, 2] = total_clicks
+        features[:, 3] = total_clicks / np.maximum(total_emails, 1)
+        
+        # Response time mean and population variance (minutes), then the
+        # work-hours (9-17 inclusive) and weekend shares of timed clicks
+        events = pd.DataFrame({"user_pos": user_pos, "clicked": clicked, "sent_at": sent_at, "clicked_at": clicked_at})
+        user_range = pd.RangeIndex(n_users)
+        response_times = delay_stats(events, "clicked", by="user_pos", percentiles=()).reindex(user_range, fill_value=0)
+        features[:, 4] = response_times["mean"].to_numpy()
+        features[:, 5] = np.where(response_times["count"] > 1, response_times["var"], 0.0)
+        hours = hour_distribution(events, by="user_pos").reindex(user_range, fill_value=0.0)
+        weekdays = weekday_distribution(events, by="user_pos").reindex(user_range, fill_value=0.0)
+        features[:, 6] = hours.loc[:, 9:17].sum(axis=1).to_numpy()
+        features[:, 7] = weekdays.loc[:, 5:6].sum(axis=1).to_numpy()
+        
+        # Template vulnerability over clicked emails
+        template_rates = pd.Series(template_type).map(self.TEMPLATE_CLICK_RATES).fillna(self.DEFAULT_TEMPLATE_CLICK_RATE).to_numpy()
+        features[:, 8] = per_user(template_rates, clicked) / np.maximum(total_clicks, 1)
+        
+        # Recent behavior (last 7 days)
+        recent_date = np.datetime64((now or datetime.now()) - pd.Timedelta(days=7))
+        features[:, 10] = per_user(mask=~np.isnat(sent_at) & (sent_at >= recent_date))
+        
+        return features
+    
+    def extract_features_from_aggregates(self, aggregates: pd.DataFrame) -> np.ndarray:
+        """
+        Build the extract_features vector from per-user running aggregates.
+        
+        Args:
+            aggregates: DataFrame with the user_features store columns
+                (email_count, click_count, response_time_count,
+                response_time_mean, response_time_m2, timed_click_count,
+                work_hours_click_count, weekend_click_count,
+                template_rate_sum) plus department, recent_count and
+                optionally age (defaults to 35)
+            
+        Returns:
+            Array of shape (len(aggregates), N_FEATURES), one row per user in input order
+        """
+        features = np.zeros((len(aggregates), self.N_FEATURES))
+        if len(aggregates) == 0:
+            return features
+        
+        def column(name):
+            return aggregates[name].fillna(0).to_numpy(dtype=float)
+        
+        total_emails = column('email_count')
+        total_clicks = column('click_count')
+        timed_count = column('response_time_count')
+        click_timed_count = np.maximum(column('timed_click_count'), 1)
+        
+        features[:, 0] = aggregates['age'].fillna(35).to_numpy(dtype=float) if 'age' in aggregates else 35
+        features[:, 1] = total_emails
+        features[:, 2] = total_clicks
+        features[:, 3] = total_clicks / np.maximum(total_emails, 1)
+        features[:, 4] = np.where(timed_count > 0, column('response_time_mean'), 0.0)
+        features[:, 5] = np.where(timed_count > 1, column('response_time_m2') / np.maximum(timed_count, 1), 0.0)
+        features[:, 6] = column('work_hours_click_count') / click_timed_count
+        features[:, 7] = column('weekend_click_count') / click_timed_count
+        features[:, 8] = column('template_rate_sum') / np.maximum(total_clicks, 1)
+        features[:, 9] = [
+            self.DEPARTMENT_RISK.get(dept, self.DEFAULT_DEPARTMENT_RISK) if isinstance(dept, str) else self.DEFAULT_DEPARTMENT_RISK
+            for dept in aggregates['department']
+        ]
+        features[:, 10] = column('recent_count')
+        
+        return features
+    
+    def labels_from_aggregates(self, aggregates: pd.DataFrame) -> np.ndarray:
+        """
+        Build training labels (1 = high risk) from per-user aggregates.
+        
+        Args:
+            aggregates: DataFrame with email_count and click_count columns
+            
+        Returns:
+            Array of labels, one per row
+        """
+        click_rate = aggregates['click_count'] / aggregates['email_count'].clip(lower=1)
+        return (click_rate > self.HIGH_RISK_CLICK_RATE).astype(int).to_numpy()
+    
     def _calculate_avg_response_time(self, emails: List[Dict[str, Any]]) -> float:
         """Calculate average response time in minutes."""
-        response_times = []
-        for email in emails:
-            if email.get('clicked') and email.get('sent_at') and email.get('clicked_at'):
-                try:
-                    sent_time = pd.to_datetime(email['sent_at'])
-                    clicked_time = pd.to_datetime(email['clicked_at'])
-                    response_time = (clicked_time - sent_time).total_seconds() / 60
-                    response_times.append(response_time)
-                except:
-                    continue
-        
-        return np.mean(response_times) if response_times else 0.0
+        return float(delay_stats(pd.DataFrame(emails), "clicked", percentiles=())["mean"].iloc[0])
     
     def _calculate_response_time_variance(self, emails: List[Dict[str, Any]]) -> float:
         """Calculate variance in response times."""
-        response_times = []
-        for email in emails:
-            if email.get('clicked') and email.get('sent_at') and email.get('clicked_at'):
-                try:
-                    sent_time = pd.to_datetime(email['sent_at'])
-                    clicked_time = pd.to_datetime(email['clicked_at'])
-                    response_time = (clicked_time - sent_time).total_seconds() / 60
-                    response_times.append(response_time)
-                except:
-                    continue
-        
-        return np.var(response_times) if len(response_times) > 1 else 0.0
+        stats = delay_stats(pd.DataFrame(emails), "clicked", percentiles=()).iloc[0]
+        return float(stats["var"]) if stats["count"] > 1 else 0.0
     
     def _calculate_work_hours_clicks(self, emails: List[Dict[str, Any]]) -> float:
         """Calculate percentage of clicks during work hours (9 AM - 5 PM)."""
-        work_hour_clicks = 0
-        total_clicks = 0
-        
-        for email in emails:
-            if email.get('clicked') and email.get('clicked_at'):
-                try:
-                    clicked_time = pd.to_datetime(email['clicked_at'])
-                    hour = clicked_time.hour
-                    if 9 <= hour <= 17:  # Work hours
-                        work_hour_clicks += 1
-                    total_clicks += 1
-                except:
-                    continue
-        
-        return work_hour_clicks / max(total_clicks, 1)
+        return float(hour_distribution(pd.DataFrame(emails)).loc[:, 9:17].sum(axis=1).iloc[0])
     
     def _calculate_weekend_clicks(self, emails: List[Dict[str, Any]]) -> float:
         """Calculate percentage of clicks on weekends."""
-        weekend_clicks = 0
-        total_clicks = 0
-        
-        for email in emails:
-            if email.get('clicked') and email.get('clicked_at'):
-                try:
-                    clicked_time = pd.to_datetime(email['clicked_at'])
-                    if clicked_time.weekday() >= 5:  # Saturday = 5, Sunday = 6
-                        weekend_clicks += 1
-                    total_clicks += 1
-                except:
-                    continue
-        
-        return weekend_clicks / max(total_clicks, 1)
+        return float(weekday_distribution(pd.DataFrame(emails)).loc[:, 5:6].sum(axis=1).iloc[0])
     
     def _calculate_template_vulnerability(self, emails: List[Dict[str, Any]]) -> float:
         """Calculate vulnerability score based on template types clicked."""
-        template_click_rates = {
-            'urgent_action': 0.45,
-            'security_alert': 0.32,
-            'password_expiry': 0.20,
-            'system_update': 0.15
-        }
-        
         vulnerability_score = 0
         total_clicks = 0
         
         for email in emails:
             if email.get('clicked'):
                 template_type = email.get('template_type', 'unknown')
-                vulnerability_score += template_click_rates.get(template_type, 0.25)
+                vulnerability_score += self.TEMPLATE_CLICK_RATES.get(template_type, self.DEFAULT_TEMPLATE_CLICK_RATE)
                 total_clicks += 1
         
         return vulnerability_score / max(total_clicks, 1)
     
     def _encode_department_risk(self, department: str) -> float:
         """Encode department risk level as numerical value."""
-        department_risk = {
-            'IT': 0.3,  # Lower risk - tech savvy
-            'HR': 0.6,  # Medium risk
-            'Finance': 0.7,  # Higher risk - sensitive data
-            'Sales': 0.5,  # Medium risk
-            'Marketing': 0.4,  # Medium-low risk
-            'Operations': 0.5,  # Medium risk
-            'Legal': 0.8,  # High risk - compliance focused
-            'Executive': 0.9,  # Highest risk - busy executives
-        }
-        
-        return department_risk.get(department, 0.5)
+        return self.DEPARTMENT_RISK.get(department, self.DEFAULT_DEPARTMENT_RISK)
     
     def _calculate_recent_activity(self, emails: List[Dict[str, Any]], days: int = 7) -> float:
         """Calculate recent activity level."""
@@ -534,8 +1071,6 @@ class MLRiskPredictor:
         Args:
             training_data: List of user data with known outcomes
         """
-        print("🤖 Training risk prediction model...")
-        
         X = []  # Features
         y = []  # Labels (1 = high risk, 0 = low risk)
         
@@ -543,11 +1078,24 @@ class MLRiskPredictor:
             features = self.extract_features(user_record['user'], user_record['emails'])
             # Define high risk as click rate > 30%
             click_rate = sum(1 for email in user_record['emails'] if email.get('clicked', False)) / max(len(user_record['emails']), 1)
-            label = 1 if click_rate > 0.3 else 0
+            label = 1 if click_rate > self.HIGH_RISK_CLICK_RATE else 0
             
             X.append(features)
             y.append(label)
         
+        self.fit(np.array(X), np.array(y))
+    
+    def fit(self, X: np.ndarray, y: np.ndarray, save: bool = True):
+        """
+        Train the risk prediction model on a prepared feature matrix.
+        
+        Args:
+            X: Feature matrix of shape (n_users, N_FEATURES)
+            y: Labels (1 = high risk, 0 = low risk)
+            save: Whether to save the trained model to disk
+        """
+        print("🤖 Training risk prediction model...")
+        
         if len(X) < 10:
             print("⚠️ Insufficient training data. Need at least 10 user records.")
             return
@@ -558,9 +1106,11 @@ class MLRiskPredictor:
         # Train model
         self.model.fit(X_scaled, y)
         self.is_trained = True
+        self._compile_model()
         
         # Save model
-        self._save_model()
+        if save:
+            self.save_model()
         
         print(f"✅ Model trained on {len(X)} user records")
     
@@ -576,21 +1126,97 @@ class MLRiskPredictor:
             Risk prediction with confidence score
         """
         if not self.is_trained:
-            return {
-                "risk_level": "unknown",
-                "confidence": 0.0,
-                "risk_score": 0.5,
-                "message": "Model not trained yet"
-            }
+            return self._untrained_prediction()
         
         # Extract features
         features = self.extract_features(user_data, email_logs)
         features_scaled = self.scaler.transform([features])
         
         # Make prediction
-        risk_probability = self.model.predict_proba(features_scaled)[0]
-        risk_score = risk_probability[1]  # Probability of being high risk
+        risk_score = self.high_risk_probability(features_scaled)[0]
+        
+        return self._risk_prediction(risk_score, len(features))
+    
+    def predict_risk_batch(self, features: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Predict risk levels for many users from a precomputed feature matrix.
+        
+        Scales and scores every row with a single scaler and forest call.
+        
+        Args:
+            features: Feature matrix from extract_features_batch
+            
+        Returns:
+            One risk prediction per row, as returned by predict_user_risk
+        """
+        if not self.is_trained:
+            return [self._untrained_prediction() for _ in range(len(features))]
+        if len(features) == 0:
+            return []
+        
+        risk_scores = self.high_risk_probability(self.scaler.transform(features))
+        return [self._risk_prediction(risk_score, features.shape[1]) for risk_score in risk_scores]
+    
+    def high_risk_probability(self, X_scaled: np.ndarray) -> np.ndarray:
+        """
+        Probability of being high risk for scaled features.
+        
+        Looks the high-risk class up in the model's classes, since a model
+        fitted on a single label only has one probability column.
+        
+        Args:
+            X_scaled: Scaled feature matrix
+            
+        Returns:
+            Probability of class 1 per row (0 if the model never saw class 1)
+        """
+        probabilities = self._predict_proba(X_scaled)
+        classes = list(self.model.classes_)
+        if 1 not in classes:
+            return np.zeros(len(X_scaled))
+        return probabilities[:, classes.index(1)]
+    
+    def validate(self, features: np.ndarray, rows: int = 5):
+        """
+        Check a newly fitted model can score users before it is saved or published.
         
+        Args:
+            features: Feature matrix the model was trained on
+            rows: Number of rows to score as a trial
+            
+        Raises:
+            ValueError: If the model is untrained, was fitted on a single
+                class, or cannot score the trial rows
+        """
+        if not self.is_trained:
+            raise ValueError("Risk model is not trained")
+        classes = np.unique(self.model.classes_)
+        if len(classes) < 2:
+            raise ValueError(
+                f"Training data has a single risk class ({classes[0]}); both low and high risk users are needed"
+            )
+        trial = features[:rows]
+        predictions = self.predict_risk_batch(trial)
+        if len(predictions) != len(trial) or not all(0.0 <= p["risk_score"] <= 1.0 for p in predictions):
+            raise ValueError("Risk model produced invalid predictions on the training data")
+    
+    def _predict_proba(self, X_scaled: np.ndarray) -> np.ndarray:
+        """Class probabilities for scaled features, using the compiled forest for small batches."""
+        if self.compiled_model is not None and len(X_scaled) <= self.COMPILED_MAX_ROWS:
+            return self.compiled_model.predict_proba(X_scaled)
+        return self.model.predict_proba(X_scaled)
+    
+    def _untrained_prediction(self) -> Dict[str, Any]:
+        """Prediction returned while no model has been trained."""
+        return {
+            "risk_level": "unknown",
+            "confidence": 0.0,
+            "risk_score": 0.5,
+            "message": "Model not trained yet"
+        }
+    
+    def _risk_prediction(self, risk_score: float, features_used: int) -> Dict[str, Any]:
+        """Build the prediction response for a high-risk probability."""
         # Determine risk level
         if risk_score > 0.7:
             risk_level = "high"
@@ -606,7 +1232,7 @@ class MLRiskPredictor:
             "risk_level": risk_level,
             "confidence": round(confidence, 3),
             "risk_score": round(risk_score, 3),
-            "features_used": len(features),
+            "features_used": features_used,
             "recommendations": self._get_risk_recommendations(risk_level, risk_score)
         }
     
@@ -633,4 +1259,47 @@ class MLRiskPredictor:
                 "Monitor for changes in behavior patterns"
             ])
         
-        return recommendations 
\ No newline at end of file
+        return recommendations 
+
+class OnlineRiskPredictor(MLRiskPredictor):
+    """
+    Incrementally trained risk predictor.
+    Uses logistic regression fitted by stochastic gradient descent with a
+    streaming feature scaler, so it can learn from new outcomes in small
+    batches instead of retraining on the full history.
+    """
+    
+    def __init__(self, load: bool = True):
+        """
+        Initialize the online risk predictor.
+        
+        Args:
+            load: Whether to load the persisted model if one exists
+        """
+        super().__init__(load=False)
+        self.model = SGDClassifier(loss="log_loss", random_state=42)
+        self.scaler = StandardScaler()
+        self.model_path = ONLINE_RISK_MODEL_PATH
+        self.scaler_path = ONLINE_RISK_SCALER_PATH
+        
+        if load:
+            self._load_model()
+    
+    @property
+    def samples_seen(self) -> int:
+        """Number of training samples the model has learned from."""
+        return int(getattr(self.scaler, "n_samples_seen_", 0))
+    
+    def partial_fit(self, X: np.ndarray, y: np.ndarray):
+        """
+        Update the scaler statistics and the model with one batch of samples.
+        
+        Args:
+            X: Feature matrix of shape (n_samples, N_FEATURES)
+            y: Labels (1 = high risk, 0 = low risk)
+        """
+        if len(X) == 0:
+            return
+        self.scaler.partial_fit(X)
+        self.model.partial_fit(self.scaler.transform(X), y, classes=np.array([0, 1]))
+        self.is_trained = True
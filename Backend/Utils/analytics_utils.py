@@ -0,0 +1,407 @@
+"""
+Analytics Utilities for Phishing Simulation Platform
+This module provides set-based aggregation queries for the analytics endpoints
+and maintains the department/template/day rollup table they read from.
+Email write paths record their deltas here in the same transaction as the
+email log change, so analytics reads grow with departments, not email logs.
+
+The rollups can be rebuilt from the raw email logs with:
+    python -m Utils.analytics_utils rebuild
+"""
+
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import and_, case, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import models
+
+_Stat = models.DepartmentTemplateStat
+
+
+def _date_range_bounds(start_date: Optional[date], end_date: Optional[date]):
+    """
+    Convert an inclusive date range into half-open datetime bounds.
+
+    Args:
+        start_date: Optional first day to include
+        end_date: Optional last day to include
+
+    Returns:
+        Tuple of (lower, upper) datetimes, either of which may be None
+    """
+    lower = datetime.combine(start_date, time.min) if start_date else None
+    upper = datetime.combine(end_date + timedelta(days=1), time.min) if end_date else None
+    return lower, upper
+
+
+def department_click_stats(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    template_type: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate sent and clicked email counts per department from the rollups.
+
+    Departments are outer-joined to the rollup table so departments without
+    any matching emails are still reported with zero counts.
+
+    Args:
+        db: Database session
+        start_date: Optional first day (by sent_at) to include
+        end_date: Optional last day (by sent_at) to include
+        template_type: Optional template type to restrict to
+
+    Returns:
+        List of department analytics dictionaries
+    """
+    # Filters live in the join condition rather than WHERE so that the outer
+    # join still yields a row for departments with no matching emails
+    stat_join = [_Stat.department_id == models.Department.id]
+    if start_date:
+        stat_join.append(_Stat.day >= start_date)
+    if end_date:
+        stat_join.append(_Stat.day <= end_date)
+    if template_type:
+        stat_join.append(_Stat.template_type == template_type)
+
+    rows = (
+        db.query(
+            models.Department.name,
+            func.coalesce(func.sum(_Stat.sent_count), 0).label("total_emails"),
+            func.coalesce(func.sum(_Stat.clicked_count), 0).label("total_clicks")
+        )
+        .outerjoin(_Stat, and_(*stat_join))
+        .group_by(models.Department.id, models.Department.name)
+        .order_by(models.Department.id)
+        .all()
+    )
+
+    return [_click_stats_row(name, total_emails, total_clicks) for name, total_emails, total_clicks in rows]
+
+
+def department_click_stats_from_logs(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    template_type: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate sent and clicked email counts per department from the raw logs.
+
+    Same output as department_click_stats, computed with a single GROUP BY
+    over departments -> users -> email_logs. Used to verify the rollups.
+
+    Args:
+        db: Database session
+        start_date: Optional first day (by sent_at) to include
+        end_date: Optional last day (by sent_at) to include
+        template_type: Optional template type to restrict to
+
+    Returns:
+        List of department analytics dictionaries
+    """
+    log_join = [models.EmailLog.user_id == models.User.id]
+    lower, upper = _date_range_bounds(start_date, end_date)
+    if lower:
+        log_join.append(models.EmailLog.sent_at >= lower)
+    if upper:
+        log_join.append(models.EmailLog.sent_at < upper)
+    if template_type:
+        log_join.append(models.EmailLog.template_type == template_type)
+
+    total_clicks = func.coalesce(func.sum(case((models.EmailLog.clicked == True, 1), else_=0)), 0)
+
+    rows = (
+        db.query(
+            models.Department.name,
+            func.count(models.EmailLog.id).label("total_emails"),
+            total_clicks.label("total_clicks")
+        )
+        .outerjoin(models.User, models.User.department_id == models.Department.id)
+        .outerjoin(models.EmailLog, and_(*log_join))
+        .group_by(models.Department.id, models.Department.name)
+        .order_by(models.Department.id)
+        .all()
+    )
+
+    return [_click_stats_row(name, total_emails, total_clicks) for name, total_emails, total_clicks in rows]
+
+
+def _click_stats_row(name: str, total_emails: int, total_clicks: int) -> Dict[str, Any]:
+    """Format one department's counts as an analytics dictionary."""
+    click_rate = (total_clicks / total_emails * 100) if total_emails > 0 else 0
+    return {
+        "department": name,
+        "total_emails": total_emails,
+        "total_clicks": total_clicks,
+        "click_rate": round(click_rate, 2)
+    }
+
+
+def _apply_stat_deltas(db: Session, deltas: Dict[tuple, List[int]]):
+    """
+    Upsert rollup deltas keyed by (department_id, template_type, day).
+
+    Args:
+        db: Database session (the caller commits)
+        deltas: Mapping of rollup key to [sent, clicked, responded] deltas
+    """
+    for (department_id, template_type, day), (sent, clicked, responded) in deltas.items():
+        if not (sent or clicked or responded):
+            continue
+        stmt = insert(_Stat).values(
+            department_id=department_id,
+            template_type=template_type,
+            day=day,
+            sent_count=sent,
+            clicked_count=clicked,
+            responded_count=responded
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['department_id', 'template_type', 'day'],
+            set_={
+                "sent_count": _Stat.sent_count + sent,
+                "clicked_count": _Stat.clicked_count + clicked,
+                "responded_count": _Stat.responded_count + responded
+            }
+        )
+        db.execute(stmt)
+
+
+def record_email_logs(db: Session, logs: Iterable[models.EmailLog], department_id: Optional[int] = None, sign: int = 1):
+    """
+    Add (or with sign=-1, remove) email logs' contribution to the rollups.
+
+    Logs are attributed to their recipient's department at the time of the
+    call; logs without a send time or department are not tracked.
+
+    Args:
+        db: Database session (the caller commits)
+        logs: Email logs to record
+        department_id: Department of every log's user, if already known
+        sign: 1 to add the logs, -1 to remove them
+    """
+    departments = {}
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for log in logs:
+        if not log.sent_at:
+            continue
+        dept_id = department_id
+        if dept_id is None:
+            if log.user_id not in departments:
+                departments[log.user_id] = db.query(models.User.department_id).filter(
+                    models.User.id == log.user_id
+                ).scalar()
+            dept_id = departments[log.user_id]
+        if dept_id is None:
+            continue
+        delta = deltas[(dept_id, log.template_type or '', log.sent_at.date())]
+        delta[0] += sign
+        delta[1] += sign if log.clicked else 0
+        delta[2] += sign if log.responded else 0
+    _apply_stat_deltas(db, deltas)
+
+
+def record_email_event(db: Session, log: models.EmailLog, clicked: bool = False, responded: bool = False):
+    """
+    Record a click or response on an already-sent email in the rollups.
+
+    The event is counted against the day the email was sent, so click and
+    response counts stay comparable with sent counts for the same day.
+
+    Args:
+        db: Database session (the caller commits)
+        log: The email log that was clicked or responded to
+        clicked: Whether to count a new click
+        responded: Whether to count a new response
+    """
+    if not log.sent_at:
+        return
+    department_id = db.query(models.User.department_id).filter(models.User.id == log.user_id).scalar()
+    if department_id is None:
+        return
+    _apply_stat_deltas(db, {
+        (department_id, log.template_type or '', log.sent_at.date()): [0, int(clicked), int(responded)]
+    })
+
+
+def move_user_rollups(db: Session, user_id: int, old_department_id: Optional[int], new_department_id: Optional[int]):
+    """
+    Move a user's email logs' contribution to the rollups between departments.
+
+    Call when a user changes department; logs of a user without a
+    department are not tracked, so either department may be None.
+
+    Args:
+        db: Database session (the caller commits)
+        user_id: User changing department
+        old_department_id: Department the logs are currently counted under
+        new_department_id: Department they should be counted under
+    """
+    if old_department_id == new_department_id:
+        return
+    logs = db.query(models.EmailLog).filter(models.EmailLog.user_id == user_id).all()
+    if old_department_id is not None:
+        record_email_logs(db, logs, department_id=old_department_id, sign=-1)
+    if new_department_id is not None:
+        record_email_logs(db, logs, department_id=new_department_id)
+
+
+def delete_user_email_logs(db: Session, user: models.User) -> int:
+    """
+    Delete a user's email logs and remove them from the rollups.
+
+    Args:
+        db: Database session (the caller commits)
+        user: User whose logs are deleted
+
+    Returns:
+        Number of email logs deleted
+    """
+    logs = db.query(models.EmailLog).filter(models.EmailLog.user_id == user.id).all()
+    if user.department_id is not None:
+        record_email_logs(db, logs, department_id=user.department_id, sign=-1)
+    for log in logs:
+        db.delete(log)
+    return len(logs)
+
+
+def delete_department_rollups(db: Session, department_id: int):
+    """
+    Delete a department's rollup rows, e.g. when the department is deleted.
+
+    Args:
+        db: Database session (the caller commits)
+        department_id: Department whose rows are deleted
+    """
+    db.query(_Stat).filter(_Stat.department_id == department_id).delete(synchronize_session=False)
+
+
+def rebuild_department_rollups(db: Session) -> int:
+    """
+    Recompute the rollup table from the raw email logs.
+
+    Args:
+        db: Database session (committed on success)
+
+    Returns:
+        Number of rollup rows written
+    """
+    db.query(_Stat).delete()
+
+    template_key = func.coalesce(models.EmailLog.template_type, '')
+    day = func.date(models.EmailLog.sent_at)
+    aggregate = (
+        db.query(
+            models.User.department_id,
+            template_key,
+            day,
+            func.count(models.EmailLog.id),
+            func.sum(case((models.EmailLog.clicked == True, 1), else_=0)),
+            func.sum(case((models.EmailLog.responded == True, 1), else_=0))
+        )
+        .join(models.User, models.EmailLog.user_id == models.User.id)
+        .filter(models.EmailLog.sent_at.isnot(None), models.User.department_id.isnot(None))
+        .group_by(models.User.department_id, template_key, day)
+    )
+    db.execute(
+        insert(_Stat).from_select(
+            ['department_id', 'template_type', 'day', 'sent_count', 'clicked_count', 'responded_count'],
+            aggregate.statement
+        )
+    )
+    db.commit()
+    return db.query(_Stat).count()
+
+
+def user_behavior_metrics(
+    db: Session,
+    user_ids: Optional[List[int]] = None,
+    department_id: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Compute per-user behaviour metrics with a single GROUP BY over the email logs.
+
+    Args:
+        db: Database session
+        user_ids: Only include these users
+        department_id: Only include users in this department
+
+    Returns:
+        DataFrame with one row per user with email history: user_id, name,
+        emails, click_rate, response_rate, avg_response_time (hours between
+        sending and responding) and timed_responses (responses with both
+        timestamps), matching AIAnalyzer.user_metrics
+    """
+    log = models.EmailLog
+    # julianday differences are in days; AVG and COUNT skip the NULLs of
+    # unresponded logs and logs missing either timestamp
+    response_hours = case(
+        (log.responded == True, (func.julianday(log.responded_at) - func.julianday(log.sent_at)) * 24)
+    )
+    query = (
+        db.query(
+            models.User.id,
+            models.User.name,
+            func.count(log.id),
+            func.sum(case((log.clicked == True, 1), else_=0)),
+            func.sum(case((log.responded == True, 1), else_=0)),
+            func.coalesce(func.avg(response_hours), 0.0),
+            func.count(response_hours)
+        )
+        .join(log, log.user_id == models.User.id)
+        .group_by(models.User.id, models.User.name)
+        .order_by(models.User.id)
+    )
+    if user_ids is not None:
+        query = query.filter(models.User.id.in_(user_ids))
+    if department_id is not None:
+        query = query.filter(models.User.department_id == department_id)
+
+    metrics = pd.DataFrame(
+        query.all(),
+        columns=["user_id", "name", "emails", "clicks", "responses", "avg_response_time", "timed_responses"]
+    )
+    metrics["click_rate"] = metrics["clicks"] / metrics["emails"]
+    metrics["response_rate"] = metrics["responses"] / metrics["emails"]
+    return metrics.drop(columns=["clicks", "responses"])
+
+
+def behavior_data_version(db: Session) -> tuple:
+    """
+    Cheap fingerprint of the data behind user_behavior_metrics.
+
+    Every email write path touches the user's feature store row, so the row
+    count and latest update time change whenever any user's behaviour does.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Tuple that differs whenever the behaviour data has changed
+    """
+    count, updated_at = db.query(func.count(models.UserFeatures.user_id), func.max(models.UserFeatures.updated_at)).one()
+    return count, updated_at.isoformat() if updated_at else None
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m Utils.analytics_utils rebuild")
+        sys.exit(1)
+
+    init_db()
+    session = SessionLocal()
+    try:
+        rows = rebuild_department_rollups(session)
+        print(f"✅ Rebuilt department rollups: {rows} rows")
+    finally:
+        session.close()
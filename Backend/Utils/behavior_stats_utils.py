@@ -0,0 +1,223 @@
+"""
+Behaviour Statistics Utilities for Phishing Simulation Platform
+This module computes user behaviour statistics from columnar email logs with
+grouped pandas operations: time-to-click and time-to-respond summaries,
+hour-of-day and weekday distributions of events, and per-template rates.
+Every function takes a DataFrame of email logs and an optional column to
+group by, so the same code serves one user, a department or the whole
+organisation. It is shared by AIAnalyzer, MLRiskPredictor and the dataset
+builder.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Percentiles reported by delay_stats unless asked otherwise
+DEFAULT_PERCENTILES = (50, 90, 95)
+
+# Timestamp column recording each event
+EVENT_TIME_COLUMNS = {"sent": "sent_at", "clicked": "clicked_at", "responded": "responded_at"}
+
+# Group label used when statistics are not grouped
+ALL = "all"
+
+
+def _timestamps(logs: pd.DataFrame, column: str) -> pd.Series:
+    """Parse a timestamp column (datetimes, datetime64 or ISO strings); unparsable or missing values become NaT."""
+    if column not in logs.columns:
+        return pd.Series(pd.NaT, index=logs.index, dtype="datetime64[ns]")
+    values = logs[column]
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors="coerce", format="ISO8601")
+
+
+def _event_flag(logs: pd.DataFrame, event: str) -> pd.Series:
+    """Whether each log recorded the event; every log counts as sent."""
+    if event == "sent":
+        return pd.Series(True, index=logs.index)
+    if event not in logs.columns:
+        return pd.Series(False, index=logs.index)
+    return logs[event].fillna(False).astype(bool)
+
+
+def _group_keys(logs: pd.DataFrame, by: Optional[str]) -> pd.Series:
+    """Grouping keys for each log: the by column, or one group for everything."""
+    if by is None:
+        return pd.Series(ALL, index=logs.index)
+    return logs[by]
+
+
+def event_times(logs: pd.DataFrame, event: str) -> pd.Series:
+    """
+    Time of an event for each log.
+
+    Args:
+        logs: Email logs
+        event: "sent", "clicked" or "responded"
+
+    Returns:
+        Series of timestamps, NaT where the event did not happen or was not timed
+    """
+    times = _timestamps(logs, EVENT_TIME_COLUMNS[event])
+    return times.where(_event_flag(logs, event))
+
+
+def event_delays(logs: pd.DataFrame, event: str = "clicked", unit: str = "minutes") -> pd.Series:
+    """
+    Time from sending each email to an event on it.
+
+    Args:
+        logs: Email logs with sent_at, the event flag and its timestamp
+        event: "clicked" or "responded"
+        unit: Any pandas Timedelta unit ("minutes", "hours", ...)
+
+    Returns:
+        Series of delays, NaN where the event did not happen or either timestamp is missing
+    """
+    return (event_times(logs, event) - _timestamps(logs, "sent_at")) / pd.Timedelta(1, unit=unit)
+
+
+def delay_stats(
+    logs: pd.DataFrame,
+    event: str = "clicked",
+    by: Optional[str] = None,
+    unit: str = "minutes",
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES
+) -> pd.DataFrame:
+    """
+    Summarize send-to-event delays per group.
+
+    Args:
+        logs: Email logs
+        event: "clicked" or "responded"
+        by: Column to group by, or None for a single group labelled "all"
+        unit: Delay unit
+        percentiles: Percentiles to report as p<N> columns
+
+    Returns:
+        DataFrame indexed by group with count, mean, var (population
+        variance) and m2 (sum of squared deviations), 0 for groups without
+        timed events, plus the percentile columns (NaN for those groups).
+        Groups come from every log, so groups without timed events are kept.
+    """
+    delays = event_delays(logs, event, unit)
+    grouped = delays.groupby(_group_keys(logs, by))
+    stats = pd.DataFrame({
+        "count": grouped.count(),
+        "mean": grouped.mean().fillna(0.0),
+        "var": grouped.var(ddof=0).fillna(0.0)
+    })
+    if by is None:
+        stats = stats.reindex([ALL]).fillna({"count": 0, "mean": 0.0, "var": 0.0})
+        stats["count"] = stats["count"].astype(int)
+    stats["m2"] = stats["var"] * stats["count"]
+    if len(percentiles):
+        quantiles = grouped.quantile([p / 100 for p in percentiles]).unstack()
+        for p in percentiles:
+            stats[f"p{p:g}"] = quantiles[p / 100] if len(quantiles) else np.nan
+    return stats
+
+
+def _event_distribution(
+    logs: pd.DataFrame,
+    event: str,
+    by: Optional[str],
+    field: str,
+    size: int,
+    normalize: bool
+) -> pd.DataFrame:
+    """Count (or share) timed events per group by a datetime field such as hour or weekday."""
+    times = event_times(logs, event)
+    timed = times.notna()
+    values = getattr(times[timed].dt, field).astype(int)
+    keys = _group_keys(logs, by)[timed]
+    counts = (
+        pd.DataFrame({"group": keys, "value": values})
+        .groupby(["group", "value"]).size()
+        .unstack(fill_value=0)
+        .reindex(columns=range(size), fill_value=0)
+    )
+    counts.index.name = by
+    counts.columns.name = field
+    if by is None:
+        counts = counts.reindex([ALL], fill_value=0)
+    if normalize:
+        totals = counts.sum(axis=1)
+        counts = counts.div(totals.where(totals > 0, 1), axis=0)
+    return counts
+
+
+def hour_distribution(
+    logs: pd.DataFrame,
+    event: str = "clicked",
+    by: Optional[str] = None,
+    normalize: bool = True
+) -> pd.DataFrame:
+    """
+    Distribution of timed events over the hour of day.
+
+    Args:
+        logs: Email logs
+        event: "sent", "clicked" or "responded"
+        by: Column to group by, or None for a single group labelled "all"
+        normalize: Return shares of each group's timed events instead of counts
+
+    Returns:
+        DataFrame indexed by group with columns 0-23; groups without timed
+        events are omitted when grouping
+    """
+    return _event_distribution(logs, event, by, "hour", 24, normalize)
+
+
+def weekday_distribution(
+    logs: pd.DataFrame,
+    event: str = "clicked",
+    by: Optional[str] = None,
+    normalize: bool = True
+) -> pd.DataFrame:
+    """
+    Distribution of timed events over the day of week (0 = Monday).
+
+    Args:
+        logs: Email logs
+        event: "sent", "clicked" or "responded"
+        by: Column to group by, or None for a single group labelled "all"
+        normalize: Return shares of each group's timed events instead of counts
+
+    Returns:
+        DataFrame indexed by group with columns 0-6; groups without timed
+        events are omitted when grouping
+    """
+    return _event_distribution(logs, event, by, "weekday", 7, normalize)
+
+
+def template_rates(logs: pd.DataFrame, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Sent, clicked and responded counts and rates per template.
+
+    Args:
+        logs: Email logs with template_type, clicked and responded
+        by: Optional column to group by in addition to the template
+
+    Returns:
+        DataFrame indexed by template_type (or by (by, template_type)) with
+        sent, clicked, responded, click_rate and response_rate; logs without
+        a template are reported as "unknown"
+    """
+    frame = pd.DataFrame({
+        "template_type": logs["template_type"].fillna("unknown") if "template_type" in logs.columns else "unknown",
+        "sent": 1,
+        "clicked": _event_flag(logs, "clicked").astype(int),
+        "responded": _event_flag(logs, "responded").astype(int)
+    }, index=logs.index)
+    keys = ["template_type"]
+    if by is not None:
+        frame[by] = logs[by]
+        keys = [by, "template_type"]
+    rates = frame.groupby(keys)[["sent", "clicked", "responded"]].sum()
+    rates["click_rate"] = rates["clicked"] / rates["sent"]
+    rates["response_rate"] = rates["responded"] / rates["sent"]
+    return rates
@@ -0,0 +1,258 @@
+"""
+Dataset Utilities for Phishing Simulation Platform
+This module builds the risk model's training dataset straight from the
+email_logs table. Logs are streamed from SQL in chunks (yield_per) into
+typed NumPy columns and folded into per-user aggregates chunk by chunk, so
+peak memory follows the number of users rather than the number of logs.
+Datasets can be written to and read back from Parquet snapshots.
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy.orm import Session
+
+import models
+from Utils.ai_utils import MLRiskPredictor
+from Utils.behavior_stats_utils import delay_stats, hour_distribution, weekday_distribution
+
+# Logs fetched per round trip while streaming
+DEFAULT_LOG_CHUNK_SIZE = 50000
+
+# Default location of the training dataset snapshot
+DEFAULT_SNAPSHOT_PATH = "Models/training_snapshot.parquet"
+
+# Per-user aggregates that combine by addition across chunks
+_SUM_COLUMNS = [
+    "email_count", "click_count", "responded_count", "response_time_count",
+    "timed_click_count", "work_hours_click_count", "weekend_click_count",
+    "template_rate_sum", "recent_count"
+]
+
+
+def _parse_timestamps(values) -> np.ndarray:
+    """Parse ISO timestamp strings (None for missing) into a datetime64 array with NaT."""
+    return pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601").to_numpy("datetime64[us]")
+
+
+def iter_email_log_columns(
+    db: Session,
+    user_ids: Optional[List[int]] = None,
+    chunk_size: int = DEFAULT_LOG_CHUNK_SIZE
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Stream email logs as typed column arrays, one chunk at a time.
+
+    Args:
+        db: Database session
+        user_ids: Only stream these users' logs, or None for every log
+        chunk_size: Rows fetched per chunk
+
+    Yields:
+        Dictionaries of arrays: user_id (int64), clicked and responded
+        (bool), sent_at and clicked_at (datetime64, NaT when missing) and
+        template_type (object)
+    """
+    log = models.EmailLog
+    # Timestamps are fetched as SQLite's stored ISO strings and parsed a whole
+    # column at a time, instead of into one datetime object per value
+    stmt = select(
+        log.user_id, log.clicked, log.responded,
+        type_coerce(log.sent_at, String), type_coerce(log.clicked_at, String), log.template_type
+    )
+    if user_ids is not None:
+        stmt = stmt.where(log.user_id.in_(user_ids))
+
+    result = db.connection().execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        user_id, clicked, responded, sent_at, clicked_at, template_type = zip(*rows)
+        yield {
+            "user_id": np.array(user_id, dtype=np.int64),
+            "clicked": np.array(clicked, dtype=bool),
+            "responded": np.array(responded, dtype=bool),
+            "sent_at": _parse_timestamps(sent_at),
+            "clicked_at": _parse_timestamps(clicked_at),
+            "template_type": np.array(template_type, dtype=object)
+        }
+
+
+def aggregate_log_columns(logs, recent_since: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Compute the feature store aggregates per user from columnar email logs.
+
+    Args:
+        logs: DataFrame or dict of arrays with user_id, clicked, responded,
+            sent_at, clicked_at and template_type
+        recent_since: Also count logs sent at or after this time as recent_count
+
+    Returns:
+        DataFrame with one row per user_id and the aggregate columns
+    """
+    logs = logs if isinstance(logs, pd.DataFrame) else pd.DataFrame(logs)
+    clicked = logs["clicked"].fillna(False).astype(bool)
+    rates = logs["template_type"].map(MLRiskPredictor.TEMPLATE_CLICK_RATES).fillna(
+        MLRiskPredictor.DEFAULT_TEMPLATE_CLICK_RATE
+    )
+    frame = pd.DataFrame({
+        "user_id": logs["user_id"],
+        "email_count": 1,
+        "click_count": clicked.astype(int),
+        "responded_count": logs["responded"].fillna(False).astype(int),
+        "template_rate_sum": rates.where(clicked, 0.0)
+    })
+    if recent_since is not None:
+        frame["recent_count"] = (pd.to_datetime(logs["sent_at"]) >= recent_since).astype(int)
+    aggregates = frame.groupby("user_id").sum()
+
+    # Response-time and click-time statistics come from the shared behaviour stats
+    response_times = delay_stats(logs, "clicked", by="user_id", percentiles=())
+    hours = hour_distribution(logs, by="user_id", normalize=False).reindex(aggregates.index, fill_value=0)
+    weekdays = weekday_distribution(logs, by="user_id", normalize=False).reindex(aggregates.index, fill_value=0)
+    aggregates["response_time_count"] = response_times["count"]
+    aggregates["response_time_mean"] = response_times["mean"]
+    aggregates["response_time_m2"] = response_times["m2"]
+    aggregates["timed_click_count"] = hours.sum(axis=1)
+    aggregates["work_hours_click_count"] = hours.loc[:, 9:17].sum(axis=1)
+    aggregates["weekend_click_count"] = weekdays.loc[:, 5:6].sum(axis=1)
+    return aggregates.reset_index()
+
+
+def combine_aggregates(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge per-user aggregates of two disjoint sets of logs.
+
+    Counts and sums add; response-time mean and M2 are merged with Chan's
+    parallel update.
+
+    Args:
+        left: Aggregates indexed by user_id
+        right: Aggregates indexed by user_id
+
+    Returns:
+        Combined aggregates indexed by user_id
+    """
+    left, right = left.align(right, fill_value=0)
+    combined = left.copy()
+    sum_columns = [column for column in _SUM_COLUMNS if column in left.columns]
+    combined[sum_columns] = left[sum_columns] + right[sum_columns]
+
+    n_left, n_right = left["response_time_count"], right["response_time_count"]
+    n = (n_left + n_right).where(lambda total: total > 0, 1)
+    delta = right["response_time_mean"] - left["response_time_mean"]
+    combined["response_time_mean"] = left["response_time_mean"] + delta * n_right / n
+    combined["response_time_m2"] = (
+        left["response_time_m2"] + right["response_time_m2"] + delta ** 2 * n_left * n_right / n
+    )
+    return combined
+
+
+def aggregate_email_logs(
+    db: Session,
+    user_ids: Optional[List[int]] = None,
+    recent_since: Optional[datetime] = None,
+    chunk_size: int = DEFAULT_LOG_CHUNK_SIZE
+) -> pd.DataFrame:
+    """
+    Stream email logs and fold them into per-user aggregates.
+
+    Args:
+        db: Database session
+        user_ids: Only aggregate these users' logs, or None for every log
+        recent_since: Also count logs sent at or after this time as recent_count
+        chunk_size: Logs per chunk
+
+    Returns:
+        DataFrame with one row per user with logs and the aggregate columns
+    """
+    aggregates = None
+    for columns in iter_email_log_columns(db, user_ids=user_ids, chunk_size=chunk_size):
+        chunk = aggregate_log_columns(columns, recent_since=recent_since).set_index("user_id")
+        aggregates = chunk if aggregates is None else combine_aggregates(aggregates, chunk)
+    if aggregates is None:
+        return aggregate_log_columns(
+            {name: [] for name in ("user_id", "clicked", "responded", "sent_at", "clicked_at", "template_type")},
+            recent_since=recent_since
+        )
+    return aggregates.reset_index()
+
+
+def build_training_dataset(db: Session, now: datetime = None, chunk_size: int = DEFAULT_LOG_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Build the training dataset from the raw email logs.
+
+    Args:
+        db: Database session
+        now: Reference time for the 7-day recent activity count
+        chunk_size: Logs per chunk
+
+    Returns:
+        DataFrame with one row per user: id, name, department, the feature
+        store aggregate columns, recent_count and label
+    """
+    recent_since = (now or datetime.now()) - timedelta(days=7)
+    aggregates = aggregate_email_logs(db, recent_since=recent_since, chunk_size=chunk_size)
+
+    users = pd.DataFrame(
+        db.query(models.User.id, models.User.name, models.Department.name.label("department"))
+        .outerjoin(models.Department, models.User.department_id == models.Department.id)
+        .order_by(models.User.id)
+        .all(),
+        columns=["id", "name", "department"]
+    )
+    dataset = users.merge(aggregates.rename(columns={"user_id": "id"}), on="id", how="left")
+    count_columns = [column for column in _SUM_COLUMNS if column != "template_rate_sum"]
+    dataset[count_columns] = dataset[count_columns].fillna(0).astype(np.int64)
+    dataset[["template_rate_sum", "response_time_mean", "response_time_m2"]] = dataset[
+        ["template_rate_sum", "response_time_mean", "response_time_m2"]
+    ].fillna(0.0)
+    dataset["label"] = MLRiskPredictor(load=False).labels_from_aggregates(dataset)
+    return dataset
+
+
+def write_snapshot(dataset: pd.DataFrame, path: str = DEFAULT_SNAPSHOT_PATH) -> str:
+    """
+    Write a training dataset to a Parquet snapshot, replacing any previous one atomically.
+
+    Args:
+        dataset: Dataset from build_training_dataset
+        path: Snapshot file path
+
+    Returns:
+        The snapshot path
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(pa.Table.from_pandas(dataset, preserve_index=False), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def read_snapshot(path: str = DEFAULT_SNAPSHOT_PATH) -> pd.DataFrame:
+    """
+    Read a training dataset snapshot.
+
+    Args:
+        path: Snapshot file path
+
+    Returns:
+        The dataset
+
+    Raises:
+        FileNotFoundError: If no snapshot exists
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No training snapshot at {path}")
+    return pq.read_table(path).to_pandas()
@@ -0,0 +1,215 @@
+"""
+Feature Store Utilities for Phishing Simulation Platform
+This module maintains the user_features table: running aggregates of each
+user's email history from which the MLRiskPredictor feature vector is built.
+Sends, clicks and responses update a user's row incrementally (response-time
+mean and variance use Welford's online update), so training and prediction
+read one row per user instead of their whole history.
+
+The store can be rebuilt from the raw email logs with:
+    python -m Utils.feature_utils rebuild
+"""
+
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import models
+from Utils.ai_utils import MLRiskPredictor
+from Utils.dataset_utils import aggregate_email_logs
+
+_F = models.UserFeatures
+
+# Aggregate columns of the store, in the order they are returned by load_user_feature_rows
+AGGREGATE_COLUMNS = [
+    "email_count", "click_count", "responded_count",
+    "response_time_count", "response_time_mean", "response_time_m2",
+    "timed_click_count", "work_hours_click_count", "weekend_click_count",
+    "template_rate_sum"
+]
+
+
+def _template_rate(template_type: Optional[str]) -> float:
+    """Historical click rate used for a template's vulnerability score."""
+    return MLRiskPredictor.TEMPLATE_CLICK_RATES.get(template_type, MLRiskPredictor.DEFAULT_TEMPLATE_CLICK_RATE)
+
+
+def _upsert(db: Session, user_id: int, values: dict, updates: dict):
+    """Insert a user's row with the given values, or apply the update expressions to it."""
+    stmt = insert(_F).values(user_id=user_id, updated_at=datetime.utcnow(), **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={**updates, "updated_at": stmt.excluded.updated_at}
+    )
+    db.execute(stmt)
+
+
+def record_sent_emails(db: Session, logs: Iterable[models.EmailLog]):
+    """
+    Count newly sent emails in their recipients' feature rows.
+
+    Args:
+        db: Database session (the caller commits)
+        logs: Newly created email logs
+    """
+    for user_id, count in Counter(log.user_id for log in logs).items():
+        _upsert(db, user_id, {"email_count": count}, {"email_count": _F.email_count + count})
+
+
+def record_email_click(db: Session, log: models.EmailLog):
+    """
+    Fold a first click on an email into the user's feature row.
+
+    Args:
+        db: Database session (the caller commits)
+        log: The clicked email log, with clicked_at already set
+    """
+    values = {"click_count": 1, "template_rate_sum": _template_rate(log.template_type)}
+    updates = {
+        "click_count": _F.click_count + 1,
+        "template_rate_sum": _F.template_rate_sum + values["template_rate_sum"]
+    }
+
+    if log.clicked_at:
+        work_hours = int(9 <= log.clicked_at.hour <= 17)
+        weekend = int(log.clicked_at.weekday() >= 5)
+        values.update(timed_click_count=1, work_hours_click_count=work_hours, weekend_click_count=weekend)
+        updates.update({
+            "timed_click_count": _F.timed_click_count + 1,
+            "work_hours_click_count": _F.work_hours_click_count + work_hours,
+            "weekend_click_count": _F.weekend_click_count + weekend
+        })
+
+        if log.sent_at:
+            # Welford's update, written against the row's previous values so
+            # the whole update is a single atomic statement
+            x = (log.clicked_at - log.sent_at).total_seconds() / 60
+            n = _F.response_time_count + 1
+            new_mean = _F.response_time_mean + (x - _F.response_time_mean) / n
+            values.update(response_time_count=1, response_time_mean=x, response_time_m2=0.0)
+            updates.update({
+                "response_time_count": n,
+                "response_time_mean": new_mean,
+                "response_time_m2": _F.response_time_m2 + (x - _F.response_time_mean) * (x - new_mean)
+            })
+
+    _upsert(db, log.user_id, values, updates)
+
+
+def record_email_response(db: Session, log: models.EmailLog):
+    """
+    Count a first response to an email in the user's feature row.
+
+    Args:
+        db: Database session (the caller commits)
+        log: The email log that was responded to
+    """
+    _upsert(db, log.user_id, {"responded_count": 1}, {"responded_count": _F.responded_count + 1})
+
+
+def refresh_user_features(db: Session, user_ids: Optional[List[int]] = None) -> int:
+    """
+    Recompute feature rows from the raw email logs.
+
+    Used for backfills and after edits (log updates, deletions, repeated
+    clicks) that cannot be applied incrementally.
+
+    Args:
+        db: Database session (the caller commits; pending changes are flushed first)
+        user_ids: Users to recompute, or None for every user
+
+    Returns:
+        Number of feature rows written
+    """
+    db.flush()
+    delete = db.query(_F)
+    if user_ids is not None:
+        delete = delete.filter(_F.user_id.in_(user_ids))
+    delete.delete(synchronize_session=False)
+
+    # Logs are streamed in chunks and folded into per-user aggregates, so a
+    # full rebuild never holds the whole email_logs table in memory
+    aggregates = aggregate_email_logs(db, user_ids=user_ids)
+    if aggregates.empty:
+        return 0
+    aggregates["updated_at"] = datetime.utcnow()
+    db.execute(insert(_F), aggregates.to_dict(orient="records"))
+    return len(aggregates)
+
+
+def load_user_feature_rows(
+    db: Session,
+    user_ids: Optional[List[int]] = None,
+    after_user_id: int = 0,
+    limit: Optional[int] = None,
+    now: datetime = None
+) -> pd.DataFrame:
+    """
+    Load users with their stored aggregates and recent activity, ordered by ID.
+
+    Args:
+        db: Database session
+        user_ids: Load only these users
+        after_user_id: Load users with a greater ID (for chunked reads)
+        limit: Maximum number of users to load
+        now: Reference time for the 7-day recent activity count
+
+    Returns:
+        DataFrame with id, name, department, the aggregate columns and recent_count
+    """
+    query = (
+        db.query(models.User.id, models.User.name, models.Department.name.label("department"),
+                 *[getattr(_F, column) for column in AGGREGATE_COLUMNS])
+        .outerjoin(models.Department, models.User.department_id == models.Department.id)
+        .outerjoin(_F, _F.user_id == models.User.id)
+        .filter(models.User.id > after_user_id)
+        .order_by(models.User.id)
+    )
+    if user_ids is not None:
+        query = query.filter(models.User.id.in_(user_ids))
+    if limit is not None:
+        query = query.limit(limit)
+
+    frame = pd.DataFrame(query.all(), columns=["id", "name", "department", *AGGREGATE_COLUMNS])
+    frame[AGGREGATE_COLUMNS] = frame[AGGREGATE_COLUMNS].astype(float).fillna(0.0)
+    if frame.empty:
+        frame["recent_count"] = []
+        return frame
+
+    # Activity in a sliding window cannot be kept as a running total; count it
+    # with one range query over the (user_id, sent_at) index
+    recent_date = (now or datetime.now()) - timedelta(days=7)
+    recent = dict(
+        db.query(models.EmailLog.user_id, func.count(models.EmailLog.id))
+        .filter(
+            models.EmailLog.user_id.between(int(frame["id"].iloc[0]), int(frame["id"].iloc[-1])),
+            models.EmailLog.sent_at >= recent_date
+        )
+        .group_by(models.EmailLog.user_id)
+        .all()
+    )
+    frame["recent_count"] = frame["id"].map(recent).fillna(0).astype(float)
+    return frame
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m Utils.feature_utils rebuild")
+        sys.exit(1)
+
+    init_db()
+    session = SessionLocal()
+    try:
+        rows = refresh_user_features(session)
+        session.commit()
+        print(f"✅ Rebuilt user feature store: {rows} rows")
+    finally:
+        session.close()
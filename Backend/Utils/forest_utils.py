@@ -0,0 +1,121 @@
+"""
+Forest Utilities for Phishing Simulation Platform
+This module compiles a trained scikit-learn RandomForestClassifier into flat
+NumPy node arrays and evaluates it with vectorised array operations. For a
+handful of rows this avoids the per-call overhead of predict_proba (input
+validation and one joblib task per tree) while producing the same
+probabilities.
+"""
+
+from typing import List
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+
+class CompiledForest:
+    """
+    A random forest flattened into contiguous node arrays.
+    Every tree's nodes are stored back to back; child indices are global.
+    Leaves point to themselves with an infinite threshold, so a row that has
+    reached a leaf stays there no matter how many more steps are taken.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray):
+        """
+        Initialize from node arrays.
+
+        Args:
+            feature: Feature index tested at each node (0 at leaves)
+            threshold: Split threshold at each node (+inf at leaves)
+            left: Global index of each node's left child (itself at leaves)
+            right: Global index of each node's right child (itself at leaves)
+            value: Class probabilities at each node, shape (n_nodes, n_classes)
+            roots: Global index of each tree's root node
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.is_leaf = left == np.arange(len(left))
+
+    @classmethod
+    def from_sklearn(cls, model: RandomForestClassifier) -> "CompiledForest":
+        """
+        Compile a fitted RandomForestClassifier.
+
+        Args:
+            model: Fitted single-output forest
+
+        Returns:
+            The compiled forest
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        arrays: List[List[np.ndarray]] = [[], [], [], [], []]
+
+        for tree, offset in zip(trees, offsets[:-1]):
+            nodes = np.arange(offset, offset + tree.node_count)
+            leaf = tree.children_left == -1
+            # Trees store weighted class counts; predict_proba normalises them per node
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            arrays[0].append(np.where(leaf, 0, tree.feature))
+            arrays[1].append(np.where(leaf, np.inf, tree.threshold))
+            arrays[2].append(np.where(leaf, nodes, tree.children_left + offset))
+            arrays[3].append(np.where(leaf, nodes, tree.children_right + offset))
+            arrays[4].append(counts / totals)
+
+        feature, threshold, left, right, value = (np.concatenate(parts) for parts in arrays)
+        return cls(
+            feature.astype(np.intp), threshold.astype(np.float64),
+            left.astype(np.intp), right.astype(np.intp),
+            value.astype(np.float64), offsets[:-1].astype(np.intp)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the node arrays in bytes."""
+        return sum(array.nbytes for array in (
+            self.feature, self.threshold, self.left, self.right, self.value, self.roots, self.is_leaf
+        ))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predict class probabilities, matching RandomForestClassifier.predict_proba.
+
+        All (row, tree) pairs descend one level per step; pairs that reach a
+        leaf drop out of the working set.
+
+        Args:
+            X: Feature matrix of shape (n_rows, n_features)
+
+        Returns:
+            Array of shape (n_rows, n_classes)
+        """
+        # sklearn evaluates trees on float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        values = X.ravel()
+
+        active = np.arange(nodes.size)
+        current = nodes
+        while current.size:
+            go_left = values[row_offsets + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            done = self.is_leaf[current]
+            if done.any():
+                nodes[active[done]] = current[done]
+                keep = ~done
+                active, current, row_offsets = active[keep], current[keep], row_offsets[keep]
+
+        # Summing across the tree axis adds trees in order, as sklearn does
+        return self.value[nodes].reshape(n_rows, n_trees, -1).sum(axis=1) / n_trees
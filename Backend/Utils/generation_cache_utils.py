@@ -0,0 +1,218 @@
+"""
+Generation Cache Utilities for Phishing Simulation Platform
+This module caches AI-generated emails so campaigns do not make one model
+call per recipient. Emails are generated for a placeholder recipient and
+pooled per (template type, department, prompt version) key; once a key's
+pool is full, requests are served from it and only the recipient's name is
+filled in. Pools expire after a TTL, the least recently used keys are evicted
+beyond a key limit, and the cache can optionally persist to a JSON file.
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default cache settings, overridable from the environment (.env)
+DEFAULT_POOL_SIZE = int(os.getenv("GENERATION_CACHE_POOL_SIZE", "5"))
+DEFAULT_TTL = float(os.getenv("GENERATION_CACHE_TTL", "86400"))
+DEFAULT_MAX_KEYS = int(os.getenv("GENERATION_CACHE_MAX_KEYS", "256"))
+DEFAULT_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", "")
+
+# How long a request waits for an in-flight generation of its key before
+# generating on its own
+DEFAULT_FILL_WAIT = 60.0
+
+
+class GenerationCache:
+    """
+    Thread-safe pool of generated emails per cache key.
+    While a key's pool is filling, at most pool_size generations for it are
+    in flight; other requests for the key wait for one of them (or reuse an
+    email already pooled) instead of calling the model too.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        ttl: float = DEFAULT_TTL,
+        max_keys: int = DEFAULT_MAX_KEYS,
+        path: Optional[str] = DEFAULT_CACHE_PATH or None
+    ):
+        """
+        Initialize the cache, loading persisted entries if a path is given.
+
+        Args:
+            pool_size: Distinct emails kept per key; 0 disables caching
+            ttl: Seconds a generated email may be served
+            max_keys: Keys kept before the least recently used is evicted
+            path: Optional JSON file the cache is persisted to
+        """
+        self.pool_size = pool_size
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._pools: "OrderedDict[tuple, list]" = OrderedDict()
+        self._pending: Dict[tuple, int] = {}
+        self._condition = threading.Condition()
+        if self.path:
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether generated emails are cached at all."""
+        return self.pool_size > 0
+
+    def get_or_generate(
+        self,
+        key: tuple,
+        generate: Callable[[], Dict[str, Any]],
+        wait_timeout: float = DEFAULT_FILL_WAIT
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Serve an email for a key from its pool, or generate one into the pool.
+
+        Args:
+            key: Cache key (template type, department, prompt version)
+            generate: Callable returning a new email dictionary; exceptions
+                propagate and nothing is cached
+            wait_timeout: Seconds to wait for another request's generation
+
+        Returns:
+            Tuple of (email dictionary, whether it came from the cache)
+        """
+        if not self.enabled:
+            return generate(), False
+
+        deadline = time.monotonic() + wait_timeout
+        with self._condition:
+            while True:
+                pool = self._live_pool(key)
+                pending = self._pending.get(key, 0)
+                # Serve from the pool once it is full, or once the generations
+                # still needed to fill it are already in flight
+                if pool and len(pool) + pending >= self.pool_size:
+                    self.hits += 1
+                    return dict(random.choice(pool)["email"]), True
+                remaining = deadline - time.monotonic()
+                if len(pool) + pending < self.pool_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            self._pending[key] = pending + 1
+            self.misses += 1
+
+        try:
+            email = generate()
+        except Exception:
+            with self._condition:
+                self._release(key)
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._release(key)
+            pool = self._pools.setdefault(key, [])
+            if len(pool) < self.pool_size:
+                pool.append({"email": dict(email), "created_at": time.time()})
+                self._pools.move_to_end(key)
+                while len(self._pools) > self.max_keys:
+                    self._pools.popitem(last=False)
+                self._save()
+            self._condition.notify_all()
+        return email, False
+
+    def _live_pool(self, key: tuple) -> list:
+        """Return a key's pool without expired entries, marking the key recently used."""
+        pool = self._pools.get(key)
+        if pool is None:
+            return []
+        cutoff = time.time() - self.ttl
+        pool[:] = [entry for entry in pool if entry["created_at"] >= cutoff]
+        self._pools.move_to_end(key)
+        return pool
+
+    def _release(self, key: tuple):
+        """Drop one in-flight generation for a key."""
+        self._pending[key] -= 1
+        if not self._pending[key]:
+            del self._pending[key]
+
+    def clear(self):
+        """Remove every cached email."""
+        with self._condition:
+            self._pools.clear()
+            self.hits = self.misses = 0
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the cache contents and hit rate.
+
+        Returns:
+            Dictionary with settings, key and email counts, hits, misses and hit_rate
+        """
+        with self._condition:
+            requests = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "pool_size": self.pool_size,
+                "ttl_seconds": self.ttl,
+                "max_keys": self.max_keys,
+                "persisted": bool(self.path),
+                "keys": len(self._pools),
+                "emails": sum(len(pool) for pool in self._pools.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else None
+            }
+
+    def _save(self):
+        """Persist the pools to disk atomically (caller holds the lock)."""
+        if not self.path:
+            return
+        entries = [
+            {"key": list(key), "email": entry["email"], "created_at": entry["created_at"]}
+            for key, pool in self._pools.items() for entry in pool
+        ]
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"entries": entries}, f, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist generation cache: {str(e)}")
+
+    def _load(self):
+        """Load unexpired persisted entries, oldest keys first."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)["entries"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable generation cache {self.path}: {str(e)}")
+            return
+
+        cutoff = time.time() - self.ttl
+        for entry in entries:
+            key = tuple(entry["key"])
+            pool = self._pools.setdefault(key, [])
+            if entry["created_at"] >= cutoff and len(pool) < self.pool_size:
+                pool.append({"email": entry["email"], "created_at": entry["created_at"]})
+        for key in [key for key, pool in self._pools.items() if not pool]:
+            del self._pools[key]
+        while len(self._pools) > self.max_keys:
+            self._pools.popitem(last=False)
+        print(f"✅ Loaded generation cache: {sum(len(pool) for pool in self._pools.values())} emails")
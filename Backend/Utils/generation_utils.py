@@ -0,0 +1,198 @@
+"""
+Generation Utilities for Phishing Simulation Platform
+This module runs AI email generation for many users concurrently.
+Model calls are spread over a bounded thread pool and paced by a token
+bucket so department-wide campaigns finish in a fraction of the sequential
+time without exceeding the model API's request rate. In batched mode one
+model call writes several emails for users sharing a template type and
+department.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default pipeline settings, overridable from the environment (.env)
+DEFAULT_MAX_WORKERS = int(os.getenv("GENERATION_MAX_WORKERS", "8"))
+DEFAULT_RATE_LIMIT = float(os.getenv("GENERATION_RATE_LIMIT", "10"))
+DEFAULT_BATCH_SIZE = int(os.getenv("GENERATION_BATCH_SIZE", "5"))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    acquire() takes one token, sleeping until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second; 0 or less disables limiting
+            capacity: Maximum burst size (defaults to one second of tokens)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def generate_emails_concurrently(
+    generator,
+    users: List[Dict[str, Any]],
+    template_type: Optional[str] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    requests_per_second: float = DEFAULT_RATE_LIMIT
+) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Generate one phishing email per user with bounded parallelism.
+
+    Args:
+        generator: Object exposing generate_phishing_email(user_info, template_type, on_model_call)
+        users: User info dictionaries (id, name, email, department)
+        template_type: Optional template type passed to every generation
+        max_workers: Maximum number of concurrent model calls
+        requests_per_second: Model call rate limit; 0 or less disables it
+
+    Returns:
+        Tuple of (results, errors): results pairs each user with their
+        generated email in input order; errors holds one entry per failed
+        user with user_id, user_name and error
+    """
+    bucket = TokenBucket(requests_per_second)
+
+    def generate(user_info: Dict[str, Any]) -> Dict[str, Any]:
+        # Only actual model calls take a token; cached emails are served at once
+        return generator.generate_phishing_email(
+            user_info=user_info, template_type=template_type, on_model_call=bucket.acquire
+        )
+
+    results = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(users) or 1))) as executor:
+        futures = [(user, executor.submit(generate, user)) for user in users]
+        for user, future in futures:
+            try:
+                results.append((user, future.result()))
+            except Exception as e:
+                errors.append({
+                    "user_id": user.get("id"),
+                    "user_name": user.get("name"),
+                    "error": str(e)
+                })
+
+    return results, errors
+
+
+def generate_emails_batched(
+    generator,
+    users: List[Dict[str, Any]],
+    template_type: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    requests_per_second: float = DEFAULT_RATE_LIMIT
+) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Generate one phishing email per user, several emails per model call.
+    Users are grouped by template type (chosen per user when not given) and
+    department, and each group is split into batches of batch_size; every
+    batch is one generate_email_batch call for the placeholder recipient,
+    personalized per user. Users a batch could not cover (failed call or
+    too many malformed items) get a single-email generation instead.
+
+    Args:
+        generator: AIEmailGenerator (templates, generate_email_batch,
+            personalize and generate_phishing_email)
+        users: User info dictionaries (id, name, email, department)
+        template_type: Optional template type for every email
+        batch_size: Emails requested per model call
+        max_workers: Maximum number of concurrent model calls
+        requests_per_second: Model call rate limit; 0 or less disables it
+
+    Returns:
+        Tuple of (results, errors) like generate_emails_concurrently
+    """
+    bucket = TokenBucket(requests_per_second)
+    groups: Dict[tuple, List[int]] = {}
+    for index, user in enumerate(users):
+        user_template = template_type or random.choice(list(generator.templates))
+        groups.setdefault((user_template, user.get("department")), []).append(index)
+    batches = [
+        (key, indexes[start:start + max(1, batch_size)])
+        for key, indexes in groups.items()
+        for start in range(0, len(indexes), max(1, batch_size))
+    ]
+
+    def generate(key: tuple, indexes: List[int]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, str]]]:
+        batch_template, department = key
+        try:
+            emails = generator.generate_email_batch(batch_template, department, len(indexes), bucket.acquire)
+        except Exception as e:
+            print(f"⚠️ Batched generation of {batch_template} emails for {department} failed: {str(e)}")
+            emails = []
+        generated_at = datetime.utcnow()
+        results, failures = [], []
+        # Each user is handled on their own, so one failure does not discard the rest of the batch
+        for index, email in zip(indexes, emails):
+            try:
+                results.append((index, {
+                    **generator.personalize(email, users[index]),
+                    "template_type": batch_template,
+                    "generated_at": generated_at,
+                    "cached": False
+                }))
+            except Exception as e:
+                failures.append((index, str(e)))
+        for index in indexes[len(emails):]:
+            try:
+                results.append((index, generator.generate_phishing_email(
+                    user_info=users[index], template_type=batch_template, on_model_call=bucket.acquire
+                )))
+            except Exception as e:
+                failures.append((index, str(e)))
+        return results, failures
+
+    emails_by_index: Dict[int, Dict[str, Any]] = {}
+    failures: Dict[int, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches) or 1))) as executor:
+        futures = [(indexes, executor.submit(generate, key, indexes)) for key, indexes in batches]
+        for indexes, future in futures:
+            try:
+                batch_results, batch_failures = future.result()
+            except Exception as e:
+                failures.update((index, str(e)) for index in indexes)
+                continue
+            emails_by_index.update(batch_results)
+            failures.update(batch_failures)
+
+    errors = [
+        {"user_id": users[index].get("id"), "user_name": users[index].get("name"), "error": failures[index]}
+        for index in sorted(failures)
+    ]
+    results = [(users[index], emails_by_index[index]) for index in range(len(users)) if index in emails_by_index]
+    return results, errors
@@ -0,0 +1,193 @@
+"""
+Hedging Utilities for Phishing Simulation Platform
+This module cuts the tail latency of model calls with hedged requests.
+HedgedBackend sends each request to the primary backend and, if no answer
+has arrived after a delay taken from a high percentile of recent primary
+latencies, sends a duplicate (optionally to a secondary model) and returns
+whichever answer comes first. Duplicates are limited to a share of all
+requests, so hedging only spends extra calls on the slow tail.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from Utils.llm_backend_utils import LLMBackend
+from Utils.metrics_utils import Histogram
+
+load_dotenv()
+
+# Default hedging settings, overridable from the environment (.env)
+DEFAULT_HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+DEFAULT_HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+DEFAULT_HEDGE_INITIAL_DELAY_MS = float(os.getenv("HEDGE_INITIAL_DELAY_MS", "2000"))
+DEFAULT_HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "100"))
+DEFAULT_HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+DEFAULT_HEDGE_SECONDARY_MODEL = os.getenv("HEDGE_SECONDARY_MODEL", "")
+DEFAULT_HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "64"))
+
+# Primary latencies needed before the percentile replaces the initial delay
+MIN_LATENCY_SAMPLES = 20
+
+
+class HedgedBackend(LLMBackend):
+    """
+    LLM backend wrapper sending a second request when the first is slow.
+    Requests run on a shared thread pool while the caller waits. The hedge
+    delay is the configured percentile of the last `window` successful
+    primary latencies (initial_delay_ms until MIN_LATENCY_SAMPLES exist),
+    never below min_delay_ms. A hedge is only sent while hedges stay within
+    `budget` times the number of requests. The losing request is not
+    cancelled; its answer is discarded. Streams are not hedged.
+    """
+
+    def __init__(
+        self,
+        primary: LLMBackend,
+        secondary: Optional[LLMBackend] = None,
+        enabled: bool = DEFAULT_HEDGE_ENABLED,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        initial_delay_ms: float = DEFAULT_HEDGE_INITIAL_DELAY_MS,
+        min_delay_ms: float = DEFAULT_HEDGE_MIN_DELAY_MS,
+        budget: float = DEFAULT_HEDGE_BUDGET,
+        workers: int = DEFAULT_HEDGE_WORKERS,
+        window: int = 1000
+    ):
+        """
+        Wrap a backend.
+
+        Args:
+            primary: Backend every request goes to first
+            secondary: Backend hedges go to; the primary if None
+            enabled: Whether to hedge at all; when False requests pass
+                straight through to the primary
+            percentile: Percentile of recent primary latencies used as the hedge delay
+            initial_delay_ms: Hedge delay until enough latencies are known
+            min_delay_ms: Smallest hedge delay
+            budget: Largest ratio of hedges to requests
+            workers: Threads running primary and hedge requests
+            window: Recent primary latencies kept for the percentile
+        """
+        self.primary = primary
+        self.secondary = secondary or primary
+        self.name = primary.name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.initial_delay_ms = initial_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.budget = budget
+        self.workers = workers
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.latency_ms = Histogram([100, 250, 500, 1000, 2000, 5000, 10000, 30000])
+        self._primary_latencies = deque(maxlen=window)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return self.primary.available()
+
+    def hedge_delay_ms(self) -> float:
+        """Current hedge delay in milliseconds."""
+        with self._lock:
+            latencies = list(self._primary_latencies)
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return max(self.min_delay_ms, self.initial_delay_ms)
+        return max(self.min_delay_ms, float(np.percentile(latencies, self.percentile)))
+
+    def _submit(self, backend: LLMBackend, prompt: str, max_output_tokens: Optional[int], timeout: Optional[float], primary: bool):
+        """Start a request on the pool, timing successful primary requests."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(2, self.workers), thread_name_prefix="model-hedge")
+            executor = self._executor
+        started = time.perf_counter()
+
+        def run() -> str:
+            text = backend.generate(prompt, max_output_tokens, timeout)
+            if primary:
+                with self._lock:
+                    self._primary_latencies.append((time.perf_counter() - started) * 1000)
+            return text
+
+        return executor.submit(run)
+
+    def _claim_hedge(self) -> bool:
+        """Count a hedge against the budget, or refuse it."""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                self.budget_denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def generate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        if not self.enabled:
+            return self.primary.generate(prompt, max_output_tokens, timeout)
+
+        started = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+        primary = self._submit(self.primary, prompt, max_output_tokens, timeout, primary=True)
+        done, _ = wait([primary], timeout=self.hedge_delay_ms() / 1000)
+        futures = [primary]
+        if not done and self._claim_hedge():
+            futures.append(self._submit(self.secondary, prompt, max_output_tokens, timeout, primary=False))
+
+        # Use the first successful answer; fail only once every request has failed
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    self.latency_ms.observe((time.perf_counter() - started) * 1000)
+                    return future.result()
+        return primary.result()
+
+    def stream(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        return self.primary.stream(prompt, max_output_tokens, timeout)
+
+    def stop(self):
+        """Shut down the request threads, letting running requests finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Describe hedging settings and how often hedges fire and win.
+
+        Returns:
+            Dictionary with settings, the current delay, requests, hedges,
+            hedge_rate, hedge_wins, win_rate (wins per hedge), budget_denied
+            and the hedged latency histogram (milliseconds)
+        """
+        delay = self.hedge_delay_ms()
+        with self._lock:
+            requests, hedges, wins, denied = self.requests, self.hedges, self.hedge_wins, self.budget_denied
+        return {
+            "enabled": self.enabled,
+            "secondary": getattr(self.secondary, "model_name", self.secondary.name) if self.secondary is not self.primary else None,
+            "percentile": self.percentile,
+            "budget": self.budget,
+            "delay_ms": round(delay, 3),
+            "requests": requests,
+            "hedges": hedges,
+            "hedge_rate": round(hedges / requests, 4) if requests else None,
+            "hedge_wins": wins,
+            "win_rate": round(wins / hedges, 4) if hedges else None,
+            "budget_denied": denied,
+            "latency_ms": self.latency_ms.snapshot()
+        }
@@ -0,0 +1,147 @@
+"""
+Inference Utilities for Phishing Simulation Platform
+This module micro-batches concurrent risk prediction requests. Callers
+enqueue a key and block; a dispatcher thread collects requests for a short
+window (or until a batch is full) and scores the whole batch with one call,
+so a burst of single-user predictions costs one feature load and one model
+call instead of one each.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from Utils.metrics_utils import Histogram
+
+load_dotenv()
+
+# Default batching settings, overridable from the environment (.env)
+DEFAULT_BATCH_WINDOW_MS = float(os.getenv("PREDICTION_BATCH_WINDOW_MS", "2"))
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("PREDICTION_MAX_BATCH_SIZE", "64"))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches for a batch function.
+    The batch function receives a list of keys and returns one result per
+    key, in order. An exception it raises is passed to every caller in the batch.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        window_ms: float = DEFAULT_BATCH_WINDOW_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+    ):
+        """
+        Initialize the batcher; the dispatcher thread starts on first use.
+
+        Args:
+            batch_fn: Callable scoring a list of keys
+            window_ms: How long to wait for more requests after the first one
+            max_batch_size: Largest batch passed to batch_fn
+        """
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_delay_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+        self.batch_time_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, key: Any, timeout: Optional[float] = 30.0) -> Any:
+        """
+        Enqueue a request and wait for its result.
+
+        Args:
+            key: Value passed to the batch function
+            timeout: Seconds to wait for the result
+
+        Returns:
+            The batch function's result for this key
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((key, future, time.perf_counter()))
+        return future.result(timeout=timeout)
+
+    def _ensure_started(self):
+        """Start the dispatcher thread if it is not running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._dispatch, name="prediction-batcher", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the dispatcher thread once queued requests are served."""
+        self._stopping.set()
+        self._queue.put(None)
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _collect(self) -> List[tuple]:
+        """Block for the first request, then gather more until the window closes or the batch is full."""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch(self):
+        """Dispatcher loop: collect a batch, score it and resolve its futures."""
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_delay_ms.observe((started - enqueued) * 1000)
+            self.batch_sizes.observe(len(batch))
+
+            try:
+                results = self.batch_fn([key for key, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batch_time_ms.observe((time.perf_counter() - started) * 1000)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Describe batching behaviour so far.
+
+        Returns:
+            Settings plus batch size, queueing delay and batch scoring time histograms
+        """
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_delay_ms": self.queue_delay_ms.snapshot(),
+            "batch_time_ms": self.batch_time_ms.snapshot()
+        }
@@ -0,0 +1,294 @@
+"""
+Job Queue Utilities for Phishing Simulation Platform
+This module provides a SQLite-backed background job queue with a pool of
+worker threads. Jobs are rows in the jobs table, so submitted work, progress
+counters and handler checkpoints survive a restart: jobs that were running
+when the process stopped are re-queued and resume from their checkpoint.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+import models
+
+load_dotenv()
+
+# Default number of worker threads, overridable from the environment (.env)
+DEFAULT_JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job handler when the job has been cancelled."""
+
+
+class JobContext:
+    """
+    Handle passed to job handlers for reporting progress and checkpoints.
+    Progress updates are written on the handler's own session, so callers
+    can commit them atomically together with the work they describe.
+    """
+
+    def __init__(self, db: Session, job: models.Job):
+        """
+        Initialize the context for a claimed job.
+
+        Args:
+            db: The handler's database session
+            job: The job being run
+        """
+        self.db = db
+        self.job = job
+        self.params = json.loads(job.params) if job.params else {}
+        self.checkpoint = json.loads(job.checkpoint) if job.checkpoint else {}
+
+    def set_total(self, total: int):
+        """Record the total units of work (committed immediately)."""
+        self.job.progress_total = total
+        self.db.commit()
+
+    def update(self, current: int, checkpoint: Optional[Dict[str, Any]] = None):
+        """
+        Stage a progress update and optional checkpoint on the job row.
+        The caller commits it together with the work it covers.
+
+        Args:
+            current: Units of work completed so far
+            checkpoint: JSON-serializable state needed to resume the job
+        """
+        self.job.progress_current = current
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+            self.job.checkpoint = json.dumps(checkpoint)
+
+    def raise_if_cancelled(self):
+        """
+        Check whether a cancel was requested for this job.
+
+        Raises:
+            JobCancelled: If the job should stop
+        """
+        requested = self.db.query(models.Job.cancel_requested).filter(models.Job.id == self.job.id).scalar()
+        if requested:
+            raise JobCancelled()
+
+
+class JobQueue:
+    """
+    Database-backed job queue with a pool of worker threads.
+    Handlers are registered per job type and called as handler(db, context);
+    their return value is stored as the job's JSON result. A job type may
+    also register a validator that checks its params when the job is submitted.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], num_workers: int = DEFAULT_JOB_WORKERS,
+                 poll_interval: float = 0.5):
+        """
+        Initialize the queue.
+
+        Args:
+            session_factory: Callable returning a new database session
+            num_workers: Number of worker threads
+            poll_interval: Seconds an idle worker waits between polls
+        """
+        self.session_factory = session_factory
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self.validators = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._threads = []
+
+    def register(
+        self,
+        job_type: str,
+        handler: Callable[[Session, JobContext], Any],
+        validate: Optional[Callable[[Session, Dict[str, Any]], None]] = None
+    ):
+        """
+        Register the handler for a job type.
+
+        Args:
+            job_type: Job type name
+            handler: Callable run as handler(db, context)
+            validate: Optional callable run as validate(db, params) on
+                submit; raises ValueError for params the handler cannot run with
+        """
+        self.handlers[job_type] = handler
+        if validate:
+            self.validators[job_type] = validate
+
+    def submit(self, db: Session, job_type: str, params: Optional[Dict[str, Any]] = None) -> models.Job:
+        """
+        Persist a new queued job and wake a worker.
+
+        Args:
+            db: Database session
+            job_type: Registered job type
+            params: JSON-serializable handler parameters
+
+        Returns:
+            The created job
+
+        Raises:
+            ValueError: If the job type is not registered or its params are invalid
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if job_type in self.validators:
+            self.validators[job_type](db, params or {})
+        job = models.Job(job_type=job_type, status=QUEUED, params=json.dumps(params or {}))
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._wakeup.set()
+        return job
+
+    def cancel(self, db: Session, job: models.Job) -> models.Job:
+        """
+        Cancel a job. Queued jobs are cancelled immediately; running jobs
+        stop at their handler's next cancellation check.
+
+        Args:
+            db: Database session
+            job: Job to cancel
+
+        Returns:
+            The updated job
+        """
+        if job.status == QUEUED:
+            job.status = CANCELLED
+            job.finished_at = datetime.utcnow()
+        elif job.status == RUNNING:
+            job.cancel_requested = True
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def start(self):
+        """Re-queue jobs interrupted by a restart and start the worker threads."""
+        db = self.session_factory()
+        try:
+            resumed = db.query(models.Job).filter(models.Job.status == RUNNING).update(
+                {models.Job.status: QUEUED}, synchronize_session=False
+            )
+            db.commit()
+            if resumed:
+                print(f"🔁 Re-queued {resumed} interrupted job(s)")
+        finally:
+            db.close()
+
+        self._stopping.clear()
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Signal the workers to stop and wait briefly for them to exit."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _claim_next(self, db: Session) -> Optional[models.Job]:
+        """Atomically move the oldest queued job to running."""
+        with self._claim_lock:
+            job = (
+                db.query(models.Job)
+                .filter(models.Job.status == QUEUED)
+                .order_by(models.Job.id)
+                .first()
+            )
+            if not job:
+                return None
+            # Guard on the status so another process sharing the database cannot claim it twice
+            claimed = db.query(models.Job).filter(
+                models.Job.id == job.id, models.Job.status == QUEUED
+            ).update({
+                models.Job.status: RUNNING,
+                models.Job.started_at: datetime.utcnow(),
+                models.Job.attempts: models.Job.attempts + 1
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return None
+            db.refresh(job)
+            return job
+
+    def _worker(self):
+        """Worker loop: claim and run jobs until stopped."""
+        while not self._stopping.is_set():
+            job = None
+            db = self.session_factory()
+            try:
+                job = self._claim_next(db)
+                if job:
+                    self._run(db, job)
+            except Exception as e:
+                print(f"❌ Job worker error: {e}")
+            finally:
+                db.close()
+            if not job:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _run(self, db: Session, job: models.Job):
+        """Run one claimed job and record its outcome."""
+        context = JobContext(db, job)
+        try:
+            result = self.handlers[job.job_type](db, context)
+            job.status = SUCCEEDED
+            job.result = json.dumps(result, default=str)
+        except JobCancelled:
+            db.rollback()
+            job.status = CANCELLED
+        except Exception as e:
+            db.rollback()
+            job.status = FAILED
+            job.error = str(e)
+            print(f"❌ Job {job.id} ({job.job_type}) failed: {e}")
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def serialize_job(job: models.Job) -> Dict[str, Any]:
+    """
+    Convert a job row into an API response dictionary.
+
+    Args:
+        job: Job to serialize
+
+    Returns:
+        Dictionary with decoded params and result
+    """
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "params": json.loads(job.params) if job.params else {},
+        "progress_current": job.progress_current,
+        "progress_total": job.progress_total,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
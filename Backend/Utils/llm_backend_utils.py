@@ -0,0 +1,305 @@
+"""
+LLM Backend Utilities for Phishing Simulation Platform
+This module puts the text generation model behind a small backend interface
+(sync and async generate, streaming and batch) so the email generator does
+not depend on one client library. GeminiBackend calls Google's Gemma model
+through google-generativeai and configures the client on first use rather
+than at import time; HTTPStubBackend calls the local stub server in
+Benchmarks/llm_stub_server.py, so the generation pipeline can be
+load-tested without the external service.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Union
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default backend settings, overridable from the environment (.env)
+DEFAULT_LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+DEFAULT_GEMMA_MODEL = os.getenv("GEMMA_MODEL", "gemma-3n-e4b-it")
+DEFAULT_TEMPERATURE = float(os.getenv("GEMMA_TEMPERATURE", "0.7"))
+DEFAULT_MAX_OUTPUT_TOKENS = int(os.getenv("GEMMA_MAX_TOKENS", "300"))
+DEFAULT_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8765")
+
+# Sampling settings of the generation prompts
+DEFAULT_TOP_P = 0.8
+DEFAULT_TOP_K = 40
+
+# Backends create_backend knows about
+LLM_BACKENDS = ("gemini", "stub")
+
+
+class LLMBackendError(Exception):
+    """Raised when a backend request fails; status is the HTTP status, if any."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class LLMBackend:
+    """
+    Text generation backend interface.
+    Subclasses implement generate and usually stream; agenerate and
+    generate_batch default to running generate on worker threads.
+    """
+
+    # Short backend name reported in metrics
+    name = "base"
+
+    def available(self) -> bool:
+        """Whether a request would currently be attempted; wrappers with a circuit breaker may refuse."""
+        return True
+
+    def generate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        """
+        Generate a complete response.
+
+        Args:
+            prompt: Prompt text
+            max_output_tokens: Output token limit, or None for the default
+            timeout: Seconds to wait for the response, or None for the
+                client default
+
+        Returns:
+            Generated text
+
+        Raises:
+            LLMBackendError: If the backend rejects or fails the request
+        """
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        """Async generate; runs generate on a worker thread unless overridden."""
+        return await asyncio.to_thread(self.generate, prompt, max_output_tokens, timeout)
+
+    def stream(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Generate a response as a sequence of text chunks.
+
+        Args:
+            prompt: Prompt text
+            max_output_tokens: Output token limit, or None for the default
+            timeout: Seconds to wait for the response, or None for the
+                client default
+
+        Yields:
+            Text chunks in order; their concatenation is the full response
+        """
+        yield self.generate(prompt, max_output_tokens, timeout)
+
+    def generate_batch(
+        self,
+        prompts: Sequence[str],
+        max_output_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_workers: int = 8
+    ) -> List[Union[str, Exception]]:
+        """
+        Generate responses for several prompts concurrently.
+
+        Args:
+            prompts: Prompt texts
+            max_output_tokens: Output token limit, or None for the default
+            timeout: Seconds to wait for each response
+            max_workers: Maximum concurrent requests
+
+        Returns:
+            One entry per prompt in input order: the generated text, or the
+            exception its request raised
+        """
+        def generate(prompt: str) -> Union[str, Exception]:
+            try:
+                return self.generate(prompt, max_output_tokens, timeout)
+            except Exception as e:
+                return e
+
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as executor:
+            return list(executor.map(generate, prompts))
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Generative AI backend (Gemma by default).
+    The API key is configured and the model created on the first request.
+    """
+
+    name = "gemini"
+
+    # genai.configure sets process-wide client state, so it runs once
+    _configure_lock = threading.Lock()
+    _configured = False
+
+    # Threads running requests that have a timeout, shared by all instances
+    REQUEST_WORKERS = 32
+    _executor = None
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_GEMMA_MODEL,
+        api_key: Optional[str] = None,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+    ):
+        """
+        Initialize the backend without contacting the API.
+
+        Args:
+            model_name: Generative model name
+            api_key: API key, or None for GOOGLE_API_KEY
+            temperature: Sampling temperature
+            max_output_tokens: Default output token limit
+        """
+        self.model_name = model_name
+        self.api_key = api_key
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self._model = None
+
+    @property
+    def model(self):
+        """The genai.GenerativeModel, created (and the client configured) on first use."""
+        if self._model is None:
+            with GeminiBackend._configure_lock:
+                if not GeminiBackend._configured or self.api_key:
+                    genai.configure(api_key=self.api_key or os.getenv("GOOGLE_API_KEY"))
+                    GeminiBackend._configured = True
+                if self._model is None:
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _config(self, max_output_tokens: Optional[int]):
+        """Generation config for a request."""
+        return genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=max_output_tokens or self.max_output_tokens,
+            top_p=DEFAULT_TOP_P,
+            top_k=DEFAULT_TOP_K
+        )
+
+    def _with_timeout(self, request: Callable[[], Any], timeout: Optional[float]) -> Any:
+        """
+        Run a client request, waiting at most timeout seconds for it.
+
+        google-generativeai 0.3.2 passes extra generate_content arguments
+        into the request message, so it takes no per-request timeout; the
+        request runs on a worker thread instead. A request given up on keeps
+        its thread until the client's own deadline ends it.
+
+        Raises:
+            LLMBackendError: With status 504 if the request takes longer than timeout
+        """
+        if not timeout:
+            return request()
+        with GeminiBackend._configure_lock:
+            if GeminiBackend._executor is None:
+                GeminiBackend._executor = ThreadPoolExecutor(max_workers=self.REQUEST_WORKERS, thread_name_prefix="gemini-request")
+            executor = GeminiBackend._executor
+        future = executor.submit(request)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError as e:
+            future.cancel()
+            raise LLMBackendError(f"Model request timed out after {timeout:g}s", 504) from e
+
+    def generate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        model, config = self.model, self._config(max_output_tokens)
+        return self._with_timeout(lambda: model.generate_content(prompt, generation_config=config).text, timeout)
+
+    async def agenerate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        request = self.model.generate_content_async(prompt, generation_config=self._config(max_output_tokens))
+        try:
+            response = await asyncio.wait_for(request, timeout) if timeout else await request
+        except asyncio.TimeoutError as e:
+            raise LLMBackendError(f"Model request timed out after {timeout:g}s", 504) from e
+        return response.text
+
+    def stream(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        # The timeout covers the wait for the first chunk, which the client
+        # fetches before returning the response
+        model, config = self.model, self._config(max_output_tokens)
+        response = self._with_timeout(lambda: model.generate_content(prompt, generation_config=config, stream=True), timeout)
+        for chunk in response:
+            yield chunk.text
+
+
+class HTTPStubBackend(LLMBackend):
+    """
+    Backend for the local stub server (Benchmarks/llm_stub_server.py).
+    POST /generate returns {"text": ...}; POST /stream returns one JSON
+    object per line, each with a "text" chunk.
+    """
+
+    name = "stub"
+
+    # Used when a request gives no timeout, so a hung stub cannot block forever
+    DEFAULT_TIMEOUT = 60.0
+
+    def __init__(self, url: str = DEFAULT_STUB_URL, max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS):
+        """
+        Initialize the backend.
+
+        Args:
+            url: Base URL of the stub server
+            max_output_tokens: Default output token limit sent to the stub
+        """
+        self.url = url.rstrip("/")
+        self.max_output_tokens = max_output_tokens
+
+    def _post(self, path: str, prompt: str, max_output_tokens: Optional[int], timeout: Optional[float]):
+        """Send a prompt to the stub and return the open response."""
+        payload = json.dumps({"prompt": prompt, "max_output_tokens": max_output_tokens or self.max_output_tokens})
+        request = urllib.request.Request(
+            f"{self.url}{path}", data=payload.encode(), headers={"Content-Type": "application/json"}
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.DEFAULT_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            raise LLMBackendError(f"Stub model returned HTTP {e.code}: {e.read().decode(errors='replace')}", e.code) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise LLMBackendError(f"Stub model request failed: {e}") from e
+
+    def generate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        with self._post("/generate", prompt, max_output_tokens, timeout) as response:
+            return json.loads(response.read())["text"]
+
+    def stream(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        with self._post("/stream", prompt, max_output_tokens, timeout) as response:
+            try:
+                for line in response:
+                    if line.strip():
+                        yield json.loads(line)["text"]
+            except OSError as e:
+                raise LLMBackendError(f"Stub model stream failed: {e}") from e
+
+
+def create_backend(name: str = DEFAULT_LLM_BACKEND, model_name: Optional[str] = None) -> LLMBackend:
+    """
+    Create a backend by name.
+
+    Args:
+        name: "gemini" or "stub"
+        model_name: Model to use instead of GEMMA_MODEL (ignored by the stub)
+
+    Returns:
+        The backend, configured from the environment
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    if name == "gemini":
+        return GeminiBackend(model_name or DEFAULT_GEMMA_MODEL)
+    if name == "stub":
+        return HTTPStubBackend()
+    raise ValueError(f"Unknown LLM backend '{name}', expected one of {', '.join(LLM_BACKENDS)}")
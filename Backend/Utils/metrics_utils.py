@@ -0,0 +1,69 @@
+"""
+Metrics Utilities for Phishing Simulation Platform
+This module provides a small thread-safe histogram for in-process service
+metrics: cumulative bucket counts over the process lifetime plus
+percentiles over a window of the most recent samples.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed bucket upper bounds.
+    Each observation lands in the first bucket whose bound is >= the value,
+    or in the overflow bucket.
+    """
+
+    def __init__(self, buckets: Sequence[float], window: int = 1000):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets: Increasing bucket upper bounds
+            window: Number of recent samples kept for percentiles
+        """
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record one sample."""
+        index = int(np.searchsorted(self.buckets, value, side="left"))
+        with self._lock:
+            self._counts[index] += 1
+            self._recent.append(value)
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Summarize the recorded samples.
+
+        Returns:
+            Dictionary with count, sum, mean, bucket counts and p50/p95/p99
+            of the recent samples
+        """
+        with self._lock:
+            counts = list(self._counts)
+            recent = np.array(self._recent, dtype=float)
+            count, total = self._count, self._sum
+
+        labels = [f"<={bound:g}" for bound in self.buckets] + [f">{self.buckets[-1]:g}"]
+        percentiles = np.percentile(recent, [50, 95, 99]) if len(recent) else [None] * 3
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else None,
+            "buckets": dict(zip(labels, counts)),
+            "p50": None if percentiles[0] is None else round(float(percentiles[0]), 3),
+            "p95": None if percentiles[1] is None else round(float(percentiles[1]), 3),
+            "p99": None if percentiles[2] is None else round(float(percentiles[2]), 3)
+        }
@@ -0,0 +1,244 @@
+"""
+Model Utilities for Phishing Simulation Platform
+This module provides a process-wide registry for the MLRiskPredictor.
+The trained forest and scaler are deserialised once and shared by every
+request; the registry watches the files under Models/ and swaps in a freshly
+loaded predictor atomically when they change or when a new model is trained.
+It also runs model fitting in a separate process, so training neither ties
+up a server thread nor holds the GIL.
+"""
+
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from Utils.ai_utils import MLRiskPredictor, RISK_MODEL_PATH, RISK_SCALER_PATH
+
+load_dotenv()
+
+# Seconds between checks of the model files for changes, overridable from the environment (.env)
+DEFAULT_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "2"))
+
+# Number of past model versions kept in the registry's history
+MAX_VERSION_HISTORY = 10
+
+# Number of processes fitting models, overridable from the environment (.env)
+DEFAULT_TRAINING_PROCESSES = int(os.getenv("TRAINING_PROCESSES", "1"))
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Return (mtime_ns, size) for a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _model_footprint(predictor: MLRiskPredictor) -> int:
+    """Approximate in-memory size of a predictor's model and scaler in bytes."""
+    if not predictor.is_trained:
+        return 0
+    # The pickled size is dominated by the trees' node arrays, which is also
+    # what dominates the in-memory footprint
+    return len(pickle.dumps((predictor.model, predictor.scaler), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class RiskModelRegistry:
+    """
+    Process-wide holder of the current MLRiskPredictor.
+    Readers call get() and use the returned predictor without locking;
+    reloads build a complete new predictor before swapping the reference.
+    """
+
+    def __init__(self, reload_interval: float = DEFAULT_RELOAD_INTERVAL):
+        """
+        Initialize an empty registry; the model is loaded on first use.
+
+        Args:
+            reload_interval: Minimum seconds between checks of the model files
+        """
+        self.reload_interval = reload_interval
+        self._predictor = None
+        self._signature = None
+        self._last_check = 0.0
+        self._version = 0
+        self._history = []
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        """Return the current signature of the model and scaler files."""
+        return _file_signature(RISK_MODEL_PATH), _file_signature(RISK_SCALER_PATH)
+
+    def _install(self, predictor: MLRiskPredictor, signature, source: str, load_seconds: float):
+        """Swap in a predictor and record it as a new version (lock held by caller)."""
+        self._version += 1
+        self._predictor = predictor
+        self._signature = signature
+        self._history.append({
+            "version": self._version,
+            "source": source,
+            "is_trained": predictor.is_trained,
+            "loaded_at": datetime.utcnow(),
+            "load_time_ms": round(load_seconds * 1000, 2),
+            "memory_bytes": _model_footprint(predictor),
+            "model_file": {
+                "mtime_ns": signature[0][0] if signature[0] else None,
+                "size": signature[0][1] if signature[0] else None
+            }
+        })
+        del self._history[:-MAX_VERSION_HISTORY]
+
+    def get(self) -> MLRiskPredictor:
+        """
+        Return the current predictor, reloading it first if the model files changed.
+
+        Returns:
+            The shared MLRiskPredictor instance
+        """
+        now = time.monotonic()
+        if self._predictor is None or now - self._last_check >= self.reload_interval:
+            self._last_check = now
+            self.reload()
+        return self._predictor
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the model files into a new predictor if they changed.
+
+        Args:
+            force: Reload even if the files look unchanged
+
+        Returns:
+            True if a new version was installed
+        """
+        with self._lock:
+            signature = self._current_signature()
+            if self._predictor is not None and not force and signature == self._signature:
+                return False
+
+            started = time.perf_counter()
+            predictor = MLRiskPredictor()
+            load_seconds = time.perf_counter() - started
+
+            # A file caught mid-write fails to load; keep serving the current
+            # model and retry on the next check
+            if self._predictor is not None and self._predictor.is_trained and not predictor.is_trained:
+                return False
+
+            self._install(predictor, signature, "disk", load_seconds)
+            return True
+
+    def publish(self, predictor: MLRiskPredictor):
+        """
+        Install a freshly trained predictor (already saved to disk).
+
+        Args:
+            predictor: The trained predictor
+        """
+        with self._lock:
+            self._install(predictor, self._current_signature(), "train", 0.0)
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Describe the current model version and recent load history.
+
+        Returns:
+            Dictionary with the current version's details and history
+        """
+        history: List[Dict[str, Any]] = list(self._history)
+        return {
+            "current": history[-1] if history else None,
+            "history": history
+        }
+
+
+def _fit_risk_model(features: np.ndarray, labels: np.ndarray) -> Tuple[MLRiskPredictor, float]:
+    """Fit a new predictor; runs in a training process."""
+    started = time.perf_counter()
+    predictor = MLRiskPredictor(load=False)
+    predictor.fit(features, labels, save=False)
+    return predictor, time.perf_counter() - started
+
+
+class TrainingPool:
+    """
+    Pool of worker processes that fit risk models.
+    The fitted predictor is sent back to the caller, which saves and
+    publishes it, so an abandoned fit never touches the model files.
+    """
+
+    def __init__(self, processes: int = DEFAULT_TRAINING_PROCESSES):
+        """
+        Initialize the pool; worker processes start on first use.
+
+        Args:
+            processes: Maximum number of concurrent fits
+        """
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the process pool on first use."""
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs server and job threads can copy
+                # held locks; start clean interpreters instead
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def fit(
+        self,
+        features: np.ndarray,
+        labels: np.ndarray,
+        on_wait: Optional[Callable[[], None]] = None,
+        poll_interval: float = 1.0
+    ) -> Tuple[MLRiskPredictor, float]:
+        """
+        Fit a risk model in a training process and wait for it.
+
+        Args:
+            features: Feature matrix of shape (n_users, N_FEATURES)
+            labels: Labels (1 = high risk, 0 = low risk)
+            on_wait: Optional callable run every poll_interval while waiting;
+                an exception it raises abandons the fit
+            poll_interval: Seconds between on_wait calls
+
+        Returns:
+            Tuple of (fitted predictor, fit time in seconds)
+        """
+        future = self._get_executor().submit(_fit_risk_model, features, labels)
+        while True:
+            try:
+                return future.result(timeout=poll_interval)
+            except BrokenProcessPool:
+                # A crashed worker breaks the whole pool; start a new one next time
+                self.shutdown()
+                raise
+            except FutureTimeoutError:
+                if on_wait:
+                    try:
+                        on_wait()
+                    except BaseException:
+                        future.cancel()
+                        raise
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,255 @@
+"""
+Online Model Utilities for Phishing Simulation Platform
+This module keeps the OnlineRiskPredictor learning from new email outcomes.
+Users whose features change are buffered once their transaction commits
+and fed to partial_fit in micro-batches on a background thread; every
+fifth user is held out from online training so the online model can be
+compared with the batch RandomForest on unseen users.
+"""
+
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.metrics import accuracy_score, brier_score_loss, log_loss, roc_auc_score
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from Utils.ai_utils import MLRiskPredictor, OnlineRiskPredictor
+from Utils.feature_utils import load_user_feature_rows
+
+load_dotenv()
+
+# Online model settings, overridable from the environment (.env); the mode
+# selects which model scores users: "batch" (RandomForest) or "online"
+DEFAULT_ONLINE_BATCH_SIZE = int(os.getenv("ONLINE_MODEL_BATCH_SIZE", "32"))
+DEFAULT_RISK_MODEL_MODE = os.getenv("RISK_MODEL_MODE", "batch")
+
+# Users with an ID divisible by this are held out from online training
+HOLDOUT_MODULUS = 5
+
+
+def is_holdout_user(user_id: int) -> bool:
+    """Whether a user is reserved for evaluation."""
+    return user_id % HOLDOUT_MODULUS == 0
+
+
+def evaluate_predictor(predictor: MLRiskPredictor, features: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
+    """
+    Score a trained predictor against known labels.
+
+    Args:
+        predictor: Predictor to evaluate
+        features: Feature matrix of the evaluation users
+        labels: Their true labels
+
+    Returns:
+        Dictionary with accuracy, ROC AUC, log loss and Brier score (None
+        where undefined, e.g. AUC with a single class)
+    """
+    if not predictor.is_trained or len(labels) == 0:
+        return {"trained": predictor.is_trained, "accuracy": None, "roc_auc": None, "log_loss": None, "brier_score": None}
+
+    probabilities = predictor.high_risk_probability(predictor.scaler.transform(features))
+    both_classes = len(np.unique(labels)) == 2
+    return {
+        "trained": True,
+        "accuracy": round(float(accuracy_score(labels, probabilities > 0.5)), 4),
+        "roc_auc": round(float(roc_auc_score(labels, probabilities)), 4) if both_classes else None,
+        "log_loss": round(float(log_loss(labels, probabilities, labels=[0, 1])), 4),
+        "brier_score": round(float(brier_score_loss(labels, probabilities)), 4)
+    }
+
+
+class OnlineModelTrainer:
+    """
+    Feeds feature-store updates to an OnlineRiskPredictor in micro-batches.
+    Changed users are queued once the transaction that changed them
+    commits, and a background thread learns from each full batch, so
+    request handlers never wait for training or learn from rolled-back
+    outcomes. Each update trains a copy of the current predictor, saves it
+    and swaps the reference, so readers never see a half-updated model.
+    """
+
+    # Session.info key of the users changed in the session's open transaction
+    CHANGED_USERS_KEY = "online_model_changed_users"
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None, batch_size: int = DEFAULT_ONLINE_BATCH_SIZE):
+        """
+        Initialize the trainer with the persisted online model, if any.
+
+        Args:
+            session_factory: Callable returning a new database session for
+                the background thread; without it full batches are only
+                learned from by flush()
+            batch_size: Number of changed users collected per update
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.predictor = OnlineRiskPredictor()
+        self.updates = 0
+        self.update_errors = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def observe_after_commit(self, db: Session, user_ids: List[int]):
+        """
+        Queue users whose features changed in the session's transaction once it commits.
+
+        Args:
+            db: Session holding the uncommitted feature changes; if it
+                rolls back, the users are not queued
+            user_ids: Users with new outcomes
+        """
+        # Begin the transaction if nothing has yet, so that rolling it back is seen
+        db.connection()
+        db.info.setdefault(self.CHANGED_USERS_KEY, set()).update(user_ids)
+        if not event.contains(db, "after_commit", self._after_commit):
+            event.listen(db, "after_commit", self._after_commit)
+            event.listen(db, "after_soft_rollback", self._after_rollback)
+
+    def _after_commit(self, db: Session):
+        """Queue the users changed in the committed transaction."""
+        user_ids = db.info.pop(self.CHANGED_USERS_KEY, None)
+        if user_ids:
+            self.observe(user_ids)
+
+    def _after_rollback(self, db: Session, previous_transaction):
+        """Forget the users changed in a rolled-back (outermost) transaction."""
+        if previous_transaction.parent is None:
+            db.info.pop(self.CHANGED_USERS_KEY, None)
+
+    def observe(self, user_ids: Iterable[int]):
+        """
+        Queue users whose committed features changed, waking the background
+        thread once a batch is full.
+
+        Args:
+            user_ids: Users with new outcomes
+        """
+        with self._lock:
+            self._pending.update(user_id for user_id in user_ids if not is_holdout_user(user_id))
+            full = len(self._pending) >= self.batch_size
+        if full and self.session_factory is not None:
+            self._ensure_thread()
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        """Start the background learning thread if it is not running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._worker, name="online-model", daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        """Background loop: learn from the queued users whenever a batch is full."""
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                return
+            with self._lock:
+                if len(self._pending) < self.batch_size:
+                    continue
+                batch, self._pending = list(self._pending), set()
+            db = self.session_factory()
+            try:
+                self._learn(db, batch)
+            except Exception as e:
+                self.update_errors += 1
+                print(f"⚠️ Online model update failed: {e}")
+            finally:
+                db.close()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread, letting a running update finish."""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout)
+
+    def flush(self, db: Session) -> int:
+        """
+        Update the model with every buffered user now.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of samples learned from
+        """
+        with self._lock:
+            batch, self._pending = list(self._pending), set()
+        return self._learn(db, batch)
+
+    def replay(self, db: Session, chunk_size: int = 5000) -> int:
+        """
+        Stream every training user's current features through the model,
+        e.g. to warm up a new model from existing history.
+
+        Args:
+            db: Database session
+            chunk_size: Users per partial_fit call
+
+        Returns:
+            Number of samples learned from
+        """
+        learned = 0
+        last_user_id = 0
+        while True:
+            users = load_user_feature_rows(db, after_user_id=last_user_id, limit=chunk_size)
+            if users.empty:
+                return learned
+            last_user_id = int(users["id"].iloc[-1])
+            learned += self._learn_frame(users[users["id"] % HOLDOUT_MODULUS != 0])
+
+    def _learn(self, db: Session, user_ids: List[int]) -> int:
+        """Learn from the current features of the given users."""
+        if not user_ids:
+            return 0
+        return self._learn_frame(load_user_feature_rows(db, user_ids=user_ids))
+
+    def _learn_frame(self, users) -> int:
+        """Train a copy of the predictor on a frame of users and swap it in."""
+        users = users[users["email_count"] > 0]
+        if users.empty:
+            return 0
+        # Updates are serialized on their own lock so queueing users never waits for training
+        with self._train_lock:
+            predictor = copy.deepcopy(self.predictor)
+            predictor.partial_fit(
+                predictor.extract_features_from_aggregates(users),
+                predictor.labels_from_aggregates(users)
+            )
+            predictor.save_model()
+            self.predictor = predictor
+            self.updates += 1
+        return len(users)
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Describe the online model's training state.
+
+        Returns:
+            Dictionary with training status, samples seen, updates, failed
+            updates and pending users
+        """
+        return {
+            "is_trained": self.predictor.is_trained,
+            "model_version": self.predictor.model_version,
+            "samples_seen": self.predictor.samples_seen,
+            "updates": self.updates,
+            "update_errors": self.update_errors,
+            "pending_users": len(self._pending),
+            "batch_size": self.batch_size
+        }
@@ -0,0 +1,135 @@
+"""
+Pagination Utilities for Phishing Simulation Platform
+This module implements keyset (cursor) pagination for the list endpoints.
+Instead of OFFSET, which makes SQLite walk every skipped row, each page
+resumes strictly after the sort key of the previous page's last row. The
+key is handed to clients as an opaque, URL-safe cursor string.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+import models
+
+
+def encode_cursor(key: Dict[str, Any]) -> str:
+    """
+    Encode a sort key as an opaque cursor string.
+
+    Args:
+        key: Sort key values of the last row on a page
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = {name: value.isoformat() if isinstance(value, datetime) else value for name, value in key.items()}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Cursor string from a previous page
+        fields: Sort key fields the cursor must contain
+
+    Returns:
+        Dictionary of sort key values
+
+    Raises:
+        ValueError: If the cursor is malformed or does not match the fields
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+        if not isinstance(key, dict) or set(key) != set(fields):
+            raise ValueError
+        if key.get("sent_at") is not None:
+            key["sent_at"] = datetime.fromisoformat(key["sent_at"])
+        if not isinstance(key["id"], int):
+            raise ValueError
+        return key
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid pagination cursor")
+
+
+def _check_limit(limit: int):
+    """Reject page sizes that could never return a row to resume after."""
+    if limit < 1:
+        raise ValueError("limit must be at least 1 when paginating with a cursor")
+
+
+def paginate_by_id(query: Query, model, cursor: str, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query ordered by ascending primary key.
+
+    Args:
+        query: Base query (filters already applied)
+        model: Mapped class with an integer id column
+        cursor: Cursor from the previous page, or "" for the first page
+        limit: Maximum number of rows to return (at least 1)
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is invalid or limit is below 1
+    """
+    _check_limit(limit)
+    if cursor:
+        key = decode_cursor(cursor, ("id",))
+        query = query.filter(model.id > key["id"])
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor({"id": rows[-1].id})
+
+
+def paginate_email_logs(query: Query, cursor: str, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of email logs, newest first, ordered by (sent_at, id).
+    Logs without a sent_at follow the dated ones, newest id first.
+
+    Args:
+        query: Base email log query (filters already applied)
+        cursor: Cursor from the previous page, or "" for the first page
+        limit: Maximum number of rows to return (at least 1)
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is invalid or limit is below 1
+    """
+    _check_limit(limit)
+    log = models.EmailLog
+    key = decode_cursor(cursor, ("sent_at", "id")) if cursor else None
+
+    # Dated logs come first; each part is read separately so both can use
+    # the (sent_at, id) index, and only once the dated part runs out
+    rows = []
+    if key is None or key["sent_at"] is not None:
+        dated = query.filter(log.sent_at.isnot(None))
+        if key:
+            dated = dated.filter(tuple_(log.sent_at, log.id) < (key["sent_at"], key["id"]))
+        rows = dated.order_by(log.sent_at.desc(), log.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        undated = query.filter(log.sent_at.is_(None))
+        if key and key["sent_at"] is None:
+            undated = undated.filter(log.id < key["id"])
+        rows += undated.order_by(log.id.desc()).limit(limit + 1 - len(rows)).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor({"sent_at": rows[-1].sent_at, "id": rows[-1].id})
@@ -0,0 +1,218 @@
+"""
+Pre-generation Utilities for Phishing Simulation Platform
+This module keeps a pool of ready-to-send AI emails for every template type
+and department. Background threads generate emails for a placeholder
+recipient ahead of time; a request takes one, the recipient's name is filled
+in, and the pool is refilled asynchronously, so single-email requests
+rarely wait for the model.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+from Utils.generation_utils import DEFAULT_RATE_LIMIT, TokenBucket
+from Utils.metrics_utils import Histogram
+
+load_dotenv()
+
+# Default pre-generation settings, overridable from the environment (.env)
+DEFAULT_PREWARM_POOL_SIZE = int(os.getenv("PREWARM_POOL_SIZE", "3"))
+DEFAULT_PREWARM_WORKERS = int(os.getenv("PREWARM_WORKERS", "2"))
+DEFAULT_PREWARM_RETRY_SECONDS = float(os.getenv("PREWARM_RETRY_SECONDS", "60"))
+
+
+class EmailPrewarmer:
+    """
+    Pools of pre-generated emails keyed by (template type, department).
+    Each pool is kept at `target` emails counting generations in flight.
+    After a failed generation a pool is not refilled again for
+    retry_seconds, so an unavailable model is not called in a tight loop.
+    """
+
+    def __init__(
+        self,
+        generator,
+        target: int = DEFAULT_PREWARM_POOL_SIZE,
+        workers: int = DEFAULT_PREWARM_WORKERS,
+        retry_seconds: float = DEFAULT_PREWARM_RETRY_SECONDS,
+        requests_per_second: float = DEFAULT_RATE_LIMIT
+    ):
+        """
+        Initialize empty pools; nothing is generated until start() or take().
+
+        Args:
+            generator: AIEmailGenerator providing templates,
+                generate_template_email and personalize
+            target: Ready emails kept per pool; 0 disables pre-generation
+            workers: Background generation threads
+            retry_seconds: Pause before refilling a pool after a failure
+            requests_per_second: Model call rate limit for background generation
+        """
+        self.generator = generator
+        self.target = target
+        self.workers = workers
+        self.retry_seconds = retry_seconds
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.refill_latency_ms = Histogram([250, 500, 1000, 2000, 5000, 10000, 30000, 60000])
+        self._bucket = TokenBucket(requests_per_second)
+        self._pools: Dict[tuple, deque] = {}
+        self._in_flight: Dict[tuple, int] = {}
+        self._retry_at: Dict[tuple, float] = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether emails are pre-generated at all."""
+        return self.target > 0
+
+    def start(self, departments: Iterable[str]):
+        """
+        Start filling the pools of every template type for the given departments.
+
+        Args:
+            departments: Department names to pre-generate for
+        """
+        for department in departments:
+            self.add_department(department)
+
+    def add_department(self, department: str):
+        """
+        Start filling the pools of every template type for a department.
+
+        Args:
+            department: Department name
+        """
+        for template_type in self.generator.templates:
+            self._schedule((template_type, department))
+
+    def take(self, user_info: Dict[str, Any], template_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take a ready email for a user, if one is pooled.
+
+        Args:
+            user_info: Dictionary containing user details (name, department)
+            template_type: Template type wanted, or None for any template
+                with a ready email
+
+        Returns:
+            Email dictionary like AIEmailGenerator.generate_phishing_email
+            returns, or None when no email is ready (the pool is refilled
+            either way)
+        """
+        if not self.enabled:
+            return None
+
+        department = user_info.get("department")
+        template_types = [template_type] if template_type else list(self.generator.templates)
+        with self._lock:
+            ready = [t for t in template_types if self._pools.get((t, department))]
+            if ready:
+                key = (random.choice(ready), department)
+                email = self._pools[key].popleft()
+                self.hits += 1
+            else:
+                key = (template_type or random.choice(template_types), department)
+                email = None
+                self.misses += 1
+        self._schedule(key)
+
+        if email is None:
+            return None
+        return {
+            **self.generator.personalize(email, user_info),
+            "template_type": key[0],
+            "generated_at": datetime.utcnow(),
+            "cached": False
+        }
+
+    def _schedule(self, key: tuple):
+        """Submit generations to bring a pool up to its target."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._retry_at.get(key, 0) > time.monotonic():
+                return
+            pool = self._pools.setdefault(key, deque())
+            needed = self.target - len(pool) - self._in_flight.get(key, 0)
+            if needed <= 0:
+                return
+            self._in_flight[key] = self._in_flight.get(key, 0) + needed
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="email-prewarm")
+            executor = self._executor
+        scheduled = time.perf_counter()
+        for _ in range(needed):
+            executor.submit(self._refill, key, scheduled)
+
+    def _refill(self, key: tuple, scheduled: float):
+        """Generate one email into a pool (runs on a background thread)."""
+        template_type, department = key
+        email = None
+        try:
+            if self._retry_at.get(key, 0) <= time.monotonic():
+                email = self.generator.generate_template_email(template_type, department, self._bucket.acquire)
+        except Exception as e:
+            print(f"⚠️ Pre-generating {template_type} email for {department} failed: {str(e)}")
+            with self._lock:
+                self.refill_errors += 1
+                self._retry_at[key] = time.monotonic() + self.retry_seconds
+        finally:
+            with self._lock:
+                self._in_flight[key] -= 1
+                if email is not None:
+                    self._pools[key].append(email)
+                    self.refills += 1
+        if email is not None:
+            self.refill_latency_ms.observe((time.perf_counter() - scheduled) * 1000)
+
+    def stop(self):
+        """Stop background generation, dropping queued refills."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Describe pool levels, hit rate and refill latency.
+
+        Returns:
+            Dictionary with settings, per-pool ready and in-flight counts,
+            hits, misses, hit_rate, refills, refill_errors and the
+            refill latency histogram (scheduling to ready, milliseconds)
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            pools = [
+                {
+                    "template_type": template_type,
+                    "department": department,
+                    "ready": len(pool),
+                    "in_flight": self._in_flight.get((template_type, department), 0)
+                }
+                for (template_type, department), pool in sorted(self._pools.items(), key=lambda item: str(item[0]))
+            ]
+            return {
+                "enabled": self.enabled,
+                "target": self.target,
+                "workers": self.workers,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else None,
+                "refills": self.refills,
+                "refill_errors": self.refill_errors,
+                "refill_latency_ms": self.refill_latency_ms.snapshot(),
+                "pools": pools
+            }
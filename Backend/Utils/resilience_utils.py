@@ -0,0 +1,377 @@
+"""
+Resilience Utilities for Phishing Simulation Platform
+This module keeps email generation fast when the model API is slow or down.
+ResilientBackend wraps an LLM backend with a per-attempt timeout, an overall
+deadline, retries with jittered exponential backoff and a circuit breaker:
+after repeated failures requests fail immediately, so callers fall back to
+template emails instead of each waiting out the client timeout.
+ModelCallMetrics keeps per-template latency histograms and outcome counts.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+
+from dotenv import load_dotenv
+from google.api_core import exceptions as google_exceptions
+
+from Utils.llm_backend_utils import LLMBackend, LLMBackendError
+from Utils.metrics_utils import Histogram
+
+load_dotenv()
+
+# Default resilience settings, overridable from the environment (.env)
+DEFAULT_CALL_TIMEOUT = float(os.getenv("MODEL_CALL_TIMEOUT", "15"))
+DEFAULT_CALL_DEADLINE = float(os.getenv("MODEL_CALL_DEADLINE", "30"))
+DEFAULT_RETRIES = int(os.getenv("MODEL_RETRIES", "2"))
+DEFAULT_RETRY_BASE_DELAY = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.5"))
+DEFAULT_RETRY_MAX_DELAY = float(os.getenv("MODEL_RETRY_MAX_DELAY", "4"))
+DEFAULT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+DEFAULT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# Model call latency buckets (milliseconds)
+DEFAULT_LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 30000]
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(LLMBackendError):
+    """Raised instead of calling the backend while its circuit is open."""
+
+
+class DeadlineExceededError(LLMBackendError):
+    """Raised when a call's overall deadline leaves no time for another attempt."""
+
+
+def is_timeout(error: Exception) -> bool:
+    """Whether an exception from a backend means the request timed out."""
+    causes = [error, error.__cause__, getattr(error.__cause__, "reason", None)]
+    if any(isinstance(cause, TimeoutError) for cause in causes):
+        return True
+    if type(error).__name__ == "DeadlineExceeded":
+        return True
+    return _status(error) in (408, 504)
+
+
+def _status(error: Exception) -> Optional[int]:
+    """HTTP status of a backend error (LLMBackendError.status or google api_core's code)."""
+    status = getattr(error, "status", None) or getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transport_error(error: Exception) -> bool:
+    """Whether an exception came from talking to the model service rather than from a bug in the caller."""
+    return isinstance(error, (LLMBackendError, google_exceptions.GoogleAPIError, TimeoutError, ConnectionError))
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed request may succeed if sent again.
+    Only transport errors are retried, and of those client errors other
+    than 408/429 are final; anything else (e.g. a ValueError raised while
+    building the request) would fail the same way every time.
+    """
+    if isinstance(error, (CircuitOpenError, DeadlineExceededError)) or not is_transport_error(error):
+        return False
+    status = _status(error)
+    return status is None or status in (408, 429) or status >= 500
+
+
+def error_outcome(error: Exception) -> str:
+    """Classify a failed model call as circuit_open, timeout or error."""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, DeadlineExceededError) or is_timeout(error):
+        return "timeout"
+    return "error"
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+    Closed: requests flow and consecutive failures are counted. After
+    failure_threshold of them the circuit opens and requests are refused
+    for reset_seconds; it then half-opens and lets a single probe request
+    through, closing again if the probe succeeds and reopening if it fails.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_seconds: float = DEFAULT_RESET_SECONDS):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit;
+                0 disables the breaker
+            reset_seconds: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_count = 0
+        self.rejected = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state; an open circuit reports half_open once its reset time has passed."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def available(self) -> bool:
+        """Whether allow() would currently let a request through (without claiming the probe)."""
+        if self.failure_threshold <= 0:
+            return True
+        state = self.state
+        with self._lock:
+            return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def allow(self) -> bool:
+        """
+        Ask to send a request.
+
+        Returns:
+            True if the request may go ahead (in the half-open state this
+            claims the single probe); False if it should fail fast
+        """
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._probing:
+                self._state = HALF_OPEN
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Record a successful request, closing the circuit."""
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        """Record a failed request, opening the circuit at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self.failure_threshold <= 0:
+                return
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened_count += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Describe the breaker.
+
+        Returns:
+            Dictionary with state, settings, consecutive failures, times
+            opened and requests rejected
+        """
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "consecutive_failures": self.failures,
+                "opened_count": self.opened_count,
+                "rejected": self.rejected
+            }
+
+
+class ResilientBackend(LLMBackend):
+    """
+    LLM backend wrapper adding deadlines, retries and a circuit breaker.
+    Each attempt gets the smaller of the per-attempt timeout and the time
+    left before the overall deadline. Failed attempts are retried after a
+    full-jitter exponential backoff while time and retries remain; every
+    failure counts towards the breaker, and while it is open requests raise
+    CircuitOpenError without reaching the wrapped backend.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: float = DEFAULT_CALL_TIMEOUT,
+        deadline: float = DEFAULT_CALL_DEADLINE,
+        retries: int = DEFAULT_RETRIES,
+        base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        max_delay: float = DEFAULT_RETRY_MAX_DELAY
+    ):
+        """
+        Wrap a backend.
+
+        Args:
+            backend: Backend the requests go to
+            breaker: Circuit breaker; a new one with default settings if None
+            timeout: Seconds allowed per attempt
+            deadline: Seconds allowed per call across all attempts and backoffs
+            retries: Attempts after the first
+            base_delay: Backoff cap before the first retry (doubles per retry)
+            max_delay: Largest backoff cap
+        """
+        self.backend = backend
+        self.name = backend.name
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempts = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a request would currently reach the backend."""
+        return self.breaker.available()
+
+    def _call(self, request: Callable[[float], Any], timeout: Optional[float]) -> Any:
+        """Run request(attempt_timeout) under the breaker, deadline and retry policy."""
+        timeout = min(timeout, self.timeout) if timeout else self.timeout
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Model backend {self.name} unavailable: circuit open")
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                # The claimed probe (if any) is released by recording the miss
+                self.breaker.record_failure()
+                raise DeadlineExceededError(f"Model call deadline of {self.deadline:g}s exceeded")
+            with self._lock:
+                self.attempts += 1
+            try:
+                result = request(min(timeout, remaining))
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.retries or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retried += 1
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def generate(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        return self._call(lambda attempt_timeout: self.backend.generate(prompt, max_output_tokens, attempt_timeout), timeout)
+
+    def stream(self, prompt: str, max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        # Attempts are retried until the first chunk arrives; once text has
+        # been passed on, a failure ends the stream instead
+        def first_chunk(attempt_timeout: float):
+            chunks = self.backend.stream(prompt, max_output_tokens, attempt_timeout)
+            return next(chunks, ""), chunks
+
+        first, chunks = self._call(first_chunk, timeout)
+        if first:
+            yield first
+        try:
+            yield from chunks
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Describe the retry policy and breaker.
+
+        Returns:
+            Dictionary with backend, settings, attempts, retries and the breaker snapshot
+        """
+        return {
+            "backend": self.name,
+            "timeout_seconds": self.timeout,
+            "deadline_seconds": self.deadline,
+            "retries": self.retries,
+            "attempts": self.attempts,
+            "retried": self.retried,
+            "circuit": self.breaker.snapshot()
+        }
+
+
+class ModelCallMetrics:
+    """
+    Per-template model call metrics: a latency histogram for successful
+    calls, another for failed ones (how long a caller waited before falling
+    back) and counts of each outcome.
+    """
+
+    # Outcomes counted per template
+    OUTCOMES = ("ok", "timeout", "error", "circuit_open")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        """
+        Initialize empty metrics.
+
+        Args:
+            buckets: Latency histogram bucket upper bounds (milliseconds)
+        """
+        self.buckets = list(buckets)
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, template_type: str, latency_ms: float, outcome: str):
+        """
+        Record one model call.
+
+        Args:
+            template_type: Template type the call generated
+            latency_ms: Time from the call to its result or failure
+            outcome: "ok", "timeout", "error" or "circuit_open"
+        """
+        with self._lock:
+            entry = self._templates.get(template_type)
+            if entry is None:
+                entry = self._templates[template_type] = {
+                    "outcomes": dict.fromkeys(self.OUTCOMES, 0),
+                    "latency_ms": Histogram(self.buckets),
+                    "failure_latency_ms": Histogram(self.buckets)
+                }
+            entry["outcomes"][outcome] += 1
+        (entry["latency_ms"] if outcome == "ok" else entry["failure_latency_ms"]).observe(latency_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Summarize every template's calls.
+
+        Returns:
+            Dictionary keyed by template type with calls, outcome counts,
+            error_rate and both latency histogram snapshots
+        """
+        with self._lock:
+            templates = dict(self._templates)
+            outcomes = {template_type: dict(entry["outcomes"]) for template_type, entry in templates.items()}
+        summary = {}
+        for template_type in sorted(templates):
+            calls = sum(outcomes[template_type].values())
+            summary[template_type] = {
+                "calls": calls,
+                "outcomes": outcomes[template_type],
+                "error_rate": round(1 - outcomes[template_type]["ok"] / calls, 4) if calls else None,
+                "latency_ms": templates[template_type]["latency_ms"].snapshot(),
+                "failure_latency_ms": templates[template_type]["failure_latency_ms"].snapshot()
+            }
+        return summary
@@ -0,0 +1,128 @@
+"""
+Risk Score Utilities for Phishing Simulation Platform
+This module persists each user's latest risk prediction in the
+user_risk_scores table. Scores are refreshed for everyone after training and
+for individual users whenever their feature store row changes, so the
+riskiest users can be read from an index instead of scoring every user.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import models
+from Utils.ai_utils import MLRiskPredictor
+from Utils.feature_utils import load_user_feature_rows
+
+_S = models.UserRiskScore
+
+# Users scored per model call when refreshing every score
+DEFAULT_SCORE_CHUNK_SIZE = 5000
+
+
+def _store_scores(db: Session, users, predictions: List[Dict[str, Any]], model_version: Optional[str]):
+    """Upsert one score row per user from their predictions."""
+    scored_at = datetime.utcnow()
+    rows = [
+        {
+            "user_id": int(user_id),
+            "risk_score": prediction["risk_score"],
+            "risk_level": prediction["risk_level"],
+            "model_version": model_version,
+            "scored_at": scored_at
+        }
+        for user_id, prediction in zip(users["id"], predictions)
+    ]
+    stmt = insert(_S)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            "risk_score": stmt.excluded.risk_score,
+            "risk_level": stmt.excluded.risk_level,
+            "model_version": stmt.excluded.model_version,
+            "scored_at": stmt.excluded.scored_at
+        }
+    )
+    db.execute(stmt, rows)
+
+
+def score_users(
+    db: Session,
+    predictor: MLRiskPredictor,
+    user_ids: Optional[List[int]] = None,
+    chunk_size: int = DEFAULT_SCORE_CHUNK_SIZE,
+    on_chunk=None
+) -> int:
+    """
+    Score users from the feature store and persist their risk scores.
+
+    Args:
+        db: Database session (the caller commits)
+        predictor: Predictor to score users with; nothing is stored while it is untrained
+        user_ids: Users to score, or None for every user
+        chunk_size: Number of users per model call when scoring every user
+        on_chunk: Optional callable receiving the running count after each chunk
+
+    Returns:
+        Number of users scored
+    """
+    if not predictor.is_trained:
+        return 0
+
+    if user_ids is not None:
+        users = load_user_feature_rows(db, user_ids=user_ids)
+        if users.empty:
+            return 0
+        _store_scores(db, users, predictor.predict_risk_batch(predictor.extract_features_from_aggregates(users)),
+                      predictor.model_version)
+        return len(users)
+
+    scored = 0
+    last_user_id = 0
+    while True:
+        users = load_user_feature_rows(db, after_user_id=last_user_id, limit=chunk_size)
+        if users.empty:
+            return scored
+        last_user_id = int(users["id"].iloc[-1])
+        _store_scores(db, users, predictor.predict_risk_batch(predictor.extract_features_from_aggregates(users)),
+                      predictor.model_version)
+        scored += len(users)
+        if on_chunk:
+            on_chunk(scored)
+
+
+def top_risk_users(db: Session, limit: int = 50, department_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    List the users with the highest persisted risk scores.
+
+    Args:
+        db: Database session
+        limit: Number of users to return
+        department_id: Optional department to restrict the ranking to
+
+    Returns:
+        Score dictionaries ordered from the highest risk score down
+    """
+    query = (
+        db.query(_S, models.User.name, models.Department.name)
+        .join(models.User, models.User.id == _S.user_id)
+        .outerjoin(models.Department, models.User.department_id == models.Department.id)
+    )
+    if department_id:
+        query = query.filter(models.User.department_id == department_id)
+
+    rows = query.order_by(_S.risk_score.desc(), _S.user_id.desc()).limit(limit).all()
+    return [
+        {
+            "user_id": score.user_id,
+            "user_name": user_name,
+            "department": department_name,
+            "risk_score": score.risk_score,
+            "risk_level": score.risk_level,
+            "model_version": score.model_version,
+            "scored_at": score.scored_at
+        }
+        for score, user_name, department_name in rows
+    ]
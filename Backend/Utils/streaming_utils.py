@@ -0,0 +1,94 @@
+"""
+Streaming Utilities for Phishing Simulation Platform
+This module splits a model response into subject and body as it streams
+and formats Server-Sent Events. EmailStreamParser classifies each chunk
+the moment it arrives, following the same rules as
+AIEmailGenerator._parse_email_content (an optional "Subject:" prefix on
+the first line, the rest is the body), so clients can render the email
+while the model is still writing it.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+# Prefix the model is asked to start the subject line with
+SUBJECT_PREFIX = "subject:"
+
+
+class EmailStreamParser:
+    """
+    Incremental subject/body splitter for a streamed email.
+    The first line is the subject, without a leading "Subject:" prefix;
+    everything after it is the body. Leading whitespace of each field is
+    dropped. Deltas are best effort: the final subject and body come from
+    parsing the full text once the stream ends.
+    """
+
+    def __init__(self):
+        """Initialize an empty parser waiting for the subject line."""
+        self.field = "start"
+        self._parts: List[str] = []
+        self._pending = ""
+        self._started = {"subject": False, "body": False}
+
+    @property
+    def text(self) -> str:
+        """Full response received so far."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Add a chunk of the response.
+
+        Args:
+            chunk: Next piece of the model response
+
+        Returns:
+            List of (field, text) deltas, field being "subject" or "body";
+            empty while the chunk cannot be classified yet
+        """
+        self._parts.append(chunk)
+        deltas = []
+        if self.field == "start":
+            # Hold text back until it is clear whether the first line starts with "Subject:"
+            self._pending += chunk
+            head = self._pending.lstrip()
+            if not head:
+                return deltas
+            if "\n" not in head and len(head) < len(SUBJECT_PREFIX) and SUBJECT_PREFIX.startswith(head.lower()):
+                return deltas
+            if head.lower().startswith(SUBJECT_PREFIX):
+                head = head[len(SUBJECT_PREFIX):]
+            chunk, self._pending, self.field = head, "", "subject"
+
+        if self.field == "subject":
+            line, newline, chunk = chunk.partition("\n")
+            self._emit("subject", line.rstrip() if newline else line, deltas)
+            if not newline:
+                return deltas
+            self.field = "body"
+
+        self._emit("body", chunk, deltas)
+        return deltas
+
+    def _emit(self, field: str, text: str, deltas: List[Tuple[str, str]]):
+        """Append a delta for a field, skipping whitespace before its first character."""
+        if not self._started[field]:
+            text = text.lstrip()
+        if text:
+            self._started[field] = True
+            deltas.append((field, text))
+
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event: Event name
+        data: JSON-serializable event payload
+
+    Returns:
+        Event text, terminated by the blank line that ends an event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,238 @@
+"""
+Template Engine Utilities for Phishing Simulation Platform
+This module renders phishing emails from the ready-made templates in
+Data/email_templates.json without calling the external model. Templates are
+loaded and compiled once; rendering an email only fills the per-user
+placeholders ({name}, {link}, {tracking_link}, {manager_name} and
+{random_number}) into precompiled format strings, so whole campaigns are
+rendered at tens of thousands of emails per second.
+"""
+
+import json
+import os
+import random
+from datetime import datetime
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default template settings, overridable from the environment (.env)
+DEFAULT_TEMPLATES_PATH = os.getenv("EMAIL_TEMPLATES_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data", "email_templates.json"
+)
+DEFAULT_LINK_BASE_URL = os.getenv("PHISHING_LINK_BASE_URL", "https://smx-secure-portal.com")
+DEFAULT_GENERATION_MODE = os.getenv("GENERATION_MODE", "ai")
+
+# Ways emails can be generated: by the AI model one email per call, from the
+# offline templates, or by the AI model several emails per call (campaigns only)
+GENERATION_MODES = ("ai", "template", "batch")
+
+# Placeholders a template may use
+PLACEHOLDERS = ("name", "link", "tracking_link", "manager_name", "random_number")
+
+
+class CompiledTemplate:
+    """
+    One email template compiled for fast rendering.
+    Subject and body are stored as format strings whose only replacement
+    fields are known placeholders; literal braces are escaped.
+    """
+
+    def __init__(self, template: Dict[str, Any]):
+        """
+        Compile a template entry from the templates file.
+
+        Args:
+            template: Dictionary with type, subject, body and optional
+                difficulty and description
+
+        Raises:
+            ValueError: If the entry is missing a field or uses an unknown
+                or malformed placeholder
+        """
+        missing = [field for field in ("type", "subject", "body") if not template.get(field)]
+        if missing:
+            raise ValueError(f"Template is missing {', '.join(missing)}")
+        self.template_type = template["type"]
+        self.difficulty = template.get("difficulty")
+        self.description = template.get("description", "")
+        self.fields = set()
+        self.subject = self._compile(template["subject"])
+        self.body = self._compile(template["body"])
+
+    def _compile(self, text: str) -> str:
+        """Turn template text into a format string of known placeholders, recording the fields it uses."""
+        parts = []
+        for literal, field, format_spec, conversion in Formatter().parse(text):
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if field not in PLACEHOLDERS or format_spec or conversion:
+                raise ValueError(f"Template {self.template_type} has unsupported placeholder {{{field}}}")
+            self.fields.add(field)
+            parts.append(f"{{{field}}}")
+        return "".join(parts)
+
+    def render(self, values: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Fill placeholder values into the template.
+
+        Args:
+            values: Value for every field the template uses
+
+        Returns:
+            Tuple of (subject, body)
+        """
+        return self.subject.format_map(values), self.body.format_map(values)
+
+
+class EmailTemplateEngine:
+    """
+    Offline phishing email generator backed by the templates file.
+    Templates are grouped by type; a type with several templates picks one
+    at random per email. Exposes the same generate_phishing_email interface
+    as AIEmailGenerator, so either can serve a campaign.
+    """
+
+    def __init__(self, path: str = DEFAULT_TEMPLATES_PATH, link_base_url: str = DEFAULT_LINK_BASE_URL):
+        """
+        Load and compile the templates.
+
+        Args:
+            path: JSON file with a "templates" list
+            link_base_url: Base URL of the simulated phishing links
+
+        Raises:
+            OSError: If the templates file cannot be read
+            ValueError: If it is not valid JSON or a template is invalid
+        """
+        self.path = path
+        self.link_base_url = link_base_url.rstrip("/")
+        self.templates: Dict[str, List[CompiledTemplate]] = {}
+        self._template_types: List[str] = []
+        self.load()
+
+    def load(self):
+        """
+        (Re)load and compile every template from the templates file.
+
+        Raises:
+            OSError: If the templates file cannot be read
+            ValueError: If it is not valid JSON or a template is invalid
+        """
+        with open(self.path) as f:
+            entries = json.load(f)["templates"]
+        templates: Dict[str, List[CompiledTemplate]] = {}
+        for entry in entries:
+            compiled = CompiledTemplate(entry)
+            templates.setdefault(compiled.template_type, []).append(compiled)
+        self.templates = templates
+        self._template_types = list(templates)
+        print(f"✅ Loaded {len(entries)} email templates from {self.path}")
+
+    def _values(self, template: CompiledTemplate, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Per-email placeholder values for the fields a template uses."""
+        values = {"name": user_info.get("name") or ""}
+        fields = template.fields
+        if "link" in fields or "tracking_link" in fields:
+            token = f"{random.getrandbits(64):016x}"
+            values["link"] = f"{self.link_base_url}/verify?token={token}"
+            values["tracking_link"] = f"{self.link_base_url}/track?token={token}"
+        if "manager_name" in fields:
+            values["manager_name"] = user_info.get("manager_name") or f"{user_info.get('department') or 'SMX'} Manager"
+        if "random_number" in fields:
+            values["random_number"] = random.randint(100000, 999999)
+        return values
+
+    def render(self, user_info: Dict[str, Any], template_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Render an email for a user.
+
+        Args:
+            user_info: Dictionary containing user details (name, department,
+                optional manager_name)
+            template_type: Template type to use, or None for a random one
+
+        Returns:
+            Dictionary with subject, body, template_type, difficulty,
+            generated_at and cached (always False)
+
+        Raises:
+            KeyError: If there is no template of the requested type
+        """
+        if not template_type:
+            template_type = random.choice(self._template_types)
+        candidates = self.templates.get(template_type)
+        if not candidates:
+            raise KeyError(f"Unknown email template type: {template_type}")
+        template = candidates[0] if len(candidates) == 1 else random.choice(candidates)
+        subject, body = template.render(self._values(template, user_info))
+        return {
+            "subject": subject,
+            "body": body,
+            "template_type": template_type,
+            "difficulty": template.difficulty,
+            "generated_at": datetime.utcnow(),
+            "cached": False
+        }
+
+    def generate_phishing_email(
+        self,
+        user_info: Dict[str, Any],
+        template_type: Optional[str] = None,
+        on_model_call: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Render an email; same interface as AIEmailGenerator.generate_phishing_email.
+
+        Args:
+            user_info: Dictionary containing user details
+            template_type: Template type to use, or None for a random one
+            on_model_call: Ignored, templates make no model calls
+
+        Returns:
+            Rendered email dictionary (see render)
+        """
+        return self.render(user_info, template_type)
+
+    def render_many(
+        self,
+        users: List[Dict[str, Any]],
+        template_type: Optional[str] = None
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Render one email per user in the calling thread.
+
+        Args:
+            users: User info dictionaries
+            template_type: Template type for every email, or None for a
+                random one per user
+
+        Returns:
+            List of (user_info, email) pairs in input order
+
+        Raises:
+            KeyError: If there is no template of the requested type
+        """
+        return [(user, self.render(user, template_type)) for user in users]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """
+        List the loaded templates.
+
+        Returns:
+            List of dictionaries with template_type, difficulty, description
+            and placeholders
+        """
+        return [
+            {
+                "template_type": template.template_type,
+                "difficulty": template.difficulty,
+                "description": template.description,
+                "placeholders": sorted(template.fields)
+            }
+            for candidates in self.templates.values() for template in candidates
+        ]
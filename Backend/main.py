@@ -5,14 +5,41 @@ It handles user management, department management, email operations, and AI-powe
 """
 
 from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from database import init_db, SessionLocal
 import models, schemas
-from datetime import datetime
+from datetime import datetime, date
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.exc import IntegrityError
 from Utils.ai_utils import AIEmailGenerator, AIAnalyzer, MLRiskPredictor
-from typing import List, Optional
+from Utils.analytics_utils import (
+    department_click_stats, record_email_logs, record_email_event, rebuild_department_rollups,
+    move_user_rollups, delete_user_email_logs, delete_department_rollups, user_behavior_metrics, behavior_data_version
+)
+from Utils.feature_utils import (
+    record_sent_emails, record_email_click, record_email_response, refresh_user_features, load_user_feature_rows
+)
+from Utils.pagination_utils import paginate_by_id, paginate_email_logs
+from Utils.risk_score_utils import score_users, top_risk_users
+from Utils.generation_utils import generate_emails_concurrently, generate_emails_batched
+from Utils.generation_cache_utils import GenerationCache
+from Utils.prewarm_utils import EmailPrewarmer
+from Utils.llm_backend_utils import create_backend
+from Utils.resilience_utils import ResilientBackend
+from Utils.hedging_utils import HedgedBackend, DEFAULT_HEDGE_SECONDARY_MODEL
+from Utils.streaming_utils import sse_event
+from Utils.template_engine_utils import EmailTemplateEngine, DEFAULT_GENERATION_MODE, GENERATION_MODES
+from Utils.job_utils import JobQueue, JobContext, serialize_job
+from Utils.model_utils import RiskModelRegistry, TrainingPool
+from Utils.inference_utils import MicroBatcher
+from Utils.dataset_utils import build_training_dataset, write_snapshot, read_snapshot
+from Utils.behavior_stats_utils import delay_stats, hour_distribution, weekday_distribution, template_rates
+from Utils.online_model_utils import OnlineModelTrainer, DEFAULT_RISK_MODEL_MODE, evaluate_predictor, is_holdout_user
+from typing import Any, Dict, Iterator, List, Optional, Union
+import json
+import pandas as pd
+import time
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -21,10 +48,48 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Initialize AI components for email generation and analysis
-email_generator = AIEmailGenerator()
+# Ready-made templates from Data/email_templates.json, compiled once, for
+# generating emails without the external model ("template" generation mode)
+# and as the fallback when the model fails
+template_engine = EmailTemplateEngine()
+
+# Model backend with optional hedged requests against slow responses
+# (duplicates go to HEDGE_SECONDARY_MODEL when set), wrapped with per-call
+# deadlines, retries and a circuit breaker, so a slow or failing model API
+# degrades to fast template fallbacks
+hedged_backend = HedgedBackend(
+    create_backend(),
+    create_backend(model_name=DEFAULT_HEDGE_SECONDARY_MODEL) if DEFAULT_HEDGE_SECONDARY_MODEL else None
+)
+model_backend = ResilientBackend(hedged_backend)
+
+# Initialize AI components for email generation and analysis; generated
+# emails are pooled per template type and department and personalized per user
+generation_cache = GenerationCache()
+email_generator = AIEmailGenerator(cache=generation_cache, backend=model_backend, fallback=template_engine)
+
+# Ready-to-send emails pre-generated in the background per template type and
+# department, so single-email requests rarely wait for the model
+email_prewarmer = EmailPrewarmer(email_generator)
 ai_analyzer = AIAnalyzer()
 
+# Process-wide risk model, loaded once and hot-reloaded when Models/ changes,
+# and the processes that fit new models
+risk_model_registry = RiskModelRegistry()
+training_pool = TrainingPool()
+
+# Incrementally trained risk model, updated as email outcomes arrive
+online_trainer = OnlineModelTrainer(SessionLocal)
+
+# Background job queue for long-running work (handlers are registered below)
+job_queue = JobQueue(SessionLocal)
+
+# Number of users generated and committed per checkpoint in background campaign jobs
+JOB_GENERATION_CHUNK_SIZE = 50
+
+# Number of users scored per model call in bulk risk prediction
+BULK_PREDICTION_CHUNK_SIZE = 5000
+
 # Configure CORS middleware for cross-origin requests
 # Note: In production, replace "*" with specific origins
 app.add_middleware(
@@ -40,6 +105,79 @@ app.add_middleware(
 def on_startup():
     """Initialize the database on application startup."""
     init_db()
+    
+    # Backfill the analytics rollups for databases created before they existed
+    db = SessionLocal()
+    try:
+        if db.query(models.EmailLog.id).first() and not db.query(models.DepartmentTemplateStat.id).first():
+            rows = rebuild_department_rollups(db)
+            print(f"✅ Backfilled department rollups: {rows} rows")
+        # Same for the per-user feature store
+        if db.query(models.EmailLog.id).first() and not db.query(models.UserFeatures.user_id).first():
+            rows = refresh_user_features(db)
+            db.commit()
+            print(f"✅ Backfilled user feature store: {rows} rows")
+        
+        # Start pre-generating emails for every department
+        email_prewarmer.start([name for (name,) in db.query(models.Department.name).all()])
+    finally:
+        db.close()
+    
+    # Start the job workers; jobs interrupted by a restart resume here
+    job_queue.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Stop the background job workers, training processes, prediction batcher, email pre-generation, hedged model requests and online model updates."""
+    job_queue.stop()
+    training_pool.shutdown()
+    prediction_batcher.stop()
+    email_prewarmer.stop()
+    hedged_backend.stop()
+    online_trainer.stop()
+
+def accepted_job(job: models.Job) -> JSONResponse:
+    """
+    Build the 202 Accepted response for a submitted background job.
+    
+    Args:
+        job: The submitted job
+    
+    Returns:
+        JSON response with the job ID and its status URL
+    """
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"},
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+def active_risk_predictor() -> MLRiskPredictor:
+    """
+    Return the predictor that scores users: the online model in "online"
+    mode once it has been trained, otherwise the batch RandomForest.
+    """
+    if DEFAULT_RISK_MODEL_MODE == "online" and online_trainer.predictor.is_trained:
+        return online_trainer.predictor
+    return risk_model_registry.get()
+
+def features_changed(db: Session, user_ids: List[int]):
+    """
+    Refresh the persisted risk scores of users whose features changed (not
+    committed) and queue them for the online model once the session commits.
+    A scoring failure is logged and leaves the old scores in place, so it
+    never fails the write that changed the features.
+    
+    Args:
+        db: Database session
+        user_ids: Users whose features changed
+    """
+    user_ids = list(set(user_ids))
+    online_trainer.observe_after_commit(db, user_ids)
+    try:
+        score_users(db, active_risk_predictor(), user_ids)
+    except Exception as e:
+        print(f"⚠️ Could not refresh risk scores for {len(user_ids)} users: {str(e)}")
 
 # Database session dependency
 def get_db():
@@ -80,25 +218,37 @@ def create_department(dept: schemas.DepartmentCreate, db: Session = Depends(get_
     try:
         db.commit()
         db.refresh(db_dept)
+        email_prewarmer.add_department(db_dept.name)
         return db_dept
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Department name must be unique.")
 
-@app.get("/departments/", response_model=list[schemas.Department])
-def read_departments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@app.get("/departments/", response_model=Union[list[schemas.Department], schemas.DepartmentPage])
+def read_departments(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Get list of departments with pagination.
     
     Args:
-        skip: Number of records to skip
-        limit: Maximum number of records to return
+        skip: Number of records to skip (offset pagination)
+        limit: Maximum number of records to return (at least 1 with a cursor)
+        cursor: Keyset pagination cursor; pass an empty value for the first page
         db: Database session
     
     Returns:
-        List of department objects
+        List of department objects, or a page with next_cursor when cursor is given
+    
+    Raises:
+        HTTPException: If the cursor is invalid or limit is below 1 with a cursor
     """
-    return db.query(models.Department).offset(skip).limit(limit).all()
+    query = db.query(models.Department)
+    if cursor is None:
+        return query.offset(skip).limit(limit).all()
+    try:
+        items, next_cursor = paginate_by_id(query, models.Department, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.get("/departments/{department_id}", response_model=schemas.Department)
 def get_department(department_id: int, db: Session = Depends(get_db)):
@@ -162,7 +312,13 @@ def delete_department(department_id: int, db: Session = Depends(get_db)):
     db_dept = db.query(models.Department).filter(models.Department.id == department_id).first()
     if not db_dept:
         raise HTTPException(status_code=404, detail="Department not found")
+    # Its users are left without a department, whose emails are not tracked
+    # in the rollups, and their department feature changes
+    user_ids = [user.id for user in db_dept.users]
+    delete_department_rollups(db, department_id)
     db.delete(db_dept)
+    db.flush()
+    features_changed(db, user_ids)
     db.commit()
     return {"ok": True}
 
@@ -185,24 +341,34 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.refresh(db_user)
     return db_user
 
-@app.get("/users/", response_model=list[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, department_id: int = Query(None), db: Session = Depends(get_db)):
+@app.get("/users/", response_model=Union[list[schemas.User], schemas.UserPage])
+def read_users(skip: int = 0, limit: int = 100, department_id: int = Query(None), cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Get list of users with optional department filter and pagination.
     
     Args:
-        skip: Number of records to skip
-        limit: Maximum number of records to return
+        skip: Number of records to skip (offset pagination)
+        limit: Maximum number of records to return (at least 1 with a cursor)
         department_id: Optional department ID to filter users
+        cursor: Keyset pagination cursor; pass an empty value for the first page
         db: Database session
     
     Returns:
-        List of user objects
+        List of user objects, or a page with next_cursor when cursor is given
+    
+    Raises:
+        HTTPException: If the cursor is invalid or limit is below 1 with a cursor
     """
     query = db.query(models.User)
     if department_id:
         query = query.filter(models.User.department_id == department_id)
-    return query.offset(skip).limit(limit).all()
+    if cursor is None:
+        return query.offset(skip).limit(limit).all()
+    try:
+        items, next_cursor = paginate_by_id(query, models.User, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.get("/users/{user_id}", response_model=schemas.User)
 def get_user(user_id: int, db: Session = Depends(get_db)):
@@ -244,9 +410,16 @@ def update_user(user_id: int, user: schemas.UserCreate, db: Session = Depends(ge
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    old_department_id = db_user.department_id
     for key, value in user.dict().items():
         setattr(db_user, key, value)
     
+    # The user's sent emails count towards their current department
+    if db_user.department_id != old_department_id:
+        move_user_rollups(db, user_id, old_department_id, db_user.department_id)
+        db.flush()
+        features_changed(db, [user_id])
+    
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -254,7 +427,7 @@ def update_user(user_id: int, user: schemas.UserCreate, db: Session = Depends(ge
 @app.delete("/users/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(get_db)):
     """
-    Delete a user.
+    Delete a user along with their email logs.
     
     Args:
         user_id: ID of the user to delete
@@ -269,6 +442,9 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    db.query(models.UserFeatures).filter(models.UserFeatures.user_id == user_id).delete()
+    db.query(models.UserRiskScore).filter(models.UserRiskScore.user_id == user_id).delete()
+    delete_user_email_logs(db, db_user)
     db.delete(db_user)
     db.commit()
     return {"ok": True}
@@ -288,31 +464,44 @@ def create_email_log(log: schemas.EmailLogCreate, db: Session = Depends(get_db))
     """
     db_log = models.EmailLog(**log.dict(), sent_at=datetime.utcnow())
     db.add(db_log)
+    record_email_logs(db, [db_log])
+    record_sent_emails(db, [db_log])
+    features_changed(db, [db_log.user_id])
     db.commit()
     db.refresh(db_log)
     return db_log
 
-@app.get("/email_logs/", response_model=list[schemas.EmailLog])
-def read_email_logs(skip: int = 0, limit: int = 100, user_id: int = Query(None), department_id: int = Query(None), db: Session = Depends(get_db)):
+@app.get("/email_logs/", response_model=Union[list[schemas.EmailLog], schemas.EmailLogPage])
+def read_email_logs(skip: int = 0, limit: int = 100, user_id: int = Query(None), department_id: int = Query(None), cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Get list of email logs with optional filtering and pagination.
     
     Args:
-        skip: Number of records to skip
-        limit: Maximum number of records to return
+        skip: Number of records to skip (offset pagination)
+        limit: Maximum number of records to return (at least 1 with a cursor)
         user_id: Optional user ID to filter logs
         department_id: Optional department ID to filter logs
+        cursor: Keyset pagination cursor; pass an empty value for the first page
         db: Database session
     
     Returns:
-        List of email log objects
+        List of email log objects, or a newest-first page with next_cursor when cursor is given
+    
+    Raises:
+        HTTPException: If the cursor is invalid or limit is below 1 with a cursor
     """
     query = db.query(models.EmailLog)
     if user_id:
         query = query.filter(models.EmailLog.user_id == user_id)
     if department_id:
         query = query.join(models.User).filter(models.User.department_id == department_id)
-    return query.offset(skip).limit(limit).all()
+    if cursor is None:
+        return query.offset(skip).limit(limit).all()
+    try:
+        items, next_cursor = paginate_email_logs(query, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.get("/email_logs/{log_id}", response_model=schemas.EmailLog)
 def get_email_log(log_id: int, db: Session = Depends(get_db)):
@@ -354,8 +543,14 @@ def update_email_log(log_id: int, log: schemas.EmailLogCreate, db: Session = Dep
     if not db_log:
         raise HTTPException(status_code=404, detail="Email log not found")
     
+    # Move the log's contribution in the rollups if its user or template changes
+    record_email_logs(db, [db_log], sign=-1)
+    previous_user_id = db_log.user_id
     for key, value in log.dict().items():
         setattr(db_log, key, value)
+    record_email_logs(db, [db_log])
+    refresh_user_features(db, list({previous_user_id, db_log.user_id}))
+    features_changed(db, [previous_user_id, db_log.user_id])
     
     db.commit()
     db.refresh(db_log)
@@ -379,7 +574,10 @@ def delete_email_log(log_id: int, db: Session = Depends(get_db)):
     db_log = db.query(models.EmailLog).filter(models.EmailLog.id == log_id).first()
     if not db_log:
         raise HTTPException(status_code=404, detail="Email log not found")
+    record_email_logs(db, [db_log], sign=-1)
     db.delete(db_log)
+    refresh_user_features(db, [db_log.user_id])
+    features_changed(db, [db_log.user_id])
     db.commit()
     return {"ok": True}
 
@@ -403,8 +601,17 @@ def simulate_click(log_id: int, db: Session = Depends(get_db)):
     if not db_log:
         raise HTTPException(status_code=404, detail="Email log not found")
     
+    first_click = not db_log.clicked
+    if first_click:
+        record_email_event(db, db_log, clicked=True)
     db_log.clicked = True
     db_log.clicked_at = datetime.utcnow()
+    if first_click:
+        record_email_click(db, db_log)
+    else:
+        # A repeat click moves clicked_at, which the running aggregates cannot undo
+        refresh_user_features(db, [db_log.user_id])
+    features_changed(db, [db_log.user_id])
     db.commit()
     return {"message": "Click simulated successfully"}
 
@@ -427,6 +634,9 @@ def simulate_response(log_id: int, db: Session = Depends(get_db)):
     if not db_log:
         raise HTTPException(status_code=404, detail="Email log not found")
     
+    if not db_log.responded:
+        record_email_event(db, db_log, responded=True)
+        record_email_response(db, db_log)
     db_log.responded = True
     db_log.responded_at = datetime.utcnow()
     db.commit()
@@ -434,45 +644,113 @@ def simulate_response(log_id: int, db: Session = Depends(get_db)):
 
 # Analytics Endpoints
 @app.get("/analytics/clicks_by_department")
-def clicks_by_department(db: Session = Depends(get_db)):
+def clicks_by_department(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    template_type: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """
     Get click analytics grouped by department.
     
     Args:
+        start_date: Optional first day (inclusive) of emails to include
+        end_date: Optional last day (inclusive) of emails to include
+        template_type: Optional template type to filter emails
         db: Database session
     
     Returns:
         Department click analytics
     """
-    departments = db.query(models.Department).all()
-    analytics = []
+    return department_click_stats(db, start_date, end_date, template_type)
+
+@app.post("/analytics/rollups/rebuild")
+def rebuild_rollups(db: Session = Depends(get_db)):
+    """
+    Rebuild the department/template/day rollups from the raw email logs.
     
-    for dept in departments:
-        users = db.query(models.User).filter(models.User.department_id == dept.id).all()
-        total_emails = 0
-        total_clicks = 0
-        
-        for user in users:
-            user_emails = db.query(models.EmailLog).filter(models.EmailLog.user_id == user.id).all()
-            total_emails += len(user_emails)
-            total_clicks += sum(1 for email in user_emails if email.clicked)
-        
-        click_rate = (total_clicks / total_emails * 100) if total_emails > 0 else 0
-        
-        analytics.append({
-            "department": dept.name,
-            "total_emails": total_emails,
-            "total_clicks": total_clicks,
-            "click_rate": round(click_rate, 2)
-        })
+    Args:
+        db: Database session
     
-    return analytics
+    Returns:
+        Number of rollup rows written
+    """
+    try:
+        rows = rebuild_department_rollups(db)
+        return {"message": "Rollups rebuilt successfully", "rows": rows}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error rebuilding rollups: {str(e)}")
 
 # AI-Powered Email Generation Endpoints
+def check_template_type(generation_mode: str, template_type: Optional[str]):
+    """
+    Reject template types the offline templates do not provide in template mode.
+    
+    Args:
+        generation_mode: "ai", "template" or "batch"
+        template_type: Requested template type, if any
+    
+    Raises:
+        HTTPException: If template mode is asked for an unknown template type
+    """
+    if generation_mode == "template" and template_type and template_type not in template_engine.templates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown template type '{template_type}', expected one of {', '.join(template_engine.templates)}"
+        )
+
+def generate_campaign_emails(user_infos: List[dict], template_type: Optional[str], generation_mode: str) -> tuple:
+    """
+    Generate one email per user with the AI model or the offline templates.
+    
+    Args:
+        user_infos: User info dictionaries from department_user_infos
+        template_type: Optional template type for every email
+        generation_mode: "ai", "template" or "batch"
+    
+    Returns:
+        Tuple of (results, errors) like generate_emails_concurrently
+    """
+    if generation_mode == "template":
+        # Rendering takes microseconds, so a thread pool would only add overhead
+        return template_engine.render_many(user_infos, template_type), []
+    if generation_mode == "batch":
+        return generate_emails_batched(email_generator, user_infos, template_type=template_type)
+    return generate_emails_concurrently(email_generator, user_infos, template_type=template_type)
+
+def save_sent_email(db: Session, user: models.User, email_content: dict) -> models.EmailLog:
+    """
+    Log an email sent to a user and update the statistics and features it affects.
+    
+    Args:
+        db: Database session
+        user: Recipient
+        email_content: Generated email (subject, body, template_type)
+    
+    Returns:
+        The committed email log entry
+    """
+    db_log = models.EmailLog(
+        user_id=user.id,
+        subject=email_content["subject"],
+        body=email_content["body"],
+        sent_at=datetime.utcnow(),
+        template_type=email_content["template_type"]
+    )
+    db.add(db_log)
+    record_email_logs(db, [db_log], department_id=user.department_id)
+    record_sent_emails(db, [db_log])
+    features_changed(db, [user.id])
+    db.commit()
+    db.refresh(db_log)
+    return db_log
+
 @app.post("/generate-email")
 def generate_email(
     user_id: int,
     template_type: Optional[str] = None,
+    generation_mode: str = Query(DEFAULT_GENERATION_MODE, pattern="^(ai|template)$"),
     db: Session = Depends(get_db)
 ):
     """
@@ -481,40 +759,38 @@ def generate_email(
     Args:
         user_id: ID of the target user
         template_type: Optional template type to use
+        generation_mode: "ai" to write the email with the model, "template"
+            to render one of the offline templates ("batch" is treated as
+            "ai" when it is the configured default)
         db: Database session
     
     Returns:
         Generated email details
     
     Raises:
-        HTTPException: If user not found or generation fails
+        HTTPException: If user not found, the template type is unknown or generation fails
     """
+    check_template_type(generation_mode, template_type)
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     try:
-        # Generate email content using AI
-        email_content = email_generator.generate_phishing_email(
-            user_info={
-                "name": user.name,
-                "email": user.email,
-                "department": user.department.name if user.department else "Unknown"
-            },
-            template_type=template_type
-        )
-        
-        # Create email log entry
-        db_log = models.EmailLog(
-            user_id=user_id,
-            subject=email_content["subject"],
-            body=email_content["body"],
-            sent_at=datetime.utcnow(),
-            template_type=template_type
-        )
-        db.add(db_log)
-        db.commit()
-        db.refresh(db_log)
+        user_info = {
+            "name": user.name,
+            "email": user.email,
+            "department": user.department.name if user.department else "Unknown"
+        }
+        if generation_mode == "template":
+            email_content = template_engine.render(user_info, template_type)
+        else:
+            # Take a pre-generated email when one is ready, otherwise generate
+            # email content using AI
+            email_content = email_prewarmer.take(user_info, template_type) or email_generator.generate_phishing_email(
+                user_info=user_info,
+                template_type=template_type
+            )
+        db_log = save_sent_email(db, user, email_content)
         
         return {
             "message": "AI-powered phishing email generated and sent successfully",
@@ -527,10 +803,154 @@ def generate_email(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating email: {str(e)}")
 
+def stream_generated_email(user_id: int, user_info: dict, template_type: Optional[str]) -> Iterator[str]:
+    """
+    Stream an email to the client as Server-Sent Events while it is generated.
+    
+    Emits "subject" and "body" events with text as the model writes it,
+    then logs the email and emits "done" with the email as sent, which
+    replaces the streamed text (they differ when generation fell back to a
+    template). Failures once the response has started are sent as an
+    "error" event. Uses its own session, since the response outlives the
+    request handler.
+    
+    Args:
+        user_id: ID of the target user
+        user_info: Generator user info (name, email, department)
+        template_type: Optional template type to use
+    
+    Yields:
+        Server-Sent Event texts
+    """
+    try:
+        # A pre-generated email is sent whole instead of waiting for the model
+        email_content = email_prewarmer.take(user_info, template_type)
+        if email_content:
+            events = [("subject", email_content["subject"]), ("body", email_content["body"]), ("email", email_content)]
+        else:
+            events = email_generator.stream_phishing_email(user_info, template_type)
+        for event, data in events:
+            if event == "email":
+                email_content = data
+            else:
+                yield sse_event(event, {"text": data})
+        
+        db = SessionLocal()
+        try:
+            user = db.query(models.User).filter(models.User.id == user_id).first()
+            if not user:
+                raise ValueError("User not found")
+            db_log = save_sent_email(db, user, email_content)
+            email_id = db_log.id
+        finally:
+            db.close()
+        
+        yield sse_event("done", {
+            "message": "AI-powered phishing email generated and sent successfully",
+            "email_id": email_id,
+            "subject": email_content["subject"],
+            "body": email_content["body"],
+            "template_type": email_content["template_type"],
+            "user": user_info["name"],
+            "department": user_info["department"]
+        })
+    except Exception as e:
+        print(f"⚠️ Streaming email to user {user_id} failed: {str(e)}")
+        yield sse_event("error", {"detail": f"Error generating email: {str(e)}"})
+
+@app.post("/generate-email/stream")
+def generate_email_stream(user_id: int, template_type: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Generate and send a phishing email to a specific user, streaming it as it is written.
+    
+    The response is a text/event-stream of "subject" and "body" events
+    carrying the model's text as it arrives, ending with a "done" event
+    (email_id, subject, body, template_type, user, department) once the
+    email has been logged, or an "error" event.
+    
+    Args:
+        user_id: ID of the target user
+        template_type: Optional template type to use
+        db: Database session
+    
+    Returns:
+        Server-Sent Events stream of the generated email
+    
+    Raises:
+        HTTPException: If user not found
+    """
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user_info = {
+        "name": user.name,
+        "email": user.email,
+        "department": user.department.name if user.department else "Unknown"
+    }
+    # Disable caching and proxy buffering so events reach the client as they are sent
+    return StreamingResponse(
+        stream_generated_email(user_id, user_info, template_type),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def department_user_infos(department: models.Department, users: List[models.User]) -> List[dict]:
+    """
+    Build the generator's user info dictionaries for users of a department.
+    
+    Args:
+        department: The users' department
+        users: Users to build info for
+    
+    Returns:
+        List of user info dictionaries
+    """
+    return [
+        {
+            "id": user.id,
+            "name": user.name,
+            "email": user.email,
+            "department": department.name
+        }
+        for user in users
+    ]
+
+def save_generated_emails(db: Session, department_id: int, results: list) -> List[models.EmailLog]:
+    """
+    Insert email log entries for generated emails in one batch (not committed).
+    
+    Args:
+        db: Database session
+        department_id: Department of every recipient
+        results: (user_info, email_content) pairs from generate_campaign_emails
+    
+    Returns:
+        The created email log objects
+    """
+    sent_at = datetime.utcnow()
+    sent_logs = [
+        models.EmailLog(
+            user_id=user_info["id"],
+            subject=email_content["subject"],
+            body=email_content["body"],
+            sent_at=sent_at,
+            template_type=email_content["template_type"]
+        )
+        for user_info, email_content in results
+    ]
+    db.add_all(sent_logs)
+    record_email_logs(db, sent_logs, department_id=department_id)
+    record_sent_emails(db, sent_logs)
+    features_changed(db, [log.user_id for log in sent_logs])
+    return sent_logs
+
 @app.post("/generate-email/department")
 def generate_email_department(
     department_id: int,
     template_type: Optional[str] = None,
+    generation_mode: str = Query(DEFAULT_GENERATION_MODE, pattern="^(ai|template|batch)$"),
+    background: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -539,14 +959,19 @@ def generate_email_department(
     Args:
         department_id: ID of the target department
         template_type: Optional template type to use
+        generation_mode: "ai" to write emails with the model, "template" to
+            render the offline templates, "batch" to have the model write
+            several emails per call
+        background: Run as a background job and return 202 with its job ID
         db: Database session
     
     Returns:
-        Generation results
+        Generation results, or the submitted job when background is set
     
     Raises:
-        HTTPException: If department not found or generation fails
+        HTTPException: If department not found, the template type is unknown or generation fails
     """
+    check_template_type(generation_mode, template_type)
     department = db.query(models.Department).filter(models.Department.id == department_id).first()
     if not department:
         raise HTTPException(status_code=404, detail="Department not found")
@@ -555,43 +980,85 @@ def generate_email_department(
     if not users:
         raise HTTPException(status_code=404, detail="No users found in department")
     
-    sent_count = 0
-    failed_count = 0
+    if background:
+        job = job_queue.submit(db, "generate_department", {
+            "department_id": department_id, "template_type": template_type, "generation_mode": generation_mode
+        })
+        return accepted_job(job)
     
-    for user in users:
-        try:
-            # Generate email content using AI
-            email_content = email_generator.generate_phishing_email(
-                user_info={
-                    "name": user.name,
-                    "email": user.email,
-                    "department": user.department.name if user.department else "Unknown"
-                },
-                template_type=template_type
-            )
-            
-            # Create email log entry
-            db_log = models.EmailLog(
-                user_id=user.id,
-                subject=email_content["subject"],
-                body=email_content["body"],
-                sent_at=datetime.utcnow(),
-                template_type=template_type
-            )
-            db.add(db_log)
-            sent_count += 1
-            
-        except Exception as e:
-            failed_count += 1
-            print(f"Failed to generate email for user {user.name}: {str(e)}")
+    # Generate email content for all users concurrently, paced by the rate
+    # limit, or render it from the offline templates
+    results, errors = generate_campaign_emails(department_user_infos(department, users), template_type, generation_mode)
+    for error in errors:
+        print(f"Failed to generate email for user {error['user_name']}: {error['error']}")
     
+    # Insert all email log entries at once
+    sent_logs = save_generated_emails(db, department_id, results)
     db.commit()
     
     return {
         "message": f"Generated emails for department: {department.name}",
-        "sent": sent_count,
-        "failed": failed_count,
-        "total_users": len(users)
+        "sent": len(sent_logs),
+        "failed": len(errors),
+        "total_users": len(users),
+        "errors": errors
+    }
+
+@app.get("/generation-cache")
+def get_generation_cache():
+    """
+    Get generation cache settings, size and hit rate.
+    
+    Returns:
+        Cache statistics
+    """
+    return generation_cache.stats()
+
+@app.delete("/generation-cache")
+def clear_generation_cache():
+    """
+    Remove every cached email so the next requests call the model again.
+    
+    Returns:
+        Success message
+    """
+    generation_cache.clear()
+    return {"message": "Generation cache cleared"}
+
+@app.get("/generation-pool")
+def get_generation_pool():
+    """
+    Get pre-generated email pool levels, hit rate and refill latency.
+    
+    Returns:
+        Pre-generation metrics
+    """
+    return email_prewarmer.metrics()
+
+@app.get("/generation-templates")
+def get_generation_templates():
+    """
+    Get the offline templates used by the "template" generation mode.
+    
+    Returns:
+        Loaded templates with their difficulty and placeholders
+    """
+    return {"default_mode": DEFAULT_GENERATION_MODE, "templates": template_engine.describe()}
+
+@app.get("/generation-health")
+def get_generation_health():
+    """
+    Get the model backend's retry policy, circuit breaker state and request
+    hedging counts, with per-template model call latency histograms and
+    outcome counts.
+    
+    Returns:
+        Backend health, hedging and model call metrics
+    """
+    return {
+        "backend": model_backend.snapshot(),
+        "hedging": hedged_backend.snapshot(),
+        "templates": email_generator.call_metrics.snapshot()
     }
 
 # AI Analysis Endpoints
@@ -613,23 +1080,70 @@ def get_ai_analysis(
         AI analysis results
     """
     try:
-        # Get relevant data based on filters
+        # The anomaly model is fitted across every user once per data version;
+        # the filtered users are then scored against it together
+        ai_analyzer.ensure_fitted(behavior_data_version(db), lambda: user_behavior_metrics(db))
+        
         if user_id:
-            users = db.query(models.User).filter(models.User.id == user_id).all()
+            metrics = user_behavior_metrics(db, user_ids=[user_id])
         elif department_id:
-            users = db.query(models.User).filter(models.User.department_id == department_id).all()
+            metrics = user_behavior_metrics(db, department_id=department_id)
         else:
-            users = db.query(models.User).all()
+            metrics = user_behavior_metrics(db)
         
-        email_logs = db.query(models.EmailLog).all()
+        return ai_analyzer.analyze_population(metrics)
         
-        # Perform AI analysis
-        analysis_results = ai_analyzer.analyze_user_behavior(users, email_logs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error performing AI analysis: {str(e)}")
+
+@app.get("/analytics/behavior-stats")
+def get_behavior_stats(
+    department_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get behaviour statistics for a user, a department or the whole organisation.
+    
+    Args:
+        department_id: Optional department ID to filter statistics
+        user_id: Optional user ID to filter statistics
+        db: Database session
+    
+    Returns:
+        Time-to-click and time-to-respond summaries (minutes), hour-of-day
+        and weekday shares of clicks, and per-template rates
+    """
+    try:
+        log = models.EmailLog
+        query = (
+            db.query(log.user_id, log.clicked, log.responded, log.sent_at, log.clicked_at, log.responded_at, log.template_type)
+            .join(models.User, log.user_id == models.User.id)
+        )
+        if user_id:
+            query = query.filter(log.user_id == user_id)
+        elif department_id:
+            query = query.filter(models.User.department_id == department_id)
+        logs = pd.read_sql(query.statement, db.connection())
+        
+        def delay_summary(event: str) -> dict:
+            stats = delay_stats(logs, event).iloc[0].drop("m2")
+            summary = {name: (None if pd.isna(value) else round(float(value), 3)) for name, value in stats.items()}
+            summary["count"] = int(stats["count"])
+            return summary
         
-        return analysis_results
+        templates = template_rates(logs).reset_index()
+        return {
+            "emails": len(logs),
+            "time_to_click": delay_summary("clicked"),
+            "time_to_respond": delay_summary("responded"),
+            "click_hours": [round(share, 4) for share in hour_distribution(logs).iloc[0].tolist()],
+            "click_weekdays": [round(share, 4) for share in weekday_distribution(logs).iloc[0].tolist()],
+            "templates": templates.round(4).to_dict(orient="records")
+        }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error performing AI analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error computing behavior statistics: {str(e)}")
 
 # Template Management Endpoints
 @app.get("/templates")
@@ -774,168 +1288,504 @@ def get_ab_test_results(test_id: str):
     return results
 
 # Machine Learning Endpoints
+TRAINING_SOURCES = ("store", "logs", "snapshot")
+
+def load_training_dataset(db: Session, source: str = "store", save_snapshot: bool = False):
+    """
+    Load per-user training aggregates from the chosen source.
+    
+    Args:
+        db: Database session
+        source: "store" reads the feature store, "logs" streams the raw email
+            logs, "snapshot" reads the last Parquet snapshot
+        save_snapshot: Also write the loaded dataset as the new snapshot
+    
+    Returns:
+        DataFrame with one row per user and the feature store aggregate columns
+    """
+    if source == "store":
+        dataset = load_user_feature_rows(db)
+    elif source == "logs":
+        dataset = build_training_dataset(db)
+    elif source == "snapshot":
+        dataset = read_snapshot()
+    else:
+        raise ValueError(f"Unknown training source '{source}', expected one of {', '.join(TRAINING_SOURCES)}")
+    
+    if save_snapshot and source != "snapshot":
+        write_snapshot(dataset)
+    return dataset
+
+def run_risk_model_training(
+    db: Session,
+    context: Optional[JobContext] = None,
+    source: str = "store",
+    save_snapshot: bool = False
+) -> dict:
+    """
+    Train the risk prediction model on every user with email history.
+    
+    The model is fitted in a training process; this thread only waits for
+    it, then saves the new model atomically, publishes it and re-scores users.
+    A model that cannot score users (e.g. fitted on a single class) is
+    rejected before it is saved, leaving the serving model in place.
+    
+    Args:
+        db: Database session
+        context: Job context for progress and cancellation when run as a background job
+        source: Where to read training data from (see load_training_dataset)
+        save_snapshot: Also write the training data as a Parquet snapshot
+    
+    Returns:
+        Training results with per-stage timings in seconds
+        
+    Raises:
+        ValueError: If the fitted model fails validation
+    """
+    if context:
+        source = context.params.get("source", source)
+        save_snapshot = context.params.get("save_snapshot", save_snapshot)
+    started = time.perf_counter()
+    timings = {}
+    
+    def stage(name: str, step: int, since: float) -> float:
+        now = time.perf_counter()
+        timings[name] = round(now - since, 3)
+        if context:
+            context.update(step)
+            db.commit()
+        return now
+    
+    if context:
+        context.set_total(5)
+    
+    # Read every user's aggregates and build the feature matrix; high risk
+    # means a click rate above 30%
+    users = load_training_dataset(db, source, save_snapshot)
+    users = users[users["email_count"] > 0]  # Only include users with email history
+    risk_features = MLRiskPredictor(load=False)
+    features = risk_features.extract_features_from_aggregates(users)
+    labels = risk_features.labels_from_aggregates(users)
+    mark = stage("build_seconds", 1, started)
+    
+    # Fit in the training process
+    risk_predictor, fit_seconds = training_pool.fit(
+        features, labels, on_wait=context.raise_if_cancelled if context else None
+    )
+    mark = stage("fit_seconds", 2, mark)
+    timings["fit_process_seconds"] = round(fit_seconds, 3)
+    
+    # Swap the model files in atomically, then serve the model to predictions
+    if context:
+        context.raise_if_cancelled()
+    if risk_predictor.is_trained:
+        risk_predictor.validate(features)
+        if risk_predictor.save_model():
+            risk_model_registry.publish(risk_predictor)
+    mark = stage("save_seconds", 3, mark)
+    
+    # Re-score every user with the new model
+    users_scored = score_users(db, risk_predictor)
+    mark = stage("score_seconds", 4, mark)
+    timings["total_seconds"] = round(mark - started, 3)
+    if context:
+        context.update(5)
+    db.commit()
+    
+    return {
+        "message": "Risk prediction model trained successfully",
+        "users_trained": len(users),
+        "users_scored": users_scored,
+        "source": source,
+        "model_status": "trained" if risk_predictor.is_trained else "failed",
+        "model_version": risk_predictor.model_version,
+        "timings": timings
+    }
+
+def run_risk_score_refresh(db: Session, context: Optional[JobContext] = None) -> dict:
+    """
+    Re-score every user with the current model.
+    
+    Scores otherwise change only when a user's features do, so this picks up
+    a model loaded from disk and the decay of the 7-day activity feature.
+    
+    Args:
+        db: Database session
+        context: Job context for progress reporting when run as a background job
+    
+    Returns:
+        Refresh results
+    """
+    risk_predictor = active_risk_predictor()
+    if context:
+        context.set_total(db.query(models.User).count())
+    
+    def report(scored: int):
+        if context:
+            context.raise_if_cancelled()
+            context.update(scored)
+        db.commit()
+    
+    users_scored = score_users(db, risk_predictor, on_chunk=report)
+    db.commit()
+    
+    return {
+        "users_scored": users_scored,
+        "model_version": risk_predictor.model_version
+    }
+
 @app.post("/ml/train-risk-model")
-def train_risk_model(db: Session = Depends(get_db)):
+def train_risk_model(
+    background: bool = True,
+    source: str = Query("store", pattern="^(store|logs|snapshot)$"),
+    save_snapshot: bool = False,
+    db: Session = Depends(get_db)
+):
     """
     Train the machine learning risk prediction model.
     
+    Training runs as a background job by default; poll /jobs/{id} for its
+    progress and timings.
+    
     Args:
+        background: Run as a background job and return 202 with its job ID;
+            pass false to wait for the results
+        source: Training data source: the feature store, the raw email logs
+            (streamed) or the last Parquet snapshot
+        save_snapshot: Also write the training data as a Parquet snapshot
+            for later runs to reuse
         db: Database session
     
     Returns:
-        Training results
+        The submitted job, or training results when background is false
     """
+    if background:
+        return accepted_job(job_queue.submit(
+            db, "train_risk_model", {"source": source, "save_snapshot": save_snapshot}
+        ))
+    
     try:
-        # Get all users and their email history
-        users = db.query(models.User).all()
-        email_logs = db.query(models.EmailLog).all()
-        
-        # Prepare training data
-        training_data = []
-        for user in users:
-            user_emails = [log for log in email_logs if log.user_id == user.id]
-            if user_emails:  # Only include users with email history
-                training_data.append({
-                    "user": {
-                        "id": user.id,
-                        "name": user.name,
-                        "department": user.department,
-                        "age": getattr(user, 'age', 35)
-                    },
-                    "emails": [
-                        {
-                            "user_id": email.user_id,
-                            "clicked": email.clicked,
-                            "sent_at": email.sent_at.isoformat() if email.sent_at else None,
-                            "clicked_at": email.clicked_at.isoformat() if email.clicked_at else None,
-                            "template_type": email.template_type
-                        }
-                        for email in user_emails
-                    ]
-                })
-        
-        # Initialize and train the model
-        risk_predictor = MLRiskPredictor()
-        risk_predictor.train_model(training_data)
-        
-        return {
-            "message": "Risk prediction model trained successfully",
-            "users_trained": len(training_data),
-            "model_status": "trained" if risk_predictor.is_trained else "failed"
-        }
-        
+        return run_risk_model_training(db, source=source, save_snapshot=save_snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error training model: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error training model: {str(e)}")
 
+def predict_risk_for_users(user_ids: List[int]) -> List[Optional[tuple]]:
+    """
+    Score a batch of users with one feature load and one model call.
+    Runs on the prediction batcher's thread, so it uses its own session.
+    
+    Args:
+        user_ids: Users to score (may contain duplicates)
+    
+    Returns:
+        (user_name, prediction) per requested user, or None for unknown users
+    """
+    db = SessionLocal()
+    try:
+        users = load_user_feature_rows(db, user_ids=list(set(user_ids)))
+        risk_predictor = active_risk_predictor()
+        predictions = risk_predictor.predict_risk_batch(risk_predictor.extract_features_from_aggregates(users))
+        scored = {
+            int(user_id): (user_name, prediction)
+            for user_id, user_name, prediction in zip(users["id"], users["name"], predictions)
+        }
+        return [scored.get(user_id) for user_id in user_ids]
+    finally:
+        db.close()
+
+# Concurrent single-user predictions are collected into micro-batches
+prediction_batcher = MicroBatcher(predict_risk_for_users)
+
 @app.get("/ml/predict-user-risk/{user_id}")
-def predict_user_risk(user_id: int, db: Session = Depends(get_db)):
+def predict_user_risk(user_id: int):
     """
     Predict risk level for a specific user.
     
+    Concurrent requests are scored together by the prediction batcher.
+    
     Args:
         user_id: ID of the user
-        db: Database session
     
     Returns:
         Risk prediction results
+    
+    Raises:
+        HTTPException: If user not found or prediction fails
     """
     try:
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        email_logs = db.query(models.EmailLog).filter(models.EmailLog.user_id == user_id).all()
-        
-        # Initialize risk predictor
-        risk_predictor = MLRiskPredictor()
+        scored = prediction_batcher.submit(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error predicting risk: {str(e)}")
+    if scored is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user_name, prediction = scored
+    return {
+        "user_id": user_id,
+        "user_name": user_name,
+        "prediction": prediction
+    }
+
+@app.get("/ml/inference-metrics")
+def get_inference_metrics():
+    """
+    Get micro-batching metrics for single-user risk predictions.
+    
+    Returns:
+        Batch size, queueing delay and batch scoring time histograms
+    """
+    return prediction_batcher.metrics()
+
+def iter_risk_prediction_chunks(db: Session, risk_predictor: MLRiskPredictor, chunk_size: int = BULK_PREDICTION_CHUNK_SIZE) -> Iterator[List[dict]]:
+    """
+    Predict risk for every user, one chunk of users at a time.
+    
+    Each chunk reads its users' rows from the feature store, builds one
+    feature matrix and scores it with one model call.
+    
+    Args:
+        db: Database session
+        risk_predictor: Predictor to score users with
+        chunk_size: Number of users per chunk
+    
+    Yields:
+        Lists of per-user prediction dictionaries, in user ID order
+    """
+    last_user_id = 0
+    while True:
+        users = load_user_feature_rows(db, after_user_id=last_user_id, limit=chunk_size)
+        if users.empty:
+            return
+        last_user_id = int(users["id"].iloc[-1])
         
-        # Prepare user data
-        user_data = {
-            "id": user.id,
-            "name": user.name,
-            "department": user.department,
-            "age": getattr(user, 'age', 35)
-        }
+        features = risk_predictor.extract_features_from_aggregates(users)
+        predictions = risk_predictor.predict_risk_batch(features)
         
-        # Prepare email logs
-        email_data = [
+        yield [
             {
-                "user_id": email.user_id,
-                "clicked": email.clicked,
-                "sent_at": email.sent_at.isoformat() if email.sent_at else None,
-                "clicked_at": email.clicked_at.isoformat() if email.clicked_at else None,
-                "template_type": email.template_type
+                "user_id": int(user_id),
+                "user_name": user_name,
+                "department": department_name,
+                "prediction": prediction
             }
-            for email in email_logs
+            for user_id, user_name, department_name, prediction in zip(
+                users["id"], users["name"], users["department"], predictions
+            )
         ]
-        
-        # Make prediction
-        prediction = risk_predictor.predict_user_risk(user_data, email_data)
-        
+
+def run_bulk_risk_prediction(db: Session, context: Optional[JobContext] = None) -> dict:
+    """
+    Predict risk for every user.
+    
+    Args:
+        db: Database session
+        context: Job context for progress and cancellation when run as a background job
+    
+    Returns:
+        Risk predictions for all users
+    """
+    if context:
+        context.set_total(db.query(models.User).count())
+    
+    predictions = []
+    for chunk in iter_risk_prediction_chunks(db, active_risk_predictor()):
+        predictions.extend(chunk)
+        if context:
+            context.raise_if_cancelled()
+            context.update(len(predictions))
+            db.commit()
+    
+    return {
+        "predictions": predictions,
+        "total_users": len(predictions)
+    }
+
+def stream_bulk_risk_prediction(chunk_size: int) -> Iterator[str]:
+    """
+    Stream the bulk prediction response body chunk by chunk.
+    
+    Emits the same JSON document as run_bulk_risk_prediction without holding
+    every prediction in memory. Uses its own session, since the response
+    outlives the request handler.
+    
+    Args:
+        chunk_size: Number of users scored per chunk
+    
+    Yields:
+        Pieces of the JSON response body
+    """
+    db = SessionLocal()
+    try:
+        total_users = 0
+        yield '{"predictions": ['
+        for chunk in iter_risk_prediction_chunks(db, active_risk_predictor(), chunk_size):
+            body = ", ".join(json.dumps(prediction, default=str) for prediction in chunk)
+            yield (", " if total_users else "") + body
+            total_users += len(chunk)
+        yield f'], "total_users": {total_users}}}'
+    finally:
+        db.close()
+
+@app.get("/ml/bulk-risk-prediction")
+def bulk_risk_prediction(background: bool = False, chunk_size: int = Query(BULK_PREDICTION_CHUNK_SIZE, ge=1), db: Session = Depends(get_db)):
+    """
+    Get risk predictions for all users.
+    
+    The response is streamed as users are scored, one chunk at a time.
+    
+    Args:
+        background: Run as a background job and return 202 with its job ID
+        chunk_size: Number of users scored per model call
+        db: Database session
+    
+    Returns:
+        Risk predictions for all users, or the submitted job when background is set
+    """
+    if background:
+        return accepted_job(job_queue.submit(db, "bulk_risk_prediction"))
+    
+    return StreamingResponse(stream_bulk_risk_prediction(chunk_size), media_type="application/json")
+
+@app.get("/ml/top-risk")
+def get_top_risk_users(
+    limit: int = Query(50, ge=1, le=1000),
+    department_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the users with the highest persisted risk scores.
+    
+    Reads scores kept current by training and by feature updates instead of
+    scoring every user.
+    
+    Args:
+        limit: Number of users to return
+        department_id: Optional department ID to filter users
+        db: Database session
+    
+    Returns:
+        The riskiest users, highest risk score first
+    """
+    try:
+        users = top_risk_users(db, limit=limit, department_id=department_id)
         return {
-            "user_id": user_id,
-            "user_name": user.name,
-            "prediction": prediction
+            "users": users,
+            "count": len(users)
         }
-        
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error predicting risk: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading risk scores: {str(e)}")
 
-@app.get("/ml/bulk-risk-prediction")
-def bulk_risk_prediction(db: Session = Depends(get_db)):
+@app.post("/ml/risk-scores/refresh")
+def refresh_risk_scores(background: bool = False, db: Session = Depends(get_db)):
     """
-    Get risk predictions for all users.
+    Re-score every user with the current risk model.
     
     Args:
+        background: Run as a background job and return 202 with its job ID
         db: Database session
     
     Returns:
-        Risk predictions for all users
+        Refresh results, or the submitted job when background is set
     """
+    if background:
+        return accepted_job(job_queue.submit(db, "refresh_risk_scores"))
+    
     try:
-        users = db.query(models.User).all()
-        email_logs = db.query(models.EmailLog).all()
-        
-        risk_predictor = MLRiskPredictor()
-        predictions = []
+        return run_risk_score_refresh(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing risk scores: {str(e)}")
+
+@app.get("/ml/model-info")
+def get_model_info():
+    """
+    Get the loaded risk model version, load time and memory footprint.
+    
+    Returns:
+        Current model version details and recent version history
+    """
+    risk_model_registry.get()
+    return risk_model_registry.info()
+
+@app.post("/ml/reload-model")
+def reload_model():
+    """
+    Force the risk model to be reloaded from the Models/ directory.
+    
+    Returns:
+        Whether a new version was installed and the current version details
+    """
+    reloaded = risk_model_registry.reload(force=True)
+    return {"reloaded": reloaded, "model": risk_model_registry.info()["current"]}
+
+@app.get("/ml/online-model")
+def get_online_model_info():
+    """
+    Get the online risk model's training state.
+    
+    Returns:
+        Online model details and the active scoring mode
+    """
+    return {"mode": DEFAULT_RISK_MODEL_MODE, **online_trainer.info()}
+
+@app.post("/ml/online-model/update")
+def update_online_model(replay: bool = False, db: Session = Depends(get_db)):
+    """
+    Apply buffered outcomes to the online risk model without waiting for a full batch.
+    
+    Args:
+        replay: Also stream every training user's current features through
+            the model, e.g. to warm up a new model from existing history
+        db: Database session
+    
+    Returns:
+        Number of samples learned from and the online model details
+    """
+    try:
+        learned = online_trainer.flush(db)
+        if replay:
+            learned += online_trainer.replay(db)
+        return {"samples_learned": learned, **online_trainer.info()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating online model: {str(e)}")
+
+@app.get("/ml/online-model/compare")
+def compare_online_model(db: Session = Depends(get_db)):
+    """
+    Compare the online model with the batch RandomForest on held-out users.
+    
+    The held-out users are never fed to the online model. A RandomForest is
+    fitted on the remaining users for the comparison, so neither model has
+    seen the evaluation users.
+    
+    Args:
+        db: Database session
+    
+    Returns:
+        Evaluation metrics for both models on the held-out users
+    """
+    try:
+        users = load_user_feature_rows(db)
+        users = users[users["email_count"] > 0]
+        holdout_mask = users["id"].map(is_holdout_user).to_numpy(dtype=bool)
         
-        for user in users:
-            user_emails = [log for log in email_logs if log.user_id == user.id]
-            
-            user_data = {
-                "id": user.id,
-                "name": user.name,
-                "department": user.department,
-                "age": getattr(user, 'age', 35)
-            }
-            
-            email_data = [
-                {
-                    "user_id": email.user_id,
-                    "clicked": email.clicked,
-                    "sent_at": email.sent_at.isoformat() if email.sent_at else None,
-                    "clicked_at": email.clicked_at.isoformat() if email.clicked_at else None,
-                    "template_type": email.template_type
-                }
-                for email in user_emails
-            ]
-            
-            prediction = risk_predictor.predict_user_risk(user_data, email_data)
-            
-            predictions.append({
-                "user_id": user.id,
-                "user_name": user.name,
-                "department": user.department,
-                "prediction": prediction
-            })
+        risk_features = MLRiskPredictor(load=False)
+        features = risk_features.extract_features_from_aggregates(users)
+        labels = risk_features.labels_from_aggregates(users)
         
+        batch_predictor, _ = training_pool.fit(features[~holdout_mask], labels[~holdout_mask])
         return {
-            "predictions": predictions,
-            "total_users": len(predictions)
+            "holdout_users": int(holdout_mask.sum()),
+            "training_users": int((~holdout_mask).sum()),
+            "online": {
+                **evaluate_predictor(online_trainer.predictor, features[holdout_mask], labels[holdout_mask]),
+                "samples_seen": online_trainer.predictor.samples_seen
+            },
+            "batch": evaluate_predictor(batch_predictor, features[holdout_mask], labels[holdout_mask])
         }
-        
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error in bulk prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error comparing models: {str(e)}")
 
 # Training Simulation Endpoints
 @app.post("/users/{user_id}/complete-training")
@@ -1112,6 +1962,11 @@ def wipe_all_data(db: Session = Depends(get_db)):
         Success message with deletion details
     """
     try:
+        # Delete all analytics rollups
+        db.query(models.DepartmentTemplateStat).delete()
+        db.query(models.UserFeatures).delete()
+        db.query(models.UserRiskScore).delete()
+        
         # Delete all email logs
         email_logs_deleted = db.query(models.EmailLog).delete()
         
@@ -1135,6 +1990,191 @@ def wipe_all_data(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error wiping data: {str(e)}")
 
+# Background Job Endpoints
+def run_department_generation_job(db: Session, context: JobContext) -> dict:
+    """
+    Background handler for department campaign generation.
+    Users are processed in ID order in chunks; each chunk's email logs are
+    committed together with the job checkpoint, so a restarted job resumes
+    after the last committed user instead of emailing anyone twice.
+    
+    Args:
+        db: Database session
+        context: Job context with department_id, template_type and
+            generation_mode params
+    
+    Returns:
+        Generation results
+    """
+    department_id = context.params["department_id"]
+    template_type = context.params.get("template_type")
+    generation_mode = context.params.get("generation_mode", "ai")
+    if generation_mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode '{generation_mode}', expected one of {', '.join(GENERATION_MODES)}")
+    department = db.query(models.Department).filter(models.Department.id == department_id).first()
+    if not department:
+        raise ValueError("Department not found")
+    
+    users_query = db.query(models.User).filter(models.User.department_id == department_id)
+    context.set_total(users_query.count())
+    state = context.checkpoint or {"last_user_id": 0, "sent": 0, "failed": 0, "errors": []}
+    
+    while True:
+        context.raise_if_cancelled()
+        users = (
+            users_query.filter(models.User.id > state["last_user_id"])
+            .order_by(models.User.id)
+            .limit(JOB_GENERATION_CHUNK_SIZE)
+            .all()
+        )
+        if not users:
+            break
+        
+        results, errors = generate_campaign_emails(department_user_infos(department, users), template_type, generation_mode)
+        save_generated_emails(db, department_id, results)
+        state = {
+            "last_user_id": users[-1].id,
+            "sent": state["sent"] + len(results),
+            "failed": state["failed"] + len(errors),
+            "errors": state["errors"] + errors
+        }
+        context.update(state["sent"] + state["failed"], state)
+        db.commit()
+    
+    return {
+        "message": f"Generated emails for department: {department.name}",
+        "sent": state["sent"],
+        "failed": state["failed"],
+        "total_users": context.job.progress_total,
+        "errors": state["errors"]
+    }
+
+def validate_department_generation_params(db: Session, params: Dict[str, Any]):
+    """
+    Check generate_department job params before the job is queued.
+    
+    Args:
+        db: Database session
+        params: Submitted job params
+    
+    Raises:
+        ValueError: If department_id is missing or unknown, or the generation
+            mode or template type is invalid
+    """
+    department_id = params.get("department_id")
+    if not isinstance(department_id, int) or isinstance(department_id, bool):
+        raise ValueError("generate_department jobs require an integer department_id param")
+    generation_mode = params.get("generation_mode", "ai")
+    if generation_mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode '{generation_mode}', expected one of {', '.join(GENERATION_MODES)}")
+    template_type = params.get("template_type")
+    if template_type is not None and not isinstance(template_type, str):
+        raise ValueError("template_type must be a string")
+    if generation_mode == "template" and template_type and template_type not in template_engine.templates:
+        raise ValueError(f"Unknown template type '{template_type}', expected one of {', '.join(template_engine.templates)}")
+    if not db.query(models.Department).filter(models.Department.id == department_id).first():
+        raise ValueError("Department not found")
+
+def validate_risk_model_training_params(db: Session, params: Dict[str, Any]):
+    """
+    Check train_risk_model job params before the job is queued.
+    
+    Args:
+        db: Database session
+        params: Submitted job params
+    
+    Raises:
+        ValueError: If the training source or save_snapshot flag is invalid
+    """
+    source = params.get("source", "store")
+    if source not in TRAINING_SOURCES:
+        raise ValueError(f"Unknown training source '{source}', expected one of {', '.join(TRAINING_SOURCES)}")
+    if not isinstance(params.get("save_snapshot", False), bool):
+        raise ValueError("save_snapshot must be a boolean")
+
+job_queue.register("generate_department", run_department_generation_job, validate_department_generation_params)
+job_queue.register("train_risk_model", run_risk_model_training, validate_risk_model_training_params)
+job_queue.register("bulk_risk_prediction", run_bulk_risk_prediction)
+job_queue.register("refresh_risk_scores", run_risk_score_refresh)
+
+@app.post("/jobs", status_code=202, response_model=schemas.Job)
+def submit_job(job: schemas.JobCreate, db: Session = Depends(get_db)):
+    """
+    Submit a background job.
+    
+    Args:
+        job: Job type and handler parameters
+        db: Database session
+    
+    Returns:
+        The queued job
+    
+    Raises:
+        HTTPException: If the job type is unknown or its params are invalid
+    """
+    try:
+        return serialize_job(job_queue.submit(db, job.job_type, job.params))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/jobs", response_model=list[schemas.Job])
+def list_jobs(status: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    """
+    List background jobs, newest first.
+    
+    Args:
+        status: Optional status to filter jobs
+        limit: Maximum number of jobs to return
+        db: Database session
+    
+    Returns:
+        List of jobs
+    """
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    return [serialize_job(job) for job in query.order_by(models.Job.id.desc()).limit(limit).all()]
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Poll a background job's status, progress and result.
+    
+    Args:
+        job_id: ID of the job
+        db: Database session
+    
+    Returns:
+        Job object
+    
+    Raises:
+        HTTPException: If job not found
+    """
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
+
+@app.post("/jobs/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Cancel a queued or running background job.
+    
+    Args:
+        job_id: ID of the job
+        db: Database session
+    
+    Returns:
+        Updated job object
+    
+    Raises:
+        HTTPException: If job not found
+    """
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job_queue.cancel(db, job))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
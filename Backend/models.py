@@ -1,10 +1,11 @@
 """
 Database Models for Phishing Simulation Platform
 This module defines the SQLAlchemy models for the database schema.
-It includes models for departments, users, and email logs.
+It includes models for departments, users, email logs, the analytics rollups, per-user
+feature store and risk scores derived from them, and the background job queue.
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, DateTime, Date, Boolean, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -43,7 +44,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     email = Column(String, unique=True, index=True)
-    department_id = Column(Integer, ForeignKey('departments.id'))
+    department_id = Column(Integer, ForeignKey('departments.id'), index=True)
     training_completed = Column(Boolean, default=False)
     training_completed_at = Column(DateTime, nullable=True)
     department = relationship("Department", back_populates="users")
@@ -77,4 +78,138 @@ class EmailLog(Base):
     responded = Column(Boolean, default=False)
     responded_at = Column(DateTime, nullable=True)
     template_type = Column(String, nullable=True)
-    user = relationship("User", back_populates="email_logs") 
\ No newline at end of file
+    user = relationship("User", back_populates="email_logs")
+
+    __table_args__ = (
+        # Supports per-user aggregation filtered by send date
+        Index('ix_email_logs_user_id_sent_at', 'user_id', 'sent_at'),
+        # Keyset pagination order for /email_logs/
+        Index('ix_email_logs_sent_at_id', 'sent_at', 'id'),
+    )
+
+class DepartmentTemplateStat(Base):
+    """
+    Daily rollup of email activity per department and template type.
+    Maintained incrementally by the email write paths so analytics can read
+    a handful of pre-aggregated rows instead of scanning every email log.
+    
+    Attributes:
+        id: Primary key
+        department_id: Foreign key to the recipient's department at send time
+        template_type: Template type of the emails ('' when none was given)
+        day: Day the emails were sent (UTC)
+        sent_count: Number of emails sent
+        clicked_count: Number of those emails that were clicked
+        responded_count: Number of those emails that were responded to
+    """
+    __tablename__ = 'department_template_stats'
+    id = Column(Integer, primary_key=True, index=True)
+    department_id = Column(Integer, ForeignKey('departments.id'), nullable=False)
+    template_type = Column(String, nullable=False, default='')
+    day = Column(Date, nullable=False)
+    sent_count = Column(Integer, nullable=False, default=0)
+    clicked_count = Column(Integer, nullable=False, default=0)
+    responded_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('department_id', 'template_type', 'day', name='uq_department_template_stats_key'),
+    )
+
+class UserFeatures(Base):
+    """
+    Running aggregates of a user's email history for risk prediction.
+    Updated incrementally on every send, click and response so the
+    MLRiskPredictor feature vector can be read from one row per user.
+    
+    Attributes:
+        user_id: Primary key and foreign key to the user
+        email_count: Number of emails sent to the user
+        click_count: Number of emails the user clicked
+        responded_count: Number of emails the user responded to
+        response_time_count: Number of clicks with a measured response time
+        response_time_mean: Running mean of click response time in minutes
+        response_time_m2: Running sum of squared deviations of response time
+        timed_click_count: Number of clicks with a click timestamp
+        work_hours_click_count: Clicks made between 9:00 and 17:59
+        weekend_click_count: Clicks made on Saturday or Sunday
+        template_rate_sum: Sum of template click rates over clicked emails
+        updated_at: Timestamp of the last update
+    """
+    __tablename__ = 'user_features'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    email_count = Column(Integer, nullable=False, default=0)
+    click_count = Column(Integer, nullable=False, default=0)
+    responded_count = Column(Integer, nullable=False, default=0)
+    response_time_count = Column(Integer, nullable=False, default=0)
+    response_time_mean = Column(Float, nullable=False, default=0.0)
+    response_time_m2 = Column(Float, nullable=False, default=0.0)
+    timed_click_count = Column(Integer, nullable=False, default=0)
+    work_hours_click_count = Column(Integer, nullable=False, default=0)
+    weekend_click_count = Column(Integer, nullable=False, default=0)
+    template_rate_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class UserRiskScore(Base):
+    """
+    Latest risk prediction for a user, kept current so the riskiest users
+    can be listed without scoring everyone.
+    
+    Attributes:
+        user_id: Primary key and foreign key to the user
+        risk_score: Predicted probability that the user is high risk
+        risk_level: Risk level derived from the score (low, medium, high)
+        model_version: Version of the model that produced the score
+        scored_at: Timestamp when the score was computed
+    """
+    __tablename__ = 'user_risk_scores'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    risk_score = Column(Float, nullable=False)
+    risk_level = Column(String, nullable=False)
+    model_version = Column(String, nullable=True)
+    scored_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Top-K reads walk this index from the highest score down
+        Index('ix_user_risk_scores_risk_score_user_id', 'risk_score', 'user_id'),
+    )
+
+class Job(Base):
+    """
+    Background job persisted in the database so it survives restarts.
+    
+    Attributes:
+        id: Primary key
+        job_type: Registered handler name (e.g. 'generate_department')
+        status: One of queued, running, succeeded, failed, cancelled
+        params: JSON-encoded handler parameters
+        progress_current: Units of work completed so far
+        progress_total: Total units of work, once known
+        checkpoint: JSON-encoded handler state used to resume after a restart
+        result: JSON-encoded handler result
+        error: Error message if the job failed
+        cancel_requested: Whether a cancel was requested while running
+        attempts: Number of times a worker has started the job
+        created_at: Timestamp when the job was submitted
+        started_at: Timestamp when the job last started running
+        finished_at: Timestamp when the job finished
+    """
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)
+    status = Column(String, nullable=False, default='queued')
+    params = Column(Text, nullable=True)
+    progress_current = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    checkpoint = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index('ix_jobs_status_id', 'status', 'id'),
+    )
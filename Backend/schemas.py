@@ -5,7 +5,7 @@ It includes schemas for departments, users, email logs, and AI analysis.
 """
 
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 class DepartmentBase(BaseModel):
@@ -120,6 +120,39 @@ class EmailLog(EmailLogBase):
     class Config:
         orm_mode = True
 
+class DepartmentPage(BaseModel):
+    """
+    Schema for one keyset-paginated page of departments.
+    
+    Attributes:
+        items: Departments on this page
+        next_cursor: Cursor for the next page, None on the last page
+    """
+    items: List[Department]
+    next_cursor: Optional[str] = None
+
+class UserPage(BaseModel):
+    """
+    Schema for one keyset-paginated page of users.
+    
+    Attributes:
+        items: Users on this page
+        next_cursor: Cursor for the next page, None on the last page
+    """
+    items: List[User]
+    next_cursor: Optional[str] = None
+
+class EmailLogPage(BaseModel):
+    """
+    Schema for one keyset-paginated page of email logs.
+    
+    Attributes:
+        items: Email logs on this page, newest first
+        next_cursor: Cursor for the next page, None on the last page
+    """
+    items: List[EmailLog]
+    next_cursor: Optional[str] = None
+
 # AI Analysis Models
 class Metrics(BaseModel):
     """
@@ -173,4 +206,49 @@ class TemplateSuggestions(BaseModel):
         total_templates: Total number of templates analyzed
     """
     suggestions: List[TemplateSuggestion]
-    total_templates: int 
\ No newline at end of file
+    total_templates: int
+
+# Background Job Models
+class JobCreate(BaseModel):
+    """
+    Schema for submitting a background job.
+    
+    Attributes:
+        job_type: Registered job type (generate_department, train_risk_model, bulk_risk_prediction)
+        params: Parameters for the job handler (generate_department requires department_id)
+    """
+    job_type: str
+    params: Dict[str, Any] = {}
+
+class Job(BaseModel):
+    """
+    Schema for background job status.
+    
+    Attributes:
+        id: Job ID
+        job_type: Job type
+        status: One of queued, running, succeeded, failed, cancelled
+        params: Parameters the job was submitted with
+        progress_current: Units of work completed so far
+        progress_total: Total units of work, once known
+        result: Handler result once the job has succeeded
+        error: Error message if the job failed
+        cancel_requested: Whether a cancel was requested while running
+        attempts: Number of times the job has been started
+        created_at: Timestamp when the job was submitted
+        started_at: Timestamp when the job last started running
+        finished_at: Timestamp when the job finished
+    """
+    id: int
+    job_type: str
+    status: str
+    params: Dict[str, Any] = {}
+    progress_current: int = 0
+    progress_total: Optional[int] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
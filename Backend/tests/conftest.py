@@ -0,0 +1,49 @@
+"""
+Shared pytest setup: makes the Backend modules (Utils, models, ...)
+importable when pytest is run from the repository root or Backend, and
+provides an API client on an in-memory database.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """API client on an in-memory database with one department, user and sent email."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    import main
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(models.Department(id=1, name="IT"))
+    db.add(models.User(id=1, name="User 1", email="user1@smx.test", department_id=1))
+    db.add(models.EmailLog(id=1, user_id=1, subject="s", body="b", template_type="urgent_action", sent_at=datetime(2024, 1, 1)))
+    db.commit()
+    db.close()
+
+    def get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = get_db
+    monkeypatch.setattr(main.risk_model_registry, "_predictor", None)
+    yield main, TestClient(main.app)
+    main.app.dependency_overrides.clear()
@@ -0,0 +1,77 @@
+"""
+Tests that the department rollups keep matching the raw email logs when
+users change department or are deleted.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from Utils.analytics_utils import (
+    department_click_stats, department_click_stats_from_logs, delete_department_rollups,
+    delete_user_email_logs, move_user_rollups, record_email_logs
+)
+
+
+@pytest.fixture
+def db():
+    """Session on an in-memory database with two departments of two users, each sent three emails."""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for name in ("IT", "HR"):
+        department = models.Department(name=name)
+        session.add(department)
+        session.flush()
+        for i in range(2):
+            user = models.User(name=f"{name} {i}", email=f"{name}{i}@smx.test", department_id=department.id)
+            session.add(user)
+            session.flush()
+            logs = [
+                models.EmailLog(user_id=user.id, subject="s", body="b", template_type="urgent_action",
+                                sent_at=datetime(2024, 1, day), clicked=day == 1)
+                for day in (1, 2, 3)
+            ]
+            session.add_all(logs)
+            record_email_logs(session, logs, department_id=department.id)
+    session.commit()
+    yield session
+    session.close()
+
+
+def assert_rollups_match_logs(db):
+    assert department_click_stats(db) == department_click_stats_from_logs(db)
+
+
+def test_moving_a_user_moves_their_counts(db):
+    it, hr = db.query(models.Department).order_by(models.Department.id).all()
+    user = it.users[0]
+    move_user_rollups(db, user.id, it.id, hr.id)
+    user.department_id = hr.id
+    db.commit()
+
+    assert_rollups_match_logs(db)
+    assert [row["total_emails"] for row in department_click_stats(db)] == [3, 9]
+
+
+def test_deleting_a_user_removes_their_logs(db):
+    user = db.query(models.User).first()
+    assert delete_user_email_logs(db, user) == 3
+    db.delete(user)
+    db.commit()
+
+    assert_rollups_match_logs(db)
+    assert db.query(models.EmailLog).filter(models.EmailLog.user_id == user.id).count() == 0
+
+
+def test_deleting_a_department_removes_its_rollups(db):
+    department = db.query(models.Department).first()
+    delete_department_rollups(db, department.id)
+    db.delete(department)
+    db.commit()
+
+    assert_rollups_match_logs(db)
+    assert db.query(models.DepartmentTemplateStat).filter_by(department_id=department.id).count() == 0
@@ -0,0 +1,128 @@
+"""
+Parity tests for Utils/behavior_stats_utils against straightforward
+row-by-row reference implementations, including the iterrows
+response-time loop AIAnalyzer used. Benchmarks/bench_behavior_stats.py
+times the same references.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utils.behavior_stats_utils import delay_stats, hour_distribution, template_rates, weekday_distribution
+
+TEMPLATES = np.array(["urgent_action", "security_alert", "password_expiry", "system_update", None], dtype=object)
+
+DELAY_COLUMNS = ["count", "mean", "var", "p50", "p90", "p95"]
+
+
+def synthetic_logs(n_logs: int = 20000, n_users: int = 500, seed: int = 7) -> pd.DataFrame:
+    """Columnar email logs with clicks, responses, missing timestamps and unknown template types."""
+    rng = np.random.default_rng(seed)
+    sent_at = pd.Timestamp(datetime(2024, 6, 1)) - pd.to_timedelta(rng.integers(0, 60 * 24 * 60, size=n_logs), unit="m")
+    clicked = rng.random(n_logs) < 0.3
+    clicked_at = sent_at + pd.to_timedelta(rng.integers(0, 60 * 48, size=n_logs), unit="m")
+    responded = rng.random(n_logs) < 0.1
+    responded_at = sent_at + pd.to_timedelta(rng.integers(0, 60 * 72, size=n_logs), unit="m")
+    return pd.DataFrame({
+        "user_id": rng.integers(1, n_users + 1, size=n_logs),
+        "clicked": clicked,
+        "sent_at": sent_at.where(rng.random(n_logs) > 0.01),
+        "clicked_at": clicked_at.where(clicked & (rng.random(n_logs) > 0.05)),
+        "responded": responded,
+        "responded_at": responded_at.where(responded & (rng.random(n_logs) > 0.05)),
+        "template_type": TEMPLATES[rng.integers(len(TEMPLATES), size=n_logs)]
+    })
+
+
+def legacy_avg_response_hours(df: pd.DataFrame) -> float:
+    """AIAnalyzer's original iterrows loop (it did not check the responded flag)."""
+    response_times = []
+    for _, row in df.iterrows():
+        if pd.notna(row['responded_at']) and pd.notna(row['sent_at']):
+            delta = row['responded_at'] - row['sent_at']
+            response_times.append(delta.total_seconds() / 3600)
+    return np.mean(response_times) if response_times else 0.0
+
+
+def rowwise_stats(logs: pd.DataFrame, percentiles=(50, 90, 95)) -> dict:
+    """Per-user statistics computed one log at a time."""
+    delays = {"clicked": defaultdict(list), "responded": defaultdict(list)}
+    hours = defaultdict(lambda: [0] * 24)
+    weekdays = defaultdict(lambda: [0] * 7)
+    templates = defaultdict(lambda: [0, 0, 0])
+    for row in logs.itertuples(index=False):
+        for event, at in (("clicked", row.clicked_at), ("responded", row.responded_at)):
+            if getattr(row, event) and pd.notna(at):
+                if pd.notna(row.sent_at):
+                    delays[event][row.user_id].append((at - row.sent_at).total_seconds() / 60)
+                if event == "clicked":
+                    hours[row.user_id][at.hour] += 1
+                    weekdays[row.user_id][at.weekday()] += 1
+        counts = templates[(row.user_id, row.template_type or "unknown")]
+        counts[0] += 1
+        counts[1] += int(row.clicked)
+        counts[2] += int(row.responded)
+
+    def summarize(values):
+        if not values:
+            return [0, 0.0, 0.0] + [np.nan] * len(percentiles)
+        return [len(values), np.mean(values), np.var(values)] + list(np.percentile(values, percentiles))
+
+    return {
+        "delays": {event: {user: summarize(values) for user, values in by_user.items()} for event, by_user in delays.items()},
+        "hours": dict(hours),
+        "weekdays": dict(weekdays),
+        "templates": dict(templates)
+    }
+
+
+@pytest.fixture(scope="module")
+def logs() -> pd.DataFrame:
+    return synthetic_logs()
+
+
+@pytest.fixture(scope="module")
+def reference(logs) -> dict:
+    return rowwise_stats(logs)
+
+
+@pytest.mark.parametrize("event", ["clicked", "responded"])
+def test_delay_stats_match_reference(logs, reference, event):
+    stats = delay_stats(logs, event, by="user_id")
+    expected = pd.DataFrame.from_dict(reference["delays"][event], orient="index", columns=DELAY_COLUMNS)
+
+    np.testing.assert_allclose(
+        stats.loc[expected.index, DELAY_COLUMNS].to_numpy(dtype=float), expected.to_numpy(dtype=float),
+        rtol=1e-9, atol=1e-6
+    )
+    assert (stats.drop(expected.index)["count"] == 0).all()
+
+
+@pytest.mark.parametrize("name, distribution", [("hours", hour_distribution), ("weekdays", weekday_distribution)])
+def test_event_distributions_match_reference(logs, reference, name, distribution):
+    counts = distribution(logs, by="user_id", normalize=False)
+    expected = pd.DataFrame.from_dict(reference[name], orient="index")
+
+    np.testing.assert_array_equal(counts.loc[expected.index].to_numpy(), expected.to_numpy())
+    np.testing.assert_allclose(distribution(logs, by="user_id").sum(axis=1), 1.0)
+
+
+def test_template_rates_match_reference(logs, reference):
+    rates = template_rates(logs, by="user_id")
+
+    assert len(rates) == len(reference["templates"])
+    for key, (sent, clicked, responded) in reference["templates"].items():
+        assert tuple(rates.loc[key, ["sent", "clicked", "responded"]]) == (sent, clicked, responded), key
+
+
+def test_response_time_matches_legacy_analyzer(logs):
+    # Same mean as AIAnalyzer's loop wherever responded_at implies responded
+    sample = logs[logs["user_id"] <= 50]
+    for user_id, user_logs in sample.groupby("user_id"):
+        expected = legacy_avg_response_hours(user_logs[user_logs["responded"]])
+        actual = delay_stats(user_logs, "responded", unit="hours", percentiles=())["mean"].iloc[0]
+        assert np.isclose(actual, expected, rtol=1e-9, atol=1e-9), user_id
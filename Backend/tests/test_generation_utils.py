@@ -0,0 +1,33 @@
+"""
+Tests for batched campaign generation's handling of per-user failures.
+"""
+
+from Utils.generation_utils import generate_emails_batched
+
+
+class ShortBatchGenerator:
+    """Generator whose batches come back two emails short and whose single-email path fails for unnamed users."""
+
+    templates = {"urgent_action": "Your account requires immediate attention"}
+
+    def generate_email_batch(self, template_type, department, count, on_model_call=None):
+        return [{"subject": f"Notice {n}", "body": "Dear {name}"} for n in range(count - 2)]
+
+    def personalize(self, email, user_info):
+        return {"subject": email["subject"], "body": email["body"].replace("{name}", user_info["name"])}
+
+    def generate_phishing_email(self, user_info, template_type=None, on_model_call=None):
+        return {"subject": "Single", "body": f"Dear {user_info['name']}", "template_type": template_type}
+
+
+def test_a_failing_user_does_not_fail_the_batch():
+    users = [{"id": i, "name": f"User {i}", "department": "IT"} for i in range(4)]
+    # The last user of the batch gets a single-email generation, which fails without a name
+    del users[3]["name"]
+
+    results, errors = generate_emails_batched(ShortBatchGenerator(), users, "urgent_action", batch_size=4, requests_per_second=0)
+
+    assert [user["id"] for user, _ in results] == [0, 1, 2]
+    assert [email["body"] for _, email in results] == ["Dear User 0", "Dear User 1", "Dear User 2"]
+    assert [error["user_id"] for error in errors] == [3]
+    assert "name" in errors[0]["error"]
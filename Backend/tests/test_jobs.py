@@ -0,0 +1,36 @@
+"""
+Tests that job params are validated when a job is submitted, before
+anything is queued.
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("job_type, params, detail", [
+    ("generate_department", {}, "department_id"),
+    ("generate_department", {"department_id": "1"}, "department_id"),
+    ("generate_department", {"department_id": 99}, "Department not found"),
+    ("generate_department", {"department_id": 1, "generation_mode": "fast"}, "generation mode"),
+    ("generate_department", {"department_id": 1, "generation_mode": "template", "template_type": "nope"}, "template type"),
+    ("train_risk_model", {"source": "csv"}, "training source"),
+    ("train_risk_model", {"save_snapshot": "yes"}, "save_snapshot"),
+    ("unknown", {}, "Unknown job type")
+])
+def test_invalid_params_are_rejected_on_submit(client, job_type, params, detail):
+    main, api = client
+
+    response = api.post("/jobs", json={"job_type": job_type, "params": params})
+
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+    assert api.get("/jobs").json() == []
+
+
+def test_valid_params_are_queued(client):
+    main, api = client
+
+    response = api.post("/jobs", json={"job_type": "generate_department", "params": {"department_id": 1}})
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    assert api.post("/jobs", json={"job_type": "refresh_risk_scores"}).status_code == 202
@@ -0,0 +1,61 @@
+"""
+Tests for GeminiBackend against a mocked google-generativeai client.
+The real GenerativeModel builds each request, so arguments the pinned
+client does not accept fail here as they would against the API.
+"""
+
+import asyncio
+import time
+from unittest import mock
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+import pytest
+
+from Utils.llm_backend_utils import GeminiBackend, LLMBackendError
+from Utils.resilience_utils import is_timeout
+
+
+def response(text: str) -> glm.GenerateContentResponse:
+    """API response carrying one candidate with the given text."""
+    return glm.GenerateContentResponse(candidates=[glm.Candidate(content=glm.Content(parts=[glm.Part(text=text)]))])
+
+
+@pytest.fixture
+def backend():
+    """GeminiBackend whose model talks to mocked sync and async clients."""
+    backend = GeminiBackend(api_key="test-key", max_output_tokens=123)
+    backend._model = genai.GenerativeModel(backend.model_name)
+    backend._model._client = mock.Mock()
+    backend._model._async_client = mock.AsyncMock()
+    return backend
+
+
+def test_generate_with_timeout(backend):
+    backend._model._client.generate_content.return_value = response("Subject: Hello\nBody")
+
+    assert backend.generate("prompt", timeout=5) == "Subject: Hello\nBody"
+    request = backend._model._client.generate_content.call_args.args[0]
+    assert request.generation_config.max_output_tokens == 123
+
+
+def test_generate_timeout_expires(backend):
+    backend._model._client.generate_content.side_effect = lambda request: time.sleep(1) or response("late")
+
+    started = time.perf_counter()
+    with pytest.raises(LLMBackendError) as error:
+        backend.generate("prompt", timeout=0.05)
+    assert time.perf_counter() - started < 0.5
+    assert is_timeout(error.value)
+
+
+def test_agenerate_with_timeout(backend):
+    backend._model._async_client.generate_content.return_value = response("async text")
+
+    assert asyncio.run(backend.agenerate("prompt", timeout=5)) == "async text"
+
+
+def test_stream_with_timeout(backend):
+    backend._model._client.stream_generate_content.return_value = iter([response("Subject: Hi\n"), response("Body")])
+
+    assert "".join(backend.stream("prompt", timeout=5)) == "Subject: Hi\nBody"
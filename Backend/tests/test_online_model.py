@@ -0,0 +1,92 @@
+"""
+Tests that the online model learns from committed feature changes only,
+on its background thread, and that models are evaluated by class.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from Utils.feature_utils import refresh_user_features
+from Utils.ai_utils import MLRiskPredictor
+from Utils.online_model_utils import OnlineModelTrainer, evaluate_predictor
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """Session factory for an in-memory database of 4 users with clicked and ignored emails."""
+    # The online model is loaded from and saved to Models/ under the working directory
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    sent_at = datetime(2024, 1, 1, 10)
+    for i in range(1, 5):
+        user = models.User(id=i, name=f"User {i}", email=f"user{i}@smx.test")
+        db.add(user)
+        for n in range(4):
+            clicked = n < i - 1
+            db.add(models.EmailLog(user_id=i, subject="s", body="b", template_type="urgent_action", sent_at=sent_at,
+                                   clicked=clicked, clicked_at=sent_at + timedelta(minutes=5) if clicked else None))
+    db.flush()
+    refresh_user_features(db)
+    db.commit()
+    db.close()
+    return factory
+
+
+def wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_rolled_back_changes_are_not_queued(session_factory):
+    trainer = OnlineModelTrainer(session_factory, batch_size=2)
+    db = session_factory()
+    trainer.observe_after_commit(db, [1, 2, 3])
+    db.rollback()
+    db.commit()
+    db.close()
+
+    assert trainer.info()["pending_users"] == 0
+    assert trainer.updates == 0
+
+
+def test_committed_changes_are_learned_in_the_background(session_factory):
+    trainer = OnlineModelTrainer(session_factory, batch_size=3)
+    try:
+        db = session_factory()
+        trainer.observe_after_commit(db, [1, 2])
+        db.commit()
+        assert trainer.info()["pending_users"] == 2 and trainer.updates == 0
+
+        trainer.observe_after_commit(db, [3, 4])
+        db.commit()
+        db.close()
+        assert wait_for(lambda: trainer.updates == 1)
+        assert trainer.info()["pending_users"] == 0
+        assert trainer.predictor.samples_seen == 4
+    finally:
+        trainer.stop()
+
+
+def test_evaluate_single_class_model():
+    features = np.random.default_rng(5).random((12, MLRiskPredictor.N_FEATURES))
+    predictor = MLRiskPredictor(load=False)
+    predictor.fit(features, np.zeros(12, dtype=int), save=False)
+
+    metrics = evaluate_predictor(predictor, features[:4], np.array([0, 0, 1, 1]))
+
+    assert metrics["accuracy"] == 0.5
+    assert metrics["brier_score"] == 0.5
@@ -0,0 +1,78 @@
+"""
+Tests for keyset pagination over an in-memory database.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from Utils.pagination_utils import paginate_by_id, paginate_email_logs
+
+
+@pytest.fixture
+def db():
+    """Session on an in-memory database with 5 users and 5 email logs."""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    sent_at = datetime(2024, 1, 1)
+    for i in range(5):
+        user = models.User(name=f"User {i}", email=f"user{i}@smx.test")
+        session.add(user)
+        session.flush()
+        session.add(models.EmailLog(user_id=user.id, subject="s", body="b", sent_at=sent_at + timedelta(hours=i)))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_pages_cover_every_row_once(db):
+    ids, cursor = [], ""
+    while True:
+        rows, cursor = paginate_by_id(db.query(models.User), models.User, cursor, 2)
+        ids += [row.id for row in rows]
+        if cursor is None:
+            break
+    assert ids == sorted(user.id for user in db.query(models.User))
+
+    logs, cursor = [], ""
+    while True:
+        rows, cursor = paginate_email_logs(db.query(models.EmailLog), cursor, 2)
+        logs += rows
+        if cursor is None:
+            break
+    assert [log.sent_at for log in logs] == sorted((log.sent_at for log in logs), reverse=True)
+    assert len(logs) == 5
+
+
+def test_empty_page_has_no_cursor(db):
+    assert paginate_by_id(db.query(models.User).filter(models.User.id < 0), models.User, "", 10) == ([], None)
+    assert paginate_email_logs(db.query(models.EmailLog).filter(models.EmailLog.id < 0), "", 10) == ([], None)
+
+
+def test_limit_below_one_is_rejected(db):
+    with pytest.raises(ValueError, match="limit"):
+        paginate_by_id(db.query(models.User), models.User, "", 0)
+    with pytest.raises(ValueError, match="limit"):
+        paginate_email_logs(db.query(models.EmailLog), "", 0)
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 10])
+def test_logs_without_sent_at_follow_dated_logs(db, page_size):
+    for user_id in (1, 3, 5):
+        db.add(models.EmailLog(user_id=user_id, subject="s", body="b", sent_at=None))
+    db.commit()
+
+    logs, cursor = [], ""
+    while True:
+        rows, cursor = paginate_email_logs(db.query(models.EmailLog), cursor, page_size)
+        logs += rows
+        if cursor is None:
+            break
+    dated = [log for log in logs if log.sent_at is not None]
+    assert len(logs) == len({log.id for log in logs}) == 8
+    assert logs[:5] == dated and [log.sent_at for log in dated] == sorted((log.sent_at for log in dated), reverse=True)
+    assert [log.id for log in logs[5:]] == [8, 7, 6]
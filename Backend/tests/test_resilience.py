@@ -0,0 +1,53 @@
+"""
+Tests for which model call failures ResilientBackend retries.
+"""
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from Utils.llm_backend_utils import LLMBackend, LLMBackendError
+from Utils.resilience_utils import CircuitBreaker, ResilientBackend
+
+
+class FailingBackend(LLMBackend):
+    """Backend raising the same error on every request and counting requests."""
+
+    name = "failing"
+
+    def __init__(self, error: Exception):
+        self.error = error
+        self.calls = 0
+
+    def generate(self, prompt, max_output_tokens=None, timeout=None):
+        self.calls += 1
+        raise self.error
+
+
+def resilient(backend: LLMBackend) -> ResilientBackend:
+    return ResilientBackend(backend, CircuitBreaker(failure_threshold=100), timeout=1, deadline=5, retries=2, base_delay=0, max_delay=0)
+
+
+@pytest.mark.parametrize("error", [
+    LLMBackendError("unavailable", 503),
+    LLMBackendError("connection reset"),
+    google_exceptions.ServiceUnavailable("unavailable"),
+    TimeoutError("timed out")
+])
+def test_transport_errors_are_retried(error):
+    backend = FailingBackend(error)
+    with pytest.raises(type(error)):
+        resilient(backend).generate("prompt")
+    assert backend.calls == 3
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("Unknown field for GenerateContentRequest: timeout"),
+    TypeError("unexpected keyword argument"),
+    LLMBackendError("bad request", 400),
+    google_exceptions.InvalidArgument("bad request")
+])
+def test_final_errors_are_not_retried(error):
+    backend = FailingBackend(error)
+    with pytest.raises(type(error)):
+        resilient(backend).generate("prompt")
+    assert backend.calls == 1
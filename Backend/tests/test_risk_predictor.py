@@ -0,0 +1,64 @@
+"""
+Tests that risk models fitted on a single class score users as low risk
+instead of failing, that a click after such a model is trained is still
+recorded, and that training refuses to publish such a model.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from Utils.ai_utils import MLRiskPredictor
+
+
+def single_class_predictor(n_users: int = 12) -> MLRiskPredictor:
+    """Predictor fitted on users who are all low risk."""
+    rng = np.random.default_rng(3)
+    predictor = MLRiskPredictor(load=False)
+    predictor.fit(rng.random((n_users, MLRiskPredictor.N_FEATURES)), np.zeros(n_users, dtype=int), save=False)
+    return predictor
+
+
+def test_single_class_model_scores_users_as_low_risk():
+    predictor = single_class_predictor()
+    features = np.random.default_rng(4).random((3, MLRiskPredictor.N_FEATURES))
+
+    assert predictor.is_trained
+    assert [p["risk_score"] for p in predictor.predict_risk_batch(features)] == [0.0, 0.0, 0.0]
+    # One row goes through the compiled forest, a large batch through scikit-learn
+    clicked_email = {"user_id": 1, "clicked": True, "sent_at": datetime(2024, 1, 1), "clicked_at": datetime(2024, 1, 1, 0, 5)}
+    assert predictor.predict_user_risk({"id": 1, "department": "IT"}, [clicked_email])["risk_level"] == "low"
+    assert not predictor.high_risk_probability(predictor.scaler.transform(np.ones((200, MLRiskPredictor.N_FEATURES)))).any()
+
+
+def test_click_after_single_class_model_is_published(client):
+    main, api = client
+    main.risk_model_registry.publish(single_class_predictor())
+
+    response = api.post("/email_logs/1/click")
+
+    assert response.status_code == 200
+    assert api.get("/email_logs/1").json()["clicked"] is True
+
+
+def test_validate_rejects_single_class_model():
+    predictor = single_class_predictor()
+
+    with pytest.raises(ValueError, match="single risk class"):
+        predictor.validate(np.random.default_rng(4).random((5, MLRiskPredictor.N_FEATURES)))
+
+
+def test_training_on_single_class_keeps_serving_model(client, tmp_path):
+    main, api = client
+    for i in range(2, 14):
+        api.post("/users/", json={"name": f"User {i}", "email": f"user{i}@smx.test", "department_id": 1})
+        api.post("/email_logs/", json={"user_id": i, "subject": "s", "body": "b", "template_type": "urgent_action"})
+    serving = main.risk_model_registry.get()
+
+    response = api.post("/ml/train-risk-model", params={"background": False})
+
+    assert response.status_code == 400
+    assert "single risk class" in response.json()["detail"]
+    assert main.risk_model_registry.get() is serving
+    assert not (tmp_path / "Models" / "risk_predictor.joblib").exists()